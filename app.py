@@ -8,110 +8,148 @@ Uso:
 
 Acceder en: http://localhost:8050
 """
-from datetime import date, timedelta
+import threading
+import uuid
+from datetime import date
 from dash import Dash, html, dcc, callback, Output, Input
 import dash_mantine_components as dmc
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Imports locales
 from config import SERVER_CONFIG
-from data.queries import (
-    obtener_genericos, obtener_marcas, obtener_rutas, obtener_preventistas,
-    obtener_rango_fechas, obtener_anios_disponibles, cargar_ventas_por_cliente
-)
 from layouts.home_layout import create_home_layout
 from layouts.main_layout import create_ventas_layout
 from layouts.tablero_layout import create_tablero_layout
 from layouts.ytd_layout import create_ytd_layout
 from layouts.cliente_layout import create_cliente_layout
 from layouts.clientes_layout import create_clientes_layout
-from data.ytd_queries import obtener_anios_disponibles_ytd, obtener_mes_actual, obtener_anio_actual
-
-# Obtener rango de fechas
-print("Obteniendo rango de fechas...")
-fecha_min, fecha_max = obtener_rango_fechas()
-print(f"Datos disponibles: {fecha_min} a {fecha_max}")
-
-# Obtener listas para filtros
-print("Cargando filtros de producto...")
-lista_genericos = obtener_genericos()
-lista_marcas = obtener_marcas()
-print(f"  - {len(lista_genericos)} genericos, {len(lista_marcas)} marcas")
-
-print("Cargando filtros de ruta/preventista...")
-lista_rutas = obtener_rutas()
-lista_preventistas = obtener_preventistas()
-print(f"  - {len(lista_rutas)} rutas, {len(lista_preventistas)} preventistas")
-
-# Rango default: mes corriente (1ro del mes actual hasta hoy)
-hoy = date.today()
-fecha_desde_default = hoy.replace(day=1)
-fecha_hasta_default = hoy
-print(f"Cargando datos iniciales ({fecha_desde_default} a {fecha_hasta_default})...")
-df_ventas = cargar_ventas_por_cliente(fecha_desde_default, fecha_hasta_default)
-clientes_con_ventas = len(df_ventas[df_ventas['cantidad_total'] > 0])
-clientes_sin_ventas = len(df_ventas[df_ventas['cantidad_total'] == 0])
-print(f"Cargados {len(df_ventas):,} clientes ({clientes_con_ventas:,} con ventas, {clientes_sin_ventas:,} sin ventas)")
-
-# Crear app
-app = Dash(__name__, suppress_callback_exceptions=True,
-           external_stylesheets=dmc.styles.ALL)
-app.title = "Medallion ETL - Dashboard"
-server = app.server  # Flask server para gunicorn
-
-# Datos para YTD Dashboard
-print("Cargando datos para YTD Dashboard...")
-try:
-    ytd_anios = obtener_anios_disponibles_ytd()
-    ytd_anio_actual = obtener_anio_actual()
-    ytd_mes_actual = obtener_mes_actual()
-    print(f"  - Años disponibles: {ytd_anios}")
-except Exception as e:
-    print(f"  - Error cargando datos YTD: {e}")
-    ytd_anios = [2025, 2024]
-    ytd_anio_actual = 2025
-    ytd_mes_actual = 12
-
-# Años disponibles para tablero de comparación
-print("Cargando años disponibles...")
-lista_anios = obtener_anios_disponibles()
-print(f"  - Años: {lista_anios}")
-
-# Pre-crear layouts
+from data.cache import precalcular_zonas, normalizar_filtros, sembrar_clientes_filtrados
+from data.snapshot import obtener_estado_inicial, estado_actual
+from routes.tiles import registrar_rutas_tiles
+from routes.perfiles import registrar_perfilado
+from routes.trazas import registrar_trazas
+from routes.carga import registrar_carga
+from routes.lotes import registrar_rutas_lotes
+from database import engine
+
+
+def crear_app():
+    """
+    Arranque del servidor: estado inicial (snapshot o base), zonas precalculadas,
+    app Dash con sus rutas y callbacks. Se llama solo desde los puntos de entrada
+    (python app.py, gunicorn app:server); al importar app.py como __mp_main__ (los
+    procesos del export por lote lanzados con forkserver/spawn desde python app.py)
+    no se ejecuta.
+    """
+    # Estado de arranque: filtros, rango de fechas, YTD y dataset del periodo default.
+    # Se lee del snapshot en disco (se refresca en segundo plano); solo sin snapshot se consulta la base
+    estado = obtener_estado_inicial()
+    print(f"Datos disponibles: {estado['fecha_min']} a {estado['fecha_max']}")
+
+    print(f"  - {len(estado['lista_genericos'])} genericos, {len(estado['lista_marcas'])} marcas")
+    print(f"  - {len(estado['lista_rutas'])} rutas, {len(estado['lista_preventistas'])} preventistas")
+
+    # Rango default: mes corriente (1ro del mes actual hasta hoy)
+    hoy = date.today()
+    fecha_desde_default = hoy.replace(day=1)
+    fecha_hasta_default = hoy
+    df_ventas = estado['df_ventas']
+    clientes_con_ventas = len(df_ventas[df_ventas['cantidad_total'] > 0])
+    clientes_sin_ventas = len(df_ventas[df_ventas['cantidad_total'] == 0])
+    print(f"Datos iniciales ({estado['fecha_desde_default']} a {estado['fecha_hasta_default']}): "
+          f"{len(df_ventas):,} clientes ({clientes_con_ventas:,} con ventas, {clientes_sin_ventas:,} sin ventas)")
+
+    # Si el snapshot es de hoy, el dataset del periodo default queda en cache para la primera carga del mapa
+    if estado['fecha_hasta_default'] == fecha_hasta_default:
+        sembrar_clientes_filtrados(
+            normalizar_filtros(fecha_desde=fecha_desde_default, fecha_hasta=fecha_hasta_default), df_ventas
+        )
+
+    print("Precalculando zonas (convex hull)...")
+    precalcular_zonas(df_ventas)
+
+    # Crear app
+    app = Dash(__name__, suppress_callback_exceptions=True,
+               external_stylesheets=dmc.styles.ALL)
+    app.title = "Medallion ETL - Dashboard"
+    # Detras de un proxy que termina TLS, request.host_url (URL de los tiles) tiene que
+    # ser https://host-publico; sin esto el navegador bloquea los tiles como mixed content
+    if SERVER_CONFIG['proxies']:
+        app.server.wsgi_app = ProxyFix(app.server.wsgi_app, x_proto=SERVER_CONFIG['proxies'],
+                                       x_host=SERVER_CONFIG['proxies'])
+    registrar_rutas_tiles(app.server)
+    registrar_perfilado(app)
+    registrar_trazas(app, engine)
+    registrar_carga(app, engine)
+    registrar_rutas_lotes(app.server)
+
+    print(f"  - Años YTD: {estado['ytd_anios']}, años tablero: {estado['lista_anios']}")
+
+    app.layout = serve_layout
+
+    # Importar callbacks (se registran automaticamente)
+    # Esto debe estar DESPUES de crear app y layout
+    import callbacks.callbacks  # noqa: F401
+    import callbacks.tablero_callbacks  # noqa: F401
+    import callbacks.ytd_callbacks  # noqa: F401
+    import callbacks.cliente_callbacks  # noqa: F401
+    import callbacks.clientes_callbacks  # noqa: F401
+    return app
+
+
 home_layout = create_home_layout()
-ventas_layout = create_ventas_layout(
-    fecha_min=fecha_min,
-    fecha_max=fecha_max,
-    fecha_desde_default=fecha_desde_default,
-    fecha_hasta_default=fecha_hasta_default,
-    lista_genericos=lista_genericos,
-    lista_marcas=lista_marcas,
-    lista_rutas=lista_rutas,
-    lista_preventistas=lista_preventistas
-)
-tablero_layout = create_tablero_layout(
-    fecha_min=fecha_min,
-    fecha_max=fecha_max,
-    fecha_desde_default=fecha_desde_default,
-    fecha_hasta_default=fecha_hasta_default,
-    lista_genericos=lista_genericos,
-    lista_marcas=lista_marcas,
-    lista_rutas=lista_rutas,
-    lista_preventistas=lista_preventistas,
-    lista_anios=lista_anios
-)
-ytd_layout = create_ytd_layout(
-    anio_actual=ytd_anio_actual,
-    mes_actual=ytd_mes_actual,
-    anios_disponibles=ytd_anios
-)
 
-# Layout principal con routing
-app.layout = dmc.MantineProvider(
-    html.Div([
-        dcc.Location(id='url', refresh=False),
-        html.Div(id='page-content')
-    ])
-)
+# Layouts de los tableros por version del estado de arranque: se rearman solo cuando el
+# refresco de fondo trae un snapshot nuevo (p. ej. despues del ETL nocturno) o cambia el dia
+_layouts = {'clave': None}
+_layouts_lock = threading.Lock()
+
+
+def obtener_layouts():
+    """Layouts de ventas, tablero, YTD y clientes del ultimo estado de arranque (sin queries)."""
+    estado_vigente = estado_actual()
+    hoy = date.today()
+    clave = (estado_vigente['creado'], hoy)
+    with _layouts_lock:
+        if _layouts['clave'] == clave:
+            return _layouts
+        # Rango default: mes corriente (1ro del mes actual hasta hoy)
+        fechas = dict(
+            fecha_min=estado_vigente['fecha_min'],
+            fecha_max=estado_vigente['fecha_max'],
+            fecha_desde_default=hoy.replace(day=1),
+            fecha_hasta_default=hoy,
+        )
+        filtros = dict(
+            lista_genericos=estado_vigente['lista_genericos'],
+            lista_marcas=estado_vigente['lista_marcas'],
+            lista_rutas=estado_vigente['lista_rutas'],
+            lista_preventistas=estado_vigente['lista_preventistas'],
+        )
+        _layouts.update(
+            clave=clave,
+            ventas=create_ventas_layout(**fechas, **filtros),
+            tablero=create_tablero_layout(**fechas, **filtros, lista_anios=estado_vigente['lista_anios']),
+            ytd=create_ytd_layout(
+                anio_actual=estado_vigente['ytd_anio_actual'],
+                mes_actual=estado_vigente['ytd_mes_actual'],
+                anios_disponibles=estado_vigente['ytd_anios']
+            ),
+            clientes=create_clientes_layout(filtros['lista_rutas'], filtros['lista_preventistas']),
+        )
+        return _layouts
+
+
+# Layout principal con routing. Es una funcion: cada carga de pagina recibe su propio
+# id de sesion, que usan los callbacks de mapas para cancelar sus queries superadas
+def serve_layout():
+    return dmc.MantineProvider(
+        html.Div([
+            dcc.Location(id='url', refresh=False),
+            dcc.Store(id='sesion-id', data=uuid.uuid4().hex),
+            html.Div(id='page-content')
+        ])
+    )
 
 
 # Callback de routing
@@ -122,11 +160,11 @@ app.layout = dmc.MantineProvider(
 def display_page(pathname):
     """Muestra la página correspondiente según la URL."""
     if pathname == '/ventas':
-        return ventas_layout
+        return obtener_layouts()['ventas']
     elif pathname == '/ytd':
-        return ytd_layout
+        return obtener_layouts()['ytd']
     elif pathname == '/clientes':
-        return create_clientes_layout()
+        return obtener_layouts()['clientes']
     elif pathname and pathname.startswith('/cliente/'):
         parts = pathname.strip('/').split('/')
         if len(parts) == 2:
@@ -139,19 +177,16 @@ def display_page(pathname):
             html.H2("Cliente no encontrado", style={'textAlign': 'center', 'padding': '60px', 'color': '#666'})
         ])
     elif pathname == '/tablero':
-        return tablero_layout
+        return obtener_layouts()['tablero']
     else:
         # Página de inicio por defecto
         return home_layout
 
 
-# Importar callbacks (se registran automaticamente)
-# Esto debe estar DESPUES de crear app y layout
-import callbacks.callbacks  # noqa: E402, F401
-import callbacks.tablero_callbacks  # noqa: E402, F401
-import callbacks.ytd_callbacks  # noqa: E402, F401
-import callbacks.cliente_callbacks  # noqa: E402, F401
-import callbacks.clientes_callbacks  # noqa: E402, F401
+# Fuera de los procesos del export por lote (que importan este script como __mp_main__)
+if __name__ != '__mp_main__':
+    app = crear_app()
+    server = app.server  # Flask server para gunicorn
 
 
 if __name__ == '__main__':
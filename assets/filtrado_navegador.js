@@ -0,0 +1,74 @@
+/*
+ * Filtrado en el navegador de los mapas de puntos (utils/filtrado_navegador.py).
+ * Con el modo activo y los clientes del periodo ya enviados al Store, los filtros
+ * de atributo (canal, subcanal, localidad, lista de precio, sucursal) se aplican
+ * aca sobre las columnas codificadas y no vuelven al servidor.
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    filtrado_navegador: {
+        // Disparo de los callbacks de mapa del servidor ante cambios de filtros de
+        // atributo: solo si el mapa no tiene los clientes en el navegador
+        disparo: function(canales, subcanales, localidades, listas, sucursales, activo, datos) {
+            if (activo && datos) {
+                return window.dash_clientside.no_update;
+            }
+            return Date.now();
+        },
+
+        // Rearma los arrays de las trazas de puntos con los clientes que cumplen los filtros
+        aplicar: function(canales, subcanales, localidades, listas, sucursales, datos, figura) {
+            if (!datos || !figura || !figura.data) {
+                return window.dash_clientside.no_update;
+            }
+            var seleccion = {
+                canales: canales, subcanales: subcanales, localidades: localidades,
+                listas_precio: listas, sucursales: sucursales
+            };
+
+            // Por filtro activo: 1 en los codigos de los valores seleccionados
+            var permitidos = {};
+            Object.keys(datos.valores).forEach(function(filtro) {
+                var elegidos = seleccion[filtro];
+                if (!elegidos || !elegidos.length) return;
+                var conjunto = new Set(elegidos.map(String));
+                var valores = datos.valores[filtro];
+                var marca = new Uint8Array(valores.length);
+                for (var i = 0; i < valores.length; i++) {
+                    if (conjunto.has(valores[i])) marca[i] = 1;
+                }
+                permitidos[filtro] = marca;
+            });
+            var filtros = Object.keys(permitidos);
+
+            var nueva = Object.assign({}, figura, {data: figura.data.slice()});
+            datos.trazas.forEach(function(t) {
+                var filas = [];
+                for (var i = 0; i < t.n; i++) {
+                    var cumple = true;
+                    for (var f = 0; f < filtros.length && cumple; f++) {
+                        var codigo = t.codigos[filtros[f]][i];
+                        cumple = codigo >= 0 && permitidos[filtros[f]][codigo] === 1;
+                    }
+                    if (cumple) filas.push(i);
+                }
+
+                var traza = Object.assign({}, nueva.data[t.indice]);
+                traza.marker = Object.assign({}, traza.marker);
+                Object.keys(t.columnas).forEach(function(ruta) {
+                    var columna = t.columnas[ruta];
+                    var valores = filas.map(function(i) { return columna[i]; });
+                    if (ruta.indexOf('marker.') === 0) {
+                        traza.marker[ruta.slice(7)] = valores;
+                    } else {
+                        traza[ruta] = valores;
+                    }
+                });
+                if (t.nombre) {
+                    traza.name = t.nombre.replace('{n}', filas.length.toLocaleString('en-US'));
+                }
+                nueva.data[t.indice] = traza;
+            });
+            return nueva;
+        }
+    }
+});
@@ -0,0 +1,39 @@
+"""
+Detalle de cliente: pivot, modelo de filas de la tabla y exports Excel.
+Aca el tamanio es la cantidad de filas (articulo, mes) con venta del cliente.
+"""
+import pytest
+
+from utils.excel_cliente import generar_excel_completo, generar_excel_marca
+from utils.pivot_cliente import PivotCliente
+from utils.tabla_cliente import construir_modelo_filas
+
+from datos import detalle_cliente, periodos
+
+
+@pytest.fixture
+def detalle(tamanio):
+    return detalle_cliente(tamanio)
+
+
+@pytest.fixture
+def pivot(detalle):
+    return PivotCliente(detalle, periodos())
+
+
+def bench_pivot_cliente(medir, detalle):
+    medir(PivotCliente, detalle, periodos())
+
+
+def bench_construir_modelo_filas(medir, pivot):
+    medir(construir_modelo_filas, pivot)
+
+
+def bench_generar_excel_marca(medir, pivot):
+    # La marca con mas articulos
+    m = int((pivot.inicio_marca[1:] - pivot.inicio_marca[:-1]).argmax())
+    medir(generar_excel_marca, pivot, m)
+
+
+def bench_generar_excel_completo(medir, pivot):
+    medir(generar_excel_completo, pivot, 'CLIENTE DE PRUEBA (1)')
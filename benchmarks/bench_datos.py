@@ -0,0 +1,9 @@
+"""Procesamiento del dataset de clientes (data/queries.py)."""
+from data.queries import _process_ventas_df
+
+from datos import clientes_crudos
+
+
+def bench_process_ventas_df(medir, tamanio):
+    crudo = clientes_crudos(tamanio)
+    medir(_process_ventas_df, preparar=lambda: (crudo.copy(),))
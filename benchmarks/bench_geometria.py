@@ -0,0 +1,33 @@
+"""Grilla de calor, zonas convex hull y filtro de outliers (utils/visualization.py)."""
+import numpy as np
+import pytest
+
+from config import SCIPY_AVAILABLE
+from data.queries import _process_ventas_df
+from utils.visualization import _filtrar_outliers_iqr, calcular_zonas, crear_grilla_calor_optimizada
+
+from datos import clientes_crudos
+
+
+@pytest.fixture
+def clientes(tamanio):
+    df = _process_ventas_df(clientes_crudos(tamanio))
+    return df[df['latitud'].notna() & df['longitud'].notna()]
+
+
+@pytest.mark.parametrize('precision', [2, 3])
+def bench_crear_grilla_calor(medir, clientes, precision):
+    medir(crear_grilla_calor_optimizada, clientes, 'cantidad_total', precision)
+
+
+@pytest.mark.skipif(not SCIPY_AVAILABLE, reason="las zonas requieren scipy")
+@pytest.mark.parametrize('columna', ['ruta', 'preventista'])
+def bench_calcular_zonas(medir, clientes, columna):
+    # Sin cache: se mide el calculo completo de todos los hulls
+    medir(calcular_zonas, clientes, columna)
+
+
+def bench_filtrar_outliers_iqr(medir, clientes):
+    puntos = clientes[['longitud', 'latitud']].to_numpy(dtype=float)
+    assert len(_filtrar_outliers_iqr(puntos)) <= len(puntos)
+    medir(_filtrar_outliers_iqr, np.ascontiguousarray(puntos))
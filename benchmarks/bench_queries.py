@@ -0,0 +1,48 @@
+"""
+Loaders contra la base configurada (POSTGRES_*), p. ej. la gold sintetica de
+tools/gold_sintetico.py. Se saltean si no hay base disponible.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database import engine
+from data.queries import cargar_ventas_cliente_detalle, cargar_ventas_por_cliente, cargar_ventas_por_fecha
+from data.ytd_queries import obtener_ventas_por_generico, obtener_ventas_por_mes, obtener_ventas_ytd
+
+
+@pytest.fixture(scope='module')
+def base():
+    try:
+        with engine.connect() as conn:
+            id_cliente = conn.execute(text(
+                "SELECT id_cliente FROM gold.fact_ventas GROUP BY id_cliente ORDER BY COUNT(*) DESC LIMIT 1"
+            )).scalar()
+    except OperationalError as e:
+        pytest.skip(f"sin base disponible: {e.orig}")
+    hoy = date.today()
+    return {'hoy': hoy, 'inicio_mes': hoy.replace(day=1), 'inicio_anio': hoy.replace(month=1, day=1),
+            'id_cliente': id_cliente}
+
+
+@pytest.mark.parametrize('periodo', ['mes', 'anio'])
+def bench_cargar_ventas_por_cliente(medir, base, periodo):
+    desde = base['inicio_mes'] if periodo == 'mes' else base['inicio_anio']
+    medir(cargar_ventas_por_cliente, desde, base['hoy'])
+
+
+def bench_cargar_ventas_por_fecha(medir, base):
+    medir(cargar_ventas_por_fecha, base['inicio_anio'], base['hoy'])
+
+
+def bench_cargar_ventas_cliente_detalle(medir, base):
+    # El cliente con mas lineas de venta
+    medir(cargar_ventas_cliente_detalle, base['id_cliente'])
+
+
+@pytest.mark.parametrize('consulta', [obtener_ventas_ytd, obtener_ventas_por_mes, obtener_ventas_por_generico],
+                         ids=lambda f: f.__name__)
+def bench_ytd(medir, base, consulta):
+    medir(consulta, base['hoy'].year, base['hoy'].month)
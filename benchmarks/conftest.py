@@ -0,0 +1,85 @@
+"""
+Fixtures de la suite de benchmarks: tamanios (clientes / filas), medicion del pico
+de memoria (tracemalloc) y comparacion de ese pico contra un baseline guardado
+con --benchmark-save.
+"""
+import json
+import os
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+# Las funciones puras no consultan la base, pero data.queries importa database: sin .env
+# se completan credenciales ficticias (el engine no se conecta al crearse). Los loaders de
+# bench_queries.py usan la base de POSTGRES_* (p. ej. la de tools/gold_sintetico.py)
+if not (Path(__file__).parent.parent / '.env').exists():
+    for variable, valor in (('POSTGRES_USER', 'benchmark'), ('POSTGRES_PASSWORD', 'benchmark'),
+                            ('POSTGRES_DB', 'benchmark')):
+        os.environ.setdefault(variable, valor)
+
+TAMANIOS = (1_000, 10_000, 100_000)
+
+
+def pytest_addoption(parser):
+    grupo = parser.getgroup('sales-dashboard')
+    grupo.addoption('--tamanios', default=','.join(map(str, TAMANIOS)),
+                    help="tamanios a medir, separados por coma (default: 1000,10000,100000)")
+    grupo.addoption('--memoria-base', default=None,
+                    help="JSON guardado por --benchmark-save contra el cual comparar el pico de memoria")
+    grupo.addoption('--memoria-tolerancia', type=float, default=0.2,
+                    help="aumento de pico de memoria tolerado contra --memoria-base (default: 0.2 = 20%%)")
+
+
+def pytest_generate_tests(metafunc):
+    if 'tamanio' in metafunc.fixturenames:
+        tamanios = [int(t) for t in metafunc.config.getoption('tamanios').split(',') if t]
+        metafunc.parametrize('tamanio', tamanios, ids=[f'{t // 1000}k' for t in tamanios])
+
+
+def _picos_base(config):
+    ruta = config.getoption('memoria_base')
+    if not ruta:
+        return {}
+    with open(ruta) as f:
+        guardado = json.load(f)
+    return {b['fullname']: b['extra_info'].get('memoria_pico_mb')
+            for b in guardado.get('benchmarks', []) if 'memoria_pico_mb' in b.get('extra_info', {})}
+
+
+@pytest.fixture(scope='session')
+def picos_base(request):
+    return _picos_base(request.config)
+
+
+@pytest.fixture
+def medir(benchmark, request, picos_base):
+    """
+    medir(funcion, *args, preparar=None): mide el tiempo con pytest-benchmark y el
+    pico de memoria de una corrida aparte con tracemalloc (en extra_info).
+    preparar() devuelve los argumentos de cada ronda, para funciones que modifican
+    su entrada. Falla si el pico supera el del baseline mas la tolerancia.
+    """
+    def _medir(funcion, *args, preparar=None):
+        argumentos = preparar() if preparar is not None else args
+        tracemalloc.start()
+        try:
+            funcion(*argumentos)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        pico_mb = pico / 1024 / 1024
+        benchmark.extra_info['memoria_pico_mb'] = round(pico_mb, 3)
+
+        if preparar is not None:
+            resultado = benchmark.pedantic(funcion, setup=lambda: (preparar(), {}), rounds=5, iterations=1)
+        else:
+            resultado = benchmark(funcion, *args)
+
+        base = picos_base.get(request.node.nodeid)
+        tolerancia = request.config.getoption('memoria_tolerancia')
+        if base and pico_mb > base * (1 + tolerancia):
+            pytest.fail(f"Pico de memoria {pico_mb:.1f} MB supera el baseline {base:.1f} MB "
+                        f"(+{tolerancia:.0%} tolerado)")
+        return resultado
+    return _medir
@@ -0,0 +1,89 @@
+"""
+DataFrames sinteticos para los benchmarks, con las columnas que devuelven las
+queries de la base (mismo formato que cargar_ventas_por_cliente antes de
+_process_ventas_df y que cargar_ventas_cliente_detalle). Semilla fija: cada
+tamanio genera siempre los mismos datos.
+"""
+import numpy as np
+import pandas as pd
+
+# Centros de las sucursales (lat, lon) alrededor de Salta
+_SUCURSALES = [
+    ('Salta Capital', -24.79, -65.41),
+    ('Oran', -23.13, -64.33),
+    ('Tartagal', -22.52, -63.80),
+    ('Metan', -25.50, -64.97),
+    ('Cafayate', -26.07, -65.98),
+]
+_GENERICOS = ['CERVEZAS', 'GASEOSAS', 'AGUAS', 'JUGOS', 'VINOS', 'ENERGIZANTES', 'SNACKS', 'LACTEOS']
+
+
+def clientes_crudos(n, seed=0):
+    """n clientes como los devuelve la query de cargar_ventas_por_cliente (sin procesar)."""
+    rng = np.random.default_rng(seed)
+    suc = rng.integers(0, len(_SUCURSALES), n)
+    centros = np.array([[lat, lon] for _, lat, lon in _SUCURSALES])
+    # Rutas de ~150 clientes agrupadas alrededor de un punto de la sucursal
+    n_rutas = max(n // 150, 1)
+    ruta = rng.integers(0, n_rutas, n)
+    desvio_ruta = rng.normal(0, 0.08, (n_rutas, 2))
+    coords = centros[suc] + desvio_ruta[ruta] + rng.normal(0, 0.015, (n, 2))
+    # Algunos clientes sin coordenadas o lejos (outliers de zonas)
+    coords[rng.random(n) < 0.02] = np.nan
+    lejos = rng.random(n) < 0.005
+    coords[lejos] += rng.normal(0, 1.0, (lejos.sum(), 2))
+
+    fv1 = rng.random(n) < 0.8
+    id_ruta = (suc * 1000 + ruta).astype(float)
+    cantidad = np.where(rng.random(n) < 0.3, 0.0, rng.lognormal(3, 1.2, n).round())
+    return pd.DataFrame({
+        'id_cliente': np.arange(1, n + 1),
+        'razon_social': [f'CLIENTE {i}' for i in range(1, n + 1)],
+        'fantasia': '',
+        'latitud': coords[:, 0].astype(object),
+        'longitud': coords[:, 1].astype(object),
+        'localidad': np.array([s[0] for s in _SUCURSALES])[suc],
+        'provincia': 'SALTA',
+        'ramo': rng.choice(['Almacen', 'Kiosco', 'Supermercado', None], n),
+        'canal': rng.choice(['Tradicional', 'Moderno', None], n),
+        'segmento': rng.choice(['A', 'B', 'C'], n),
+        'subcanal': rng.choice(['Almacen', 'Autoservicio', 'Kiosco'], n),
+        'lista_precio': rng.choice(['Lista 1', 'Lista 2', None], n),
+        'id_lista_precio': rng.integers(1, 4, n),
+        'cantidad_total': cantidad.astype(object),
+        'facturacion': (cantidad * rng.uniform(2000, 9000, n)).astype(object),
+        'cantidad_documentos': (cantidad > 0) * rng.integers(1, 12, n),
+        'id_sucursal': suc + 1,
+        'id_ruta_fv1': np.where(fv1, id_ruta, np.nan),
+        'id_ruta_fv4': np.where(fv1, np.nan, id_ruta),
+        'preventista_fv1': np.where(fv1, [f'PREVENTISTA {r % 40}' for r in ruta], None),
+        'preventista_fv4': np.where(fv1, None, [f'PREVENTISTA {r % 40}' for r in ruta]),
+        'sucursal': np.array([s[0] for s in _SUCURSALES])[suc],
+    })
+
+
+def detalle_cliente(n_filas, n_meses=12, seed=0):
+    """
+    Detalle de un cliente como cargar_ventas_cliente_detalle: ~n_filas filas de
+    (articulo, mes) con ventas mas el resto del catalogo sin venta.
+    """
+    rng = np.random.default_rng(seed)
+    n_articulos = max(n_filas // (n_meses // 2), 10)
+    id_articulo = np.arange(1, n_articulos + 1)
+    generico = rng.choice(_GENERICOS, n_articulos)
+    marca = np.array([f'{g[:3]} MARCA {m}' for g, m in zip(generico, rng.integers(0, 12, n_articulos))])
+    catalogo = pd.DataFrame({'id_articulo': id_articulo, 'generico': generico, 'marca': marca,
+                             'articulo': [f'ARTICULO {i}' for i in id_articulo]})
+
+    vendidos = rng.random(n_articulos) < 0.7
+    art = rng.choice(id_articulo[vendidos], n_filas)
+    periodo = rng.integers(0, n_meses, n_filas) + 2024 * 12
+    ventas = (pd.DataFrame({'id_articulo': art, 'anio': periodo // 12, 'mes': periodo % 12 + 1,
+                            'bultos': rng.lognormal(1, 1, n_filas).round(1)})
+              .groupby(['id_articulo', 'anio', 'mes'], as_index=False)['bultos'].sum())
+    return catalogo.merge(ventas, on='id_articulo', how='left')
+
+
+def periodos(n_meses=12):
+    """Periodos [anio, mes] consecutivos desde enero de 2024."""
+    return [[2024 + i // 12, i % 12 + 1] for i in range(n_meses)]
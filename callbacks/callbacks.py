@@ -2,20 +2,82 @@
 Callbacks del dashboard.
 Define todas las interacciones y actualizaciones de la UI.
 """
+import functools
+
 import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from dash import callback, clientside_callback, Output, Input, State, html, ctx, no_update
+from dash import callback, clientside_callback, ClientsideFunction, Output, Input, State, ALL, html, ctx, no_update
 import dash_mantine_components as dmc
 
 from data.queries import (
     obtener_rutas, obtener_preventistas, obtener_marcas,
-    cargar_ventas_por_cliente, cargar_ventas_animacion, cargar_ventas_por_fecha,
-    cargar_ventas_por_cliente_generico, buscar_clientes,
+    cargar_ventas_animacion, cargar_ventas_por_fecha,
+    buscar_clientes,
+)
+from data.cache import (
+    normalizar_filtros, cargar_clientes_filtrados, cargar_indice_clusters, cargar_piramide_grilla,
+    cargar_raster_densidad, calcular_zonas_cacheadas, cargar_desglose_generico,
+    obtener_resumen_zona, aplicar_filtros_atributo, version_datos, FILTROS_ATRIBUTO,
+    cargar_conteos_animacion,
+)
+from data.facetas import indice_facetas, FACETAS
+from data.cancelacion import consulta_cancelable, ConsultaCancelada
+from routes.tiles import construir_capas_tiles
+from utils.trazas import trazado, fase
+from utils.visualization import COLORES_CALOR
+from utils.animacion import planificar_granularidad, pivotar_periodos, crear_figura_animada
+from utils.filtrado_navegador import separar_trazas_puntos
+from config import (
+    METRICA_LABELS, DARK, GENERICOS_HOVER_FIJOS, MVT_CONFIG, CLUSTER_CONFIG, ANIMACION_CONFIG, GRILLA_CONFIG,
+    DENSIDAD_CONFIG, FILTRADO_NAVEGADOR_CONFIG,
 )
-from utils.visualization import crear_grilla_calor_optimizada, calcular_zonas, COLORES_CALOR
-from config import METRICA_LABELS, DARK, GENERICOS_HOVER_FIJOS
+
+
+# =============================================================================
+# HELPER: Cancelacion de queries superadas
+# =============================================================================
+
+def _cancelable(n_salidas):
+    """
+    Corre el callback como ejecucion cancelable por (sesion, callback): el ultimo
+    argumento es el id de sesion ('sesion-id'). Si una ejecucion mas nueva de la
+    misma sesion lo supera, su query se cancela y el callback devuelve no_update.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args):
+            *args, sesion_id = args
+            try:
+                with consulta_cancelable(sesion_id, funcion.__name__):
+                    return funcion(*args)
+            except ConsultaCancelada:
+                return no_update if n_salidas == 1 else [no_update] * n_salidas
+        return envoltura
+    return decorador
+
+
+# =============================================================================
+# HELPER: Filtrado en el navegador
+# =============================================================================
+
+def _cargar_clientes_mapa(filtros, navegador):
+    """
+    Clientes de un mapa de puntos. Con filtrado en el navegador se cargan sin los
+    filtros de atributo (se aplican en el browser sobre datos-navegador-*); si el
+    periodo supera el maximo de clientes a enviar, se filtra en el servidor.
+
+    Returns:
+        (filtros usados, df, navegador efectivo)
+    """
+    if navegador:
+        filtros_periodo = {**filtros, **dict.fromkeys(FILTROS_ATRIBUTO)}
+        _, df = cargar_clientes_filtrados(filtros_periodo)
+        if len(df) <= min(FILTRADO_NAVEGADOR_CONFIG['max_clientes'], MVT_CONFIG['umbral_puntos']):
+            return filtros_periodo, df, True
+    _, df = cargar_clientes_filtrados(filtros)
+    return filtros, df, False
 
 
 # =============================================================================
@@ -60,21 +122,28 @@ def actualizar_rutas_preventistas(fuerza_venta):
      Output('filtro-localidad', 'data'),
      Output('filtro-lista-precio', 'data'),
      Output('filtro-sucursal', 'data')],
-    [Input('filtro-fechas', 'value')]
+    [Input('filtro-canal', 'value'),
+     Input('filtro-subcanal', 'value'),
+     Input('filtro-localidad', 'value'),
+     Input('filtro-lista-precio', 'value'),
+     Input('filtro-sucursal', 'value'),
+     Input('filtro-ruta', 'value'),
+     Input('filtro-preventista', 'value'),
+     Input('filtro-fuerza-venta', 'value')]
 )
-def actualizar_filtros(fechas_value):
-    """Actualiza opciones de filtros cuando cambian las fechas."""
-    start_date, end_date = (fechas_value or [None, None])[:2]
-    df = cargar_ventas_por_cliente(start_date, end_date)
-
-    canales = [{'label': c, 'value': c} for c in sorted(df['canal'].unique())]
-    subcanales = [{'label': s, 'value': s} for s in sorted(df['subcanal'].unique())]
-    localidades = [{'label': l, 'value': l} for l in sorted(df['localidad'].dropna().unique())]
-    lp_ids = sorted(df['id_lista_precio'].dropna().unique())
-    listas_precio = [{'label': str(int(l)), 'value': str(int(l))} for l in lp_ids]
-    sucursales = [{'label': s, 'value': s} for s in sorted(df['sucursal'].unique())]
-
-    return canales, subcanales, localidades, listas_precio, sucursales
+def actualizar_filtros(canales, subcanales, localidades, listas_precio, sucursales, rutas, preventistas,
+                       fuerza_venta):
+    """
+    Opciones de los filtros de cliente con la cantidad de clientes de cada valor
+    segun los demas filtros activos (indice de facetas en memoria, sin query).
+    """
+    filtros = normalizar_filtros(
+        canales=canales, subcanales=subcanales, localidades=localidades, listas_precio=listas_precio,
+        sucursales=sucursales, rutas=rutas, preventistas=preventistas, fuerza_venta=fuerza_venta,
+    )
+    opciones = indice_facetas(version_datos()).opciones(filtros)
+    return (opciones['canales'], opciones['subcanales'], opciones['localidades'],
+            opciones['listas_precio'], opciones['sucursales'])
 
 
 @callback(
@@ -93,8 +162,9 @@ def actualizar_marcas_por_generico(genericos_seleccionados):
 
 @callback(
     Output('filtro-sucursal', 'value'),
-    [Input('filtro-tipo-sucursal', 'value'),
-     Input('filtro-sucursal', 'data')],
+    Input('filtro-tipo-sucursal', 'value'),
+    # Las opciones cambian con cada filtro (conteos de facetas): son State para no pisar la seleccion
+    State('filtro-sucursal', 'data'),
     prevent_initial_call=True
 )
 def actualizar_sucursal_por_tipo(tipo_sucursal, opciones_sucursales):
@@ -180,19 +250,136 @@ def _build_zona_badge_content(nombre, n_total, resumen, total_act, total_ant, co
     return content
 
 
+# =============================================================================
+# HELPER: Clusters de clientes (indice precalculado por dataset)
+# =============================================================================
+
+def _build_cluster_trace(indice, zoom, metrica, modo='burbujas'):
+    """
+    Traza de clusters para el zoom actual (lookup en el indice, sin recalcular).
+    En modo 'burbujas' el color es el promedio de la metrica por cliente (escala 0-15);
+    en modo 'compro' es la proporcion de clientes que compraron.
+    """
+    clusters = indice.clusters(zoom)
+    n = clusters['n']
+    total = clusters['total']
+    con_ventas = clusters['con_ventas']
+    unidad = METRICA_LABELS[metrica]
+
+    if modo == 'compro':
+        color = con_ventas / n
+        marker_color = dict(
+            color=color, cmin=0, cmax=1,
+            colorscale=[[0, '#ff0000'], [0.5, 'rgb(240, 220, 0)'], [1, '#27ae60']],
+            showscale=True, colorbar=dict(title='% compro', tickformat='.0%'),
+        )
+    else:
+        color = total / n
+        marker_color = dict(
+            color=color, cmin=0, cmax=15,
+            colorscale=[[0, 'rgb(220, 40, 40)'], [0.5, 'rgb(240, 220, 0)'], [1, 'rgb(40, 180, 40)']],
+            showscale=True, colorbar=dict(title=unidad, tickformat=',.0f'),
+        )
+
+    return go.Scattermap(
+        lat=clusters['lat'], lon=clusters['lon'],
+        mode='markers+text',
+        marker=dict(size=np.clip(8 + 4 * np.sqrt(n), 8, 60), opacity=0.75, **marker_color),
+        text=[f"{int(v):,}" if v > 1 else '' for v in n],
+        textfont=dict(size=11, color='black'),
+        name=f'Clusters ({indice.n_puntos:,} clientes)',
+        hovertemplate=(
+            '<b>%{customdata[0]:,.0f} clientes</b><br>'
+            '%{customdata[1]:,.0f} ' + unidad + '<br>'
+            'Con ventas: %{customdata[2]:,.0f}'
+            '<extra></extra>'
+        ),
+        customdata=np.column_stack([n, total, con_ventas]),
+    )
+
+
+def _zoom_desde_relayout(relayout, zoom_actual):
+    """
+    Nivel de zoom entero desde relayoutData; no_update si no cambio de nivel. Se
+    guarda aunque los clusters esten apagados, asi al prenderlos se arman para el
+    zoom vigente (los mapas ignoran el cambio de nivel sin clusters).
+    """
+    if not relayout or 'map.zoom' not in relayout:
+        return no_update
+    nivel = int(relayout['map.zoom'])
+    if nivel == zoom_actual:
+        return no_update
+    return nivel
+
+
+@callback(
+    Output('zoom-mapa-ventas', 'data'),
+    Input('mapa-ventas', 'relayoutData'),
+    State('zoom-mapa-ventas', 'data'),
+    prevent_initial_call=True,
+)
+def actualizar_zoom_mapa_ventas(relayout, zoom_actual):
+    """Guarda el nivel de zoom del mapa de burbujas (pan sin cambio de nivel no dispara)."""
+    return _zoom_desde_relayout(relayout, zoom_actual)
+
+
+@callback(
+    Output('zoom-mapa-compro', 'data'),
+    Input('mapa-compro', 'relayoutData'),
+    State('zoom-mapa-compro', 'data'),
+    prevent_initial_call=True,
+)
+def actualizar_zoom_mapa_compro(relayout, zoom_actual):
+    """Guarda el nivel de zoom del mapa compro/no compro."""
+    return _zoom_desde_relayout(relayout, zoom_actual)
+
+
+# =============================================================================
+# HELPER: Animaciones con presupuesto de puntos
+# =============================================================================
+
+def _cargar_animacion(start_date, end_date, genericos, marcas, rutas, preventistas, fv, granularidad,
+                      canales, subcanales, localidades, listas_precio, sucursales):
+    """
+    Carga las ventas por periodo con la granularidad mas fina que entra en
+    ANIMACION_CONFIG['max_puntos'] (cuenta primero en SQL, sin traer filas; el
+    conteo se cachea por filtros). Retorna (df, granularidad_usada).
+    """
+    conteos = cargar_conteos_animacion(normalizar_filtros(
+        fecha_desde=start_date, fecha_hasta=end_date, genericos=genericos, marcas=marcas,
+        rutas=rutas, preventistas=preventistas, fuerza_venta=fv
+    ))
+    granularidad_usada = planificar_granularidad(conteos, granularidad, ANIMACION_CONFIG['max_puntos'])
+    df = cargar_ventas_animacion(start_date, end_date, genericos, marcas, rutas, preventistas, fv, granularidad_usada)
+    df = aplicar_filtros_atributo(df, canales, subcanales, localidades, listas_precio, sucursales)
+    return df, granularidad_usada
+
+
+def _titulo_animacion(granularidad, granularidad_usada, pivote):
+    """Aviso de ajustes del planificador (granularidad mas gruesa o clientes recortados)."""
+    avisos = []
+    if granularidad_usada != granularidad:
+        avisos.append(f"granularidad ajustada a {granularidad_usada}")
+    if pivote['descartados']:
+        avisos.append(f"{pivote['descartados']:,} clientes de menor volumen omitidos")
+    return f"Limite de puntos: {', '.join(avisos)}" if avisos else None
+
+
 # =============================================================================
 # CALLBACK MAPA DE BURBUJAS
 # =============================================================================
 
 @callback(
     [Output('mapa-ventas', 'figure'),
-     Output('route-badges-overlay', 'children')],
+     Output('route-badges-overlay', 'children'),
+     Output('badges-filtros', 'data'),
+     Output('datos-navegador-ventas', 'data')],
     [Input('filtro-fechas', 'value'),
-     Input('filtro-canal', 'value'),
-     Input('filtro-subcanal', 'value'),
-     Input('filtro-localidad', 'value'),
-     Input('filtro-lista-precio', 'value'),
-     Input('filtro-sucursal', 'value'),
+     State('filtro-canal', 'value'),
+     State('filtro-subcanal', 'value'),
+     State('filtro-localidad', 'value'),
+     State('filtro-lista-precio', 'value'),
+     State('filtro-sucursal', 'value'),
      Input('filtro-metrica', 'value'),
      Input('filtro-generico', 'value'),
      Input('filtro-marca', 'value'),
@@ -201,40 +388,54 @@ def _build_zona_badge_content(nombre, n_total, resumen, total_act, total_ant, co
      Input('filtro-fuerza-venta', 'value'),
      Input('opciones-zonas', 'value'),
      Input('opcion-animacion', 'checked'),
-     Input('granularidad-animacion', 'value')],
+     Input('granularidad-animacion', 'value'),
+     Input('opcion-clusters', 'checked'),
+     Input('zoom-mapa-ventas', 'data'),
+     Input('disparo-atributos-ventas', 'data'),
+     Input('opcion-filtrado-navegador', 'checked')],
+    State('sesion-id', 'data'),
 )
+@_cancelable(4)
+@trazado('callback.actualizar_mapa')
 def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_precio,
                     sucursales, metrica, genericos, marcas, rutas, preventistas,
-                    fuerza_venta, opciones_zonas, opcion_animacion, granularidad):
+                    fuerza_venta, opciones_zonas, opcion_animacion, granularidad,
+                    opcion_clusters, zoom_clusters, _disparo, filtrado_navegador):
     """Actualiza el mapa y KPIs segun los filtros."""
     route_badges = []
+    trazas_puntos = []
 
     start_date, end_date = (fechas_value or [None, None])[:2]
     fv = fuerza_venta if fuerza_venta != 'TODOS' else None
     usar_animacion = opcion_animacion or False
-    granularidad = granularidad or 'semana'
 
-    # Cargar datos
+    # El nivel de zoom solo cambia el mapa con clusters (el animado no los usa)
+    if ctx.triggered_id == 'zoom-mapa-ventas' and (not opcion_clusters or usar_animacion):
+        return no_update, no_update, no_update, no_update
+    granularidad = granularidad or 'semana'
+    # Filtros de atributo en el navegador solo con el mapa de puntos simple
+    navegador = bool(filtrado_navegador) and not (usar_animacion or opciones_zonas or opcion_clusters)
+
+    filtros = normalizar_filtros(
+        fecha_desde=start_date, fecha_hasta=end_date, genericos=genericos, marcas=marcas,
+        rutas=rutas, preventistas=preventistas, fuerza_venta=fv, canales=canales,
+        subcanales=subcanales, localidades=localidades, listas_precio=listas_precio,
+        sucursales=sucursales
+    )
+
+    # Cargar datos (el dataset estatico se comparte entre mapas via cache)
+    fase('datos')
     if usar_animacion:
-        df = cargar_ventas_animacion(start_date, end_date, genericos, marcas, rutas, preventistas, fv, granularidad)
+        df, granularidad_usada = _cargar_animacion(
+            start_date, end_date, genericos, marcas, rutas, preventistas, fv, granularidad,
+            canales, subcanales, localidades, listas_precio, sucursales
+        )
     else:
-        df = cargar_ventas_por_cliente(start_date, end_date, genericos, marcas, rutas, preventistas, fv)
-
-    # Aplicar filtros
-    if canales and len(canales) > 0:
-        df = df[df['canal'].isin(canales)]
-    if subcanales and len(subcanales) > 0:
-        df = df[df['subcanal'].isin(subcanales)]
-    if localidades and len(localidades) > 0:
-        df = df[df['localidad'].isin(localidades)]
-    if listas_precio and len(listas_precio) > 0:
-        lp_ids = [int(l) for l in listas_precio]
-        df = df[df['id_lista_precio'].isin(lp_ids)]
-    if sucursales and len(sucursales) > 0:
-        df = df[df['sucursal'].isin(sucursales)]
+        filtros, df, navegador = _cargar_clientes_mapa(filtros, navegador)
 
     metrica_labels = METRICA_LABELS
 
+    fase('preparacion')
     if len(df) > 0:
         # Filtrar clientes con coordenadas válidas SOLO para visualización del mapa
         df_mapa = df[
@@ -256,33 +457,41 @@ def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_preci
 
         # MAPA ANIMADO
         if usar_animacion and 'periodo' in df.columns:
-            df_con_ventas = df_mapa[df_mapa['cantidad_total'] > 0].copy()
-            if len(df_con_ventas) > 0:
-                # Escala fija 0-15: tamaño y color
-                df_con_ventas['size'] = 5 + (df_con_ventas[metrica].clip(upper=15) / 15 * 15)
-
-                fig = px.scatter_map(
-                    df_con_ventas,
-                    lat='latitud', lon='longitud',
-                    size='size', color=metrica,
-                    color_continuous_scale=[[0, 'rgb(30, 80, 180)'], [0.35, 'rgb(0, 180, 220)'], [0.65, 'rgb(80, 200, 80)'], [1, 'rgb(240, 220, 0)']],
-                    range_color=[0, 15],
-                    animation_frame='periodo',
-                    hover_name='razon_social',
-                    hover_data={'latitud': False, 'longitud': False, 'size': False, 'periodo': True, metrica: ':,.0f'},
-                    zoom=zoom_level, center=dict(lat=center_lat, lon=center_lon),
-                    map_style='open-street-map', opacity=0.8
+            fase('figura')
+            # Frames desde la matriz cliente x periodo (sin celdas vacias, dentro del presupuesto)
+            pivote = pivotar_periodos(df_mapa, metrica, ANIMACION_CONFIG['max_puntos'])
+            if pivote is not None:
+                unidad = metrica_labels[metrica]
+
+                def _traza_burbujas(lat, lon, valores, nombres, periodo):
+                    # Escala fija 0-15: tamaño y color
+                    return go.Scattermap(
+                        lat=lat, lon=lon, mode='markers',
+                        marker=dict(
+                            size=5 + np.minimum(valores, 15) / 15 * 15,
+                            color=valores, cmin=0, cmax=15,
+                            colorscale=[[0, 'rgb(30, 80, 180)'], [0.35, 'rgb(0, 180, 220)'], [0.65, 'rgb(80, 200, 80)'], [1, 'rgb(240, 220, 0)']],
+                            showscale=True,
+                            colorbar=dict(title=unidad, tickformat=',.0f'),
+                            opacity=0.8,
+                        ),
+                        text=nombres, name=str(periodo), showlegend=False,
+                        hovertemplate=f'<b>%{{text}}</b><br>periodo={periodo}<br>{unidad}=%{{marker.color:,.0f}}<extra></extra>',
+                    )
+
+                fig = crear_figura_animada(
+                    pivote, _traza_burbujas, center=dict(lat=center_lat, lon=center_lon), zoom=zoom_level,
+                    duracion_frame=ANIMACION_CONFIG['duracion_frame'],
+                    duracion_transicion=ANIMACION_CONFIG['duracion_transicion'],
                 )
                 fig.update_layout(
+                    title=dict(text=_titulo_animacion(granularidad, granularidad_usada, pivote), font=dict(size=12)),
                     margin={'r': 0, 't': 30, 'l': 0, 'b': 0},
-                    coloraxis_colorbar=dict(title=metrica_labels[metrica], tickformat=',.0f'),
                     hoverlabel=dict(
                         font=dict(family='monospace', size=12, color=DARK['text']),
                         align='left'
                     )
                 )
-                fig.layout.updatemenus[0].buttons[0].args[1]['frame']['duration'] = 800
-                fig.layout.updatemenus[0].buttons[0].args[1]['transition']['duration'] = 300
             else:
                 fig = px.scatter_map(lat=[-24.8], lon=[-65.4], zoom=7, map_style='open-street-map')
                 fig.update_layout(margin={'r': 0, 't': 0, 'l': 0, 'b': 0})
@@ -293,39 +502,47 @@ def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_preci
             df_con_ventas = df_mapa[df_mapa['cantidad_total'] > 0].copy()
             df_sin_ventas = df_mapa[df_mapa['cantidad_total'] == 0].copy()
 
-            # Cargar desglose por genérico para hover (mes actual y anterior)
-            df_generico = cargar_ventas_por_cliente_generico(
-                genericos, marcas, rutas, preventistas, fv
-            )
-            # Formatear desglose como texto por cliente (MAct | MAnt)
-            if len(df_generico) > 0:
-                def _fmt_generico(grupo):
-                    lines = ['<b>Genérico        MAct |  MAnt</b>']
-                    seen = set()
-                    for _, row in grupo.iterrows():
-                        act = f"{row['bultos_act']:,.0f}" if row['bultos_act'] else '0'
-                        ant = f"{row['bultos_ant']:,.0f}" if row['bultos_ant'] else '0'
-                        gen_name = row['generico']
-                        seen.add(gen_name)
-                        gen = gen_name[:14]
-                        lines.append(f"{gen:<14} <b>{act:>6}</b> | {ant:>6}")
-                    for gen_name in GENERICOS_HOVER_FIJOS:
-                        if gen_name not in seen:
+            # Clusters por debajo de zoom_max; si no, con muchos clientes
+            # los puntos se sirven como vector tiles (solo el viewport)
+            zoom_clusters = zoom_level if zoom_clusters is None else zoom_clusters
+            usar_clusters = bool(opcion_clusters) and zoom_clusters < CLUSTER_CONFIG['zoom_max']
+            usar_tiles = not usar_clusters and len(df_mapa) > MVT_CONFIG['umbral_puntos']
+            usar_puntos = not (usar_clusters or usar_tiles)
+
+            # Desglose por genérico para hover (mes actual y anterior): solo si se dibujan
+            # puntos; con clusters o tiles no hay hover por cliente
+            if usar_puntos:
+                fase('hover')
+                df_generico = cargar_desglose_generico(filtros)
+                # Formatear desglose como texto por cliente (MAct | MAnt)
+                if len(df_generico) > 0:
+                    def _fmt_generico(grupo):
+                        lines = ['<b>Genérico        MAct |  MAnt</b>']
+                        seen = set()
+                        for _, row in grupo.iterrows():
+                            act = f"{row['bultos_act']:,.0f}" if row['bultos_act'] else '0'
+                            ant = f"{row['bultos_ant']:,.0f}" if row['bultos_ant'] else '0'
+                            gen_name = row['generico']
+                            seen.add(gen_name)
                             gen = gen_name[:14]
-                            lines.append(f"{gen:<14} <b>{'0':>6}</b> | {'0':>6}")
-                    return '<br>'.join(lines)
-                desglose_map = df_generico.groupby('id_cliente').apply(_fmt_generico).to_dict()
-            else:
-                desglose_map = {}
-
-            # Desglose default para clientes sin ventas históricas
-            _default_lines = ['<b>Genérico        MAct |  MAnt</b>']
-            for gen_name in GENERICOS_HOVER_FIJOS:
-                gen = gen_name[:14]
-                _default_lines.append(f"{gen:<14} <b>{'0':>6}</b> | {'0':>6}")
-            _default_desglose = '<br>'.join(_default_lines)
-
-            df_con_ventas['desglose_generico'] = df_con_ventas['id_cliente'].map(desglose_map).fillna(_default_desglose)
+                            lines.append(f"{gen:<14} <b>{act:>6}</b> | {ant:>6}")
+                        for gen_name in GENERICOS_HOVER_FIJOS:
+                            if gen_name not in seen:
+                                gen = gen_name[:14]
+                                lines.append(f"{gen:<14} <b>{'0':>6}</b> | {'0':>6}")
+                        return '<br>'.join(lines)
+                    desglose_map = df_generico.groupby('id_cliente').apply(_fmt_generico).to_dict()
+                else:
+                    desglose_map = {}
+
+                # Desglose default para clientes sin ventas históricas
+                _default_lines = ['<b>Genérico        MAct |  MAnt</b>']
+                for gen_name in GENERICOS_HOVER_FIJOS:
+                    gen = gen_name[:14]
+                    _default_lines.append(f"{gen:<14} <b>{'0':>6}</b> | {'0':>6}")
+                _default_desglose = '<br>'.join(_default_lines)
+
+                df_con_ventas['desglose_generico'] = df_con_ventas['id_cliente'].map(desglose_map).fillna(_default_desglose)
 
             # Pre-formatear líneas de info para hover tabular
             def _build_hover_lines(df):
@@ -335,43 +552,18 @@ def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_preci
                 df['_h_line2'] = df.apply(lambda r: f"LP    {str(r['lista_precio']):<{W}}Suc   {r['sucursal']}", axis=1)
                 return df
 
+            fase('figura')
             fig = go.Figure()
 
             # Zonas (usar df_mapa con coordenadas válidas)
             if opciones_zonas:
                 for tipo_zona in opciones_zonas:
-                    zonas = calcular_zonas(df_mapa, tipo_zona)
-                    for zona in zonas:
+                    zonas = calcular_zonas_cacheadas(df_mapa, tipo_zona)
+                    for idx_zona, zona in enumerate(zonas):
                         n_total = zona['n_clientes']
+                        clave_badge = f"{tipo_zona}|{idx_zona}"
 
-                        # Construir contenido para badge overlay
-                        badge_content = []
-                        if len(df_generico) > 0:
-                            clientes_zona = set(zona.get('clientes', []))
-                            df_zona_gen = df_generico[df_generico['id_cliente'].isin(clientes_zona)]
-                            if len(df_zona_gen) > 0:
-                                df_zg = df_zona_gen.copy()
-                                df_zg['compro_act'] = df_zg['bultos_act'] > 0
-                                df_zg['compro_ant'] = df_zg['bultos_ant'] > 0
-                                resumen = df_zg.groupby('generico').agg(
-                                    bultos_act=('bultos_act', 'sum'),
-                                    bultos_ant=('bultos_ant', 'sum'),
-                                    cli_act=('compro_act', 'sum'),
-                                    cli_ant=('compro_ant', 'sum'),
-                                ).sort_values('bultos_act', ascending=False)
-
-                                total_act = resumen['bultos_act'].sum()
-                                total_ant = resumen['bultos_ant'].sum()
-
-                                badge_content = _build_zona_badge_content(
-                                    zona['nombre'], n_total, resumen,
-                                    total_act, total_ant, zona['color_borde']
-                                )
-
-                        if not badge_content:
-                            badge_content = [html.Div(f"{zona['nombre']} — {n_total} clientes",
-                                                      style={'padding': '8px', 'color': '#fff'})]
-
+                        # Solo la etiqueta; el contenido se carga al abrir (cargar_contenido_badge)
                         route_badges.append(
                             dmc.HoverCard(
                                 position='bottom', withArrow=True, shadow='md',
@@ -379,6 +571,7 @@ def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_preci
                                     dmc.HoverCardTarget(
                                         html.Div(
                                             zona['nombre'],
+                                            className='badge-zona',
                                             style={
                                                 'padding': '4px 10px',
                                                 'borderRadius': '12px',
@@ -389,11 +582,16 @@ def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_preci
                                                 'cursor': 'pointer',
                                                 'whiteSpace': 'nowrap',
                                                 'border': f"1px solid {zona['color_borde']}",
-                                            }
+                                            },
+                                            **{'data-zona': clave_badge},
                                         )
                                     ),
                                     dmc.HoverCardDropdown(
-                                        badge_content,
+                                        html.Div(
+                                            html.Div(f"{zona['nombre']} — {n_total} clientes",
+                                                     style={'padding': '8px', 'color': '#fff'}),
+                                            id={'type': 'badge-zona-contenido', 'index': clave_badge},
+                                        ),
                                         style={
                                             'backgroundColor': DARK['card'],
                                             'border': f"1px solid {DARK['border']}",
@@ -416,11 +614,30 @@ def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_preci
                             showlegend=True
                         ))
 
+            if usar_clusters:
+                indice = cargar_indice_clusters(filtros, metrica)
+                fig.add_trace(_build_cluster_trace(indice, zoom_clusters, metrica))
+
+            if usar_tiles:
+                # Sin hover por punto: las capas vectoriales no soportan customdata.
+                # Trace vacio solo para mostrar la escala de color.
+                fig.add_trace(go.Scattermap(
+                    lat=[None, None], lon=[None, None], mode='markers',
+                    marker=dict(
+                        size=0, color=[0, 15], cmin=0, cmax=15,
+                        colorscale=[[0, 'rgb(220, 40, 40)'], [0.5, 'rgb(240, 220, 0)'], [1, 'rgb(40, 180, 40)']],
+                        showscale=True,
+                        colorbar=dict(title=metrica_labels[metrica], tickformat=',.0f'),
+                    ),
+                    name=f'Clientes ({len(df_mapa):,})', hoverinfo='skip'
+                ))
+
             # Clientes sin ventas (marcados con circulo rojo)
-            if len(df_sin_ventas) > 0:
+            if len(df_sin_ventas) > 0 and usar_puntos:
                 df_sin_ventas = df_sin_ventas.copy()
                 df_sin_ventas['desglose_generico'] = df_sin_ventas['id_cliente'].map(desglose_map).fillna(_default_desglose)
                 df_sin_ventas = _build_hover_lines(df_sin_ventas)
+                trazas_puntos.append((len(fig.data), df_sin_ventas, None))
                 fig.add_trace(go.Scattermap(
                     lat=df_sin_ventas['latitud'], lon=df_sin_ventas['longitud'],
                     mode='markers',
@@ -443,7 +660,7 @@ def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_preci
                 ))
 
             # Clientes con ventas
-            if len(df_con_ventas) > 0:
+            if len(df_con_ventas) > 0 and usar_puntos:
                 # Escala fija 0-15: tamaño y color
                 size_normalized = 5 + (df_con_ventas[metrica].clip(upper=15) / 15 * 15)
 
@@ -455,6 +672,7 @@ def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_preci
                     ), axis=1
                 )
 
+                trazas_puntos.append((len(fig.data), df_con_ventas, None))
                 fig.add_trace(go.Scattermap(
                     lat=df_con_ventas['latitud'], lon=df_con_ventas['longitud'],
                     mode='markers',
@@ -486,7 +704,12 @@ def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_preci
                 ))
 
             fig.update_layout(
-                map=dict(style='open-street-map', center=dict(lat=center_lat, lon=center_lon), zoom=zoom_level),
+                map=dict(
+                    style='open-street-map', center=dict(lat=center_lat, lon=center_lon), zoom=zoom_level,
+                    layers=construir_capas_tiles(filtros, metrica, modo='burbujas') if usar_tiles else [],
+                ),
+                # Con clusters o filtrado en el navegador, mantener el viewport del usuario
+                uirevision='clusters' if opcion_clusters else ('navegador' if navegador else None),
                 margin={'r': 0, 't': 0, 'l': 0, 'b': 0},
                 showlegend=True,
                 legend=dict(yanchor='top', y=0.99, xanchor='left', x=0.01, bgcolor='rgba(255,255,255,0.8)'),
@@ -499,7 +722,62 @@ def actualizar_mapa(fechas_value, canales, subcanales, localidades, listas_preci
         fig = px.scatter_map(lat=[-24.8], lon=[-65.4], zoom=7, map_style='open-street-map')
         fig.update_layout(margin={'r': 0, 't': 0, 'l': 0, 'b': 0})
 
-    return fig, route_badges
+    datos_navegador = separar_trazas_puntos(fig, trazas_puntos, FACETAS) if navegador else None
+    return fig, route_badges, filtros, datos_navegador
+
+
+# =============================================================================
+# CALLBACKS BADGES DE ZONAS (contenido bajo demanda)
+# =============================================================================
+
+# HoverCard no expone 'opened': un listener delegado en el overlay avisa que badge
+# se esta abriendo (una sola vez por badge y render) via set_props.
+clientside_callback(
+    """
+    function(children) {
+        var overlay = document.getElementById('route-badges-overlay');
+        window._badgesZonaCargados = {};
+        if (overlay && !overlay._listenerBadges) {
+            overlay._listenerBadges = true;
+            overlay.addEventListener('mouseover', function(e) {
+                var badge = e.target.closest('[data-zona]');
+                if (!badge) return;
+                var zona = badge.getAttribute('data-zona');
+                if (window._badgesZonaCargados[zona]) return;
+                window._badgesZonaCargados[zona] = true;
+                window.dash_clientside.set_props('badge-zona-abierta', {data: zona});
+            });
+        }
+        return window.dash_clientside.no_update;
+    }
+    """,
+    Output('badge-zona-abierta', 'data'),
+    Input('route-badges-overlay', 'children'),
+)
+
+
+@callback(
+    Output({'type': 'badge-zona-contenido', 'index': ALL}, 'children'),
+    Input('badge-zona-abierta', 'data'),
+    State({'type': 'badge-zona-contenido', 'index': ALL}, 'id'),
+    State('badges-filtros', 'data'),
+    prevent_initial_call=True,
+)
+def cargar_contenido_badge(clave_badge, ids, filtros):
+    """Arma el resumen por genérico del badge que se abrio (desde los caches de zonas)."""
+    if not clave_badge or not filtros:
+        return [no_update] * len(ids)
+
+    tipo_zona, idx = clave_badge.split('|')
+    zona, resumen = obtener_resumen_zona(filtros, tipo_zona, int(idx))
+    if zona is None or resumen is None:
+        return [no_update] * len(ids)
+
+    contenido = _build_zona_badge_content(
+        zona['nombre'], zona['n_clientes'], resumen,
+        resumen['bultos_act'].sum(), resumen['bultos_ant'].sum(), zona['color_borde']
+    )
+    return [contenido if i['index'] == clave_badge else no_update for i in ids]
 
 
 # =============================================================================
@@ -615,8 +893,11 @@ clientside_callback(
      Input('slider-radio-difuso', 'value'),
      Input('tipo-normalizacion', 'value'),
      Input('opcion-animacion', 'checked'),
-     Input('granularidad-animacion', 'value')]
+     Input('granularidad-animacion', 'value')],
+    State('sesion-id', 'data'),
 )
+@_cancelable(1)
+@trazado('callback.actualizar_mapa_calor')
 def actualizar_mapa_calor(fechas_value, canales, subcanales, localidades, listas_precio,
                           sucursales, metrica, genericos, marcas, rutas, preventistas, fuerza_venta,
                           opciones_zonas, opcion_escala, precision, tipo_mapa, radio_difuso,
@@ -628,25 +909,23 @@ def actualizar_mapa_calor(fechas_value, canales, subcanales, localidades, listas
     usar_animacion = opcion_animacion or False
     granularidad = granularidad or 'semana'
 
+    fase('datos')
     if usar_animacion:
-        df = cargar_ventas_animacion(start_date, end_date, genericos, marcas, rutas, preventistas, fv, granularidad)
+        df, granularidad_usada = _cargar_animacion(
+            start_date, end_date, genericos, marcas, rutas, preventistas, fv, granularidad,
+            canales, subcanales, localidades, listas_precio, sucursales
+        )
     else:
-        df = cargar_ventas_por_cliente(start_date, end_date, genericos, marcas, rutas, preventistas, fv)
-
-    # Aplicar filtros
-    if canales and len(canales) > 0:
-        df = df[df['canal'].isin(canales)]
-    if subcanales and len(subcanales) > 0:
-        df = df[df['subcanal'].isin(subcanales)]
-    if localidades and len(localidades) > 0:
-        df = df[df['localidad'].isin(localidades)]
-    if listas_precio and len(listas_precio) > 0:
-        lp_ids = [int(l) for l in listas_precio]
-        df = df[df['id_lista_precio'].isin(lp_ids)]
-    if sucursales and len(sucursales) > 0:
-        df = df[df['sucursal'].isin(sucursales)]
+        filtros = normalizar_filtros(
+            fecha_desde=start_date, fecha_hasta=end_date, genericos=genericos, marcas=marcas,
+            rutas=rutas, preventistas=preventistas, fuerza_venta=fv, canales=canales,
+            subcanales=subcanales, localidades=localidades, listas_precio=listas_precio,
+            sucursales=sucursales
+        )
+        _, df = cargar_clientes_filtrados(filtros)
 
     # Filtrar clientes con coordenadas válidas para el mapa de calor
+    fase('figura')
     df_mapa = df[
         (df['latitud'].notna()) &
         (df['longitud'].notna()) &
@@ -671,79 +950,64 @@ def actualizar_mapa_calor(fechas_value, canales, subcanales, localidades, listas
 
         # MAPA ANIMADO
         if usar_animacion and 'periodo' in df_con_ventas.columns:
-            df_con_ventas['metrica_z'] = df_con_ventas[metrica]
+            pivote = pivotar_periodos(df_con_ventas, metrica, ANIMACION_CONFIG['max_puntos'])
+            if pivote is None:
+                return px.density_map(lat=[-24.8], lon=[-65.4], zoom=7, map_style='open-street-map')
             if usar_log:
-                df_con_ventas['metrica_z'] = np.log1p(df_con_ventas['metrica_z'])
-
-            # Rango dinamico basado en datos filtrados
-            z_min = df_con_ventas['metrica_z'].min()
-            z_max = df_con_ventas['metrica_z'].max()
-
-            fig = px.density_map(
-                df_con_ventas, lat='latitud', lon='longitud', z='metrica_z',
-                radius=radio_difuso, opacity=0.5, animation_frame='periodo',
-                center=dict(lat=center_lat, lon=center_lon), zoom=8,
-                map_style='open-street-map',
-                color_continuous_scale=[
-                    [0.0, 'rgb(0, 0, 150)'], [0.15, 'rgb(0, 100, 255)'],
-                    [0.3, 'rgb(0, 200, 255)'], [0.45, 'rgb(0, 255, 150)'],
-                    [0.55, 'rgb(200, 255, 0)'], [0.7, 'rgb(255, 200, 0)'],
-                    [0.85, 'rgb(255, 100, 0)'], [1.0, 'rgb(200, 0, 0)']
-                ],
-                range_color=[z_min, z_max]
+                pivote['matriz'] = np.log1p(pivote['matriz'])
+
+            # Rango dinamico basado en datos filtrados (solo celdas con actividad)
+            activos = pivote['matriz'][pivote['matriz'] > 0]
+            z_min, z_max = activos.min(), activos.max()
+
+            def _traza_calor(lat, lon, valores, nombres, periodo):
+                return go.Densitymap(
+                    lat=lat, lon=lon, z=valores, radius=radio_difuso, opacity=0.5,
+                    colorscale=DENSIDAD_CONFIG['escala'], zmin=z_min, zmax=z_max,
+                    colorbar=dict(title=metrica_labels[metrica] + escala_texto, tickformat=',.0f'),
+                    name=str(periodo), hoverinfo='skip',
+                )
+
+            fig = crear_figura_animada(
+                pivote, _traza_calor, center=dict(lat=center_lat, lon=center_lon), zoom=8,
+                duracion_frame=ANIMACION_CONFIG['duracion_frame'],
+                duracion_transicion=ANIMACION_CONFIG['duracion_transicion'],
             )
             fig.update_layout(
+                title=dict(text=_titulo_animacion(granularidad, granularidad_usada, pivote), font=dict(size=12)),
                 margin={'r': 0, 't': 30, 'l': 0, 'b': 0},
-                coloraxis_colorbar=dict(title=metrica_labels[metrica] + escala_texto, tickformat=',.0f')
             )
-            if hasattr(fig.layout, 'updatemenus') and fig.layout.updatemenus:
-                fig.layout.updatemenus[0].buttons[0].args[1]['frame']['duration'] = 800
-                fig.layout.updatemenus[0].buttons[0].args[1]['transition']['duration'] = 300
 
         elif tipo_mapa == 'density':
-            # MAPA DIFUSO
-            if tipo_normalizacion == 'percentil':
-                df_con_ventas['metrica_z'] = df_con_ventas[metrica].rank(pct=True) * 100
-                norm_texto = " [percentil]"
-                range_color = [0, 100]
-            elif tipo_normalizacion == 'limitado':
-                p95 = df_con_ventas[metrica].quantile(0.95)
-                df_con_ventas['metrica_z'] = df_con_ventas[metrica].clip(upper=p95)
-                norm_texto = " [p95]"
-                range_color = [0, p95]
-            else:
-                df_con_ventas['metrica_z'] = df_con_ventas[metrica]
-                norm_texto = ""
-                # Rango dinamico basado en datos filtrados
-                range_color = [df_con_ventas[metrica].min(), df_con_ventas[metrica].max()]
-
-            if usar_log and tipo_normalizacion == 'normal':
-                df_con_ventas['metrica_z'] = np.log1p(df_con_ventas['metrica_z'])
-                # Actualizar rango para escala logaritmica
-                range_color = [df_con_ventas['metrica_z'].min(), df_con_ventas['metrica_z'].max()]
-
-            fig = px.density_map(
-                df_con_ventas, lat='latitud', lon='longitud', z='metrica_z',
-                radius=radio_difuso, opacity=0.5,
-                center=dict(lat=center_lat, lon=center_lon), zoom=8,
-                map_style='open-street-map',
-                color_continuous_scale=[
-                    [0.0, 'rgb(0, 0, 150)'], [0.15, 'rgb(0, 100, 255)'],
-                    [0.3, 'rgb(0, 200, 255)'], [0.45, 'rgb(0, 255, 150)'],
-                    [0.55, 'rgb(200, 255, 0)'], [0.7, 'rgb(255, 200, 0)'],
-                    [0.85, 'rgb(255, 100, 0)'], [1.0, 'rgb(200, 0, 0)']
-                ],
-                range_color=range_color
-            )
+            # MAPA DIFUSO: raster KDE calculado en el servidor (capa de imagen)
+            norm_texto = {'percentil': " [percentil]", 'limitado': " [p95]"}.get(tipo_normalizacion, "")
+            capa = cargar_raster_densidad(filtros, metrica, radio_difuso, tipo_normalizacion,
+                                          usar_log and tipo_normalizacion == 'normal')
+
+            fig = go.Figure()
+            # Trace vacio solo para la escala de color del raster
+            fig.add_trace(go.Scattermap(
+                lat=[None, None], lon=[None, None], mode='markers',
+                marker=dict(
+                    size=0, color=capa['rango'], colorscale=DENSIDAD_CONFIG['escala'],
+                    showscale=True,
+                    colorbar=dict(title=metrica_labels[metrica] + escala_texto + norm_texto, tickformat=',.0f')
+                ),
+                showlegend=False, hoverinfo='skip'
+            ))
             fig.update_layout(
+                map=dict(
+                    style='open-street-map', center=dict(lat=center_lat, lon=center_lon), zoom=8,
+                    layers=[dict(sourcetype='image', source=capa['source'],
+                                 coordinates=capa['coordinates'], below='traces')],
+                ),
                 margin={'r': 0, 't': 30, 'l': 0, 'b': 0},
-                coloraxis_colorbar=dict(title=metrica_labels[metrica] + escala_texto + norm_texto, tickformat=',.0f')
             )
 
             # Zonas (usar df_mapa con coordenadas válidas)
             if opciones_zonas:
                 for tipo_zona in opciones_zonas:
-                    zonas = calcular_zonas(df_mapa, tipo_zona)
+                    zonas = calcular_zonas_cacheadas(df_mapa, tipo_zona)
                     for zona in zonas:
                         fig.add_trace(go.Scattermap(
                             lat=zona['lats'], lon=zona['lons'],
@@ -756,7 +1020,8 @@ def actualizar_mapa_calor(fechas_value, canales, subcanales, localidades, listas
 
         else:
             # MAPA GRILLA
-            grupos = crear_grilla_calor_optimizada(df_con_ventas, metrica, precision=precision, usar_log=usar_log)
+            piramide = cargar_piramide_grilla(filtros, metrica)
+            grupos = piramide.grupos(precision, usar_log=usar_log, n_grupos=GRILLA_CONFIG['n_grupos'])
 
             fig = go.Figure()
 
@@ -794,7 +1059,7 @@ def actualizar_mapa_calor(fechas_value, canales, subcanales, localidades, listas
             # Zonas (usar df_mapa con coordenadas válidas)
             if opciones_zonas:
                 for tipo_zona in opciones_zonas:
-                    zonas = calcular_zonas(df_mapa, tipo_zona)
+                    zonas = calcular_zonas_cacheadas(df_mapa, tipo_zona)
                     for zona in zonas:
                         fig.add_trace(go.Scattermap(
                             lat=zona['lats'], lon=zona['lons'],
@@ -826,45 +1091,55 @@ def actualizar_mapa_calor(fechas_value, canales, subcanales, localidades, listas
 # =============================================================================
 
 @callback(
-    Output('mapa-compro', 'figure'),
+    [Output('mapa-compro', 'figure'),
+     Output('datos-navegador-compro', 'data')],
     [Input('filtro-fechas', 'value'),
-     Input('filtro-canal', 'value'),
-     Input('filtro-subcanal', 'value'),
-     Input('filtro-localidad', 'value'),
-     Input('filtro-lista-precio', 'value'),
-     Input('filtro-sucursal', 'value'),
+     State('filtro-canal', 'value'),
+     State('filtro-subcanal', 'value'),
+     State('filtro-localidad', 'value'),
+     State('filtro-lista-precio', 'value'),
+     State('filtro-sucursal', 'value'),
      Input('filtro-generico', 'value'),
      Input('filtro-marca', 'value'),
      Input('filtro-ruta', 'value'),
      Input('filtro-preventista', 'value'),
      Input('filtro-fuerza-venta', 'value'),
-     Input('opciones-zonas', 'value')]
+     Input('opciones-zonas', 'value'),
+     Input('opcion-clusters', 'checked'),
+     Input('zoom-mapa-compro', 'data'),
+     Input('disparo-atributos-compro', 'data'),
+     Input('opcion-filtrado-navegador', 'checked')],
+    State('sesion-id', 'data'),
 )
+@_cancelable(2)
+@trazado('callback.actualizar_mapa_compro')
 def actualizar_mapa_compro(fechas_value, canales, subcanales, localidades, listas_precio,
                             sucursales, genericos, marcas, rutas, preventistas, fuerza_venta,
-                            opciones_zonas):
+                            opciones_zonas, opcion_clusters, zoom_clusters, _disparo, filtrado_navegador):
     """
     Mapa que muestra clientes que compraron (verde) vs no compraron (rojo) en el periodo.
     """
+    # El nivel de zoom solo cambia el mapa con clusters
+    if ctx.triggered_id == 'zoom-mapa-compro' and not opcion_clusters:
+        return no_update, no_update
+
     start_date, end_date = (fechas_value or [None, None])[:2]
     fv = fuerza_venta if fuerza_venta != 'TODOS' else None
 
-    # Cargar datos
-    df = cargar_ventas_por_cliente(start_date, end_date, genericos, marcas, rutas, preventistas, fv)
-
-    # Aplicar filtros
-    if canales and len(canales) > 0:
-        df = df[df['canal'].isin(canales)]
-    if subcanales and len(subcanales) > 0:
-        df = df[df['subcanal'].isin(subcanales)]
-    if localidades and len(localidades) > 0:
-        df = df[df['localidad'].isin(localidades)]
-    if listas_precio and len(listas_precio) > 0:
-        lp_ids = [int(l) for l in listas_precio]
-        df = df[df['id_lista_precio'].isin(lp_ids)]
-    if sucursales and len(sucursales) > 0:
-        df = df[df['sucursal'].isin(sucursales)]
+    filtros = normalizar_filtros(
+        fecha_desde=start_date, fecha_hasta=end_date, genericos=genericos, marcas=marcas,
+        rutas=rutas, preventistas=preventistas, fuerza_venta=fv, canales=canales,
+        subcanales=subcanales, localidades=localidades, listas_precio=listas_precio,
+        sucursales=sucursales
+    )
+
+    # Cargar datos (compartidos con los otros mapas via cache)
+    fase('datos')
+    navegador = bool(filtrado_navegador) and not (opciones_zonas or opcion_clusters)
+    filtros, df, navegador = _cargar_clientes_mapa(filtros, navegador)
+    trazas_puntos = []
 
+    fase('figura')
     if len(df) > 0:
         center_lat = df['latitud'].mean()
         center_lon = df['longitud'].mean()
@@ -873,12 +1148,19 @@ def actualizar_mapa_compro(fechas_value, canales, subcanales, localidades, lista
         df_compro = df[df['cantidad_total'] > 0].copy()
         df_no_compro = df[df['cantidad_total'] == 0].copy()
 
+        # Clusters por debajo de zoom_max; si no, con muchos clientes
+        # los puntos se sirven como vector tiles (solo el viewport)
+        zoom_clusters = 8 if zoom_clusters is None else zoom_clusters
+        usar_clusters = bool(opcion_clusters) and zoom_clusters < CLUSTER_CONFIG['zoom_max']
+        usar_tiles = not usar_clusters and len(df) > MVT_CONFIG['umbral_puntos']
+        usar_puntos = not (usar_clusters or usar_tiles)
+
         fig = go.Figure()
 
         # Zonas (si estan habilitadas)
         if opciones_zonas:
             for tipo_zona in opciones_zonas:
-                zonas = calcular_zonas(df, tipo_zona)
+                zonas = calcular_zonas_cacheadas(df, tipo_zona)
                 for zona in zonas:
                     fig.add_trace(go.Scattermap(
                         lat=zona['lats'], lon=zona['lons'],
@@ -889,8 +1171,22 @@ def actualizar_mapa_compro(fechas_value, canales, subcanales, localidades, lista
                         hoverinfo='name', showlegend=True
                     ))
 
+        if usar_clusters:
+            indice = cargar_indice_clusters(filtros, 'cantidad_total')
+            fig.add_trace(_build_cluster_trace(indice, zoom_clusters, 'cantidad_total', modo='compro'))
+
+        if usar_tiles:
+            # Trazas vacias solo para la leyenda; los puntos vienen de las capas vectoriales
+            fig.add_trace(go.Scattermap(lat=[None], lon=[None], mode='markers',
+                                        marker=dict(size=8, color='#ff0000'),
+                                        name=f'No compro ({len(df_no_compro):,})', hoverinfo='skip'))
+            fig.add_trace(go.Scattermap(lat=[None], lon=[None], mode='markers',
+                                        marker=dict(size=10, color='#27ae60'),
+                                        name=f'Compro ({len(df_compro):,})', hoverinfo='skip'))
+
         # Clientes que NO compraron (ROJO X)
-        if len(df_no_compro) > 0:
+        if len(df_no_compro) > 0 and usar_puntos:
+            trazas_puntos.append((len(fig.data), df_no_compro, 'No compro ({n})'))
             fig.add_trace(go.Scattermap(
                 lat=df_no_compro['latitud'],
                 lon=df_no_compro['longitud'],
@@ -903,7 +1199,8 @@ def actualizar_mapa_compro(fechas_value, canales, subcanales, localidades, lista
             ))
 
         # Clientes que SI compraron (VERDE)
-        if len(df_compro) > 0:
+        if len(df_compro) > 0 and usar_puntos:
+            trazas_puntos.append((len(fig.data), df_compro, 'Compro ({n})'))
             fig.add_trace(go.Scattermap(
                 lat=df_compro['latitud'],
                 lon=df_compro['longitud'],
@@ -916,7 +1213,11 @@ def actualizar_mapa_compro(fechas_value, canales, subcanales, localidades, lista
             ))
 
         fig.update_layout(
-            map=dict(style='open-street-map', center=dict(lat=center_lat, lon=center_lon), zoom=8),
+            map=dict(
+                style='open-street-map', center=dict(lat=center_lat, lon=center_lon), zoom=8,
+                layers=construir_capas_tiles(filtros, 'cantidad_total', modo='compro') if usar_tiles else [],
+            ),
+            uirevision='clusters' if opcion_clusters else ('navegador' if navegador else None),
             margin={'r': 0, 't': 0, 'l': 0, 'b': 0},
             showlegend=True,
             legend=dict(yanchor='top', y=0.99, xanchor='left', x=0.01, bgcolor='rgba(255,255,255,0.9)')
@@ -929,7 +1230,41 @@ def actualizar_mapa_compro(fechas_value, canales, subcanales, localidades, lista
             margin={'r': 0, 't': 0, 'l': 0, 'b': 0}
         )
 
-    return fig
+    datos_navegador = separar_trazas_puntos(fig, trazas_puntos, FACETAS) if navegador else None
+    return fig, datos_navegador
+
+
+# =============================================================================
+# CLIENTSIDE CALLBACKS - FILTRADO EN EL NAVEGADOR (assets/filtrado_navegador.js)
+# =============================================================================
+
+# Los filtros de atributo son State de los mapas de puntos: los dispara este store
+# solo cuando el mapa no tiene los clientes del periodo en el navegador
+for _mapa in ('ventas', 'compro'):
+    clientside_callback(
+        ClientsideFunction(namespace='filtrado_navegador', function_name='disparo'),
+        Output(f'disparo-atributos-{_mapa}', 'data'),
+        Input('filtro-canal', 'value'),
+        Input('filtro-subcanal', 'value'),
+        Input('filtro-localidad', 'value'),
+        Input('filtro-lista-precio', 'value'),
+        Input('filtro-sucursal', 'value'),
+        State('opcion-filtrado-navegador', 'checked'),
+        State(f'datos-navegador-{_mapa}', 'data'),
+    )
+
+    clientside_callback(
+        ClientsideFunction(namespace='filtrado_navegador', function_name='aplicar'),
+        Output(f'mapa-{_mapa}', 'figure', allow_duplicate=True),
+        Input('filtro-canal', 'value'),
+        Input('filtro-subcanal', 'value'),
+        Input('filtro-localidad', 'value'),
+        Input('filtro-lista-precio', 'value'),
+        Input('filtro-sucursal', 'value'),
+        Input(f'datos-navegador-{_mapa}', 'data'),
+        State(f'mapa-{_mapa}', 'figure'),
+        prevent_initial_call=True,
+    )
 
 
 # =============================================================================
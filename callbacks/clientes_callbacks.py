@@ -1,10 +1,13 @@
 """
 Callbacks de la pagina de busqueda de clientes.
 Busca clientes en dim_cliente y muestra resultados con links al detalle.
+Incluye el export Excel por lote (ZIP por ruta/preventista) con progreso.
 """
-from dash import callback, Output, Input, html, dcc, no_update
+from dash import callback, Output, Input, State, html, dcc, no_update
 
 from data.queries import buscar_clientes
+from data.lotes import iniciar_lote, leer_estado
+from routes.lotes import url_zip
 from config import DARK
 
 
@@ -90,3 +93,75 @@ def buscar_y_mostrar_clientes(texto):
         }),
         tabla,
     ])
+
+
+# =============================================================================
+# EXPORT EXCEL POR LOTE
+# =============================================================================
+
+def _progreso_lote(texto, hechos=0, total=0, color=None, descarga=None):
+    """Texto de estado y barra de progreso del lote (con link de descarga si esta listo)."""
+    porcentaje = 100 * hechos / total if total else 0
+    hijos = [
+        html.Div(texto, style={'fontSize': '13px', 'color': color or DARK['text_secondary'], 'marginBottom': '6px'}),
+        html.Div(html.Div(style={
+            'width': f'{porcentaje:.0f}%', 'height': '100%',
+            'backgroundColor': DARK['accent_green'], 'borderRadius': '4px',
+        }), style={'height': '8px', 'backgroundColor': DARK['surface'], 'borderRadius': '4px'}),
+    ]
+    if descarga:
+        hijos.append(html.A("Descargar ZIP", href=descarga, download='clientes_excel.zip', style={
+            'display': 'inline-block', 'marginTop': '8px', 'fontSize': '14px', 'color': DARK['accent_green'],
+        }))
+    return html.Div(hijos)
+
+
+@callback(
+    [Output('lote-job', 'data'),
+     Output('lote-intervalo', 'disabled'),
+     Output('lote-progreso', 'children')],
+    Input('btn-lote-excel', 'n_clicks'),
+    [State('lote-rutas', 'value'),
+     State('lote-preventistas', 'value')],
+    prevent_initial_call=True
+)
+def iniciar_export_lote(n_clicks, rutas, preventistas):
+    """Lanza el export por lote en segundo plano y activa el polling de progreso."""
+    if not n_clicks:
+        return no_update, no_update, no_update
+    if not rutas and not preventistas:
+        return no_update, True, _progreso_lote("Elegi al menos una ruta o preventista.", color=DARK['text_muted'])
+
+    job_id = iniciar_lote(rutas or None, preventistas or None)
+    if job_id is None:
+        return no_update, True, _progreso_lote("El directorio de lotes no es seguro (LOTE_CONFIG['directorio']).",
+                                               color=DARK['text_muted'])
+    return job_id, False, _progreso_lote("Cargando clientes...")
+
+
+@callback(
+    [Output('lote-progreso', 'children', allow_duplicate=True),
+     Output('lote-intervalo', 'disabled', allow_duplicate=True)],
+    Input('lote-intervalo', 'n_intervals'),
+    State('lote-job', 'data'),
+    prevent_initial_call=True
+)
+def actualizar_progreso_lote(n_intervals, job_id):
+    """
+    Muestra el progreso del lote y, cuando termina, el link al ZIP. El archivo lo
+    sirve la ruta /lotes/<job_id>.zip (routes/lotes.py) desde disco, sin pasar por
+    la respuesta del callback.
+    """
+    estado = leer_estado(job_id)
+    if estado is None:
+        return _progreso_lote("El export no esta disponible.", color=DARK['text_muted']), True
+
+    if estado['estado'] == 'error':
+        return _progreso_lote(f"Error: {estado['mensaje']}", color=DARK['text_muted']), True
+    if estado['estado'] == 'listo':
+        return (_progreso_lote(f"Listo: {estado['total']} clientes.", estado['total'], estado['total'],
+                               descarga=url_zip(job_id)), True)
+    if estado['estado'] == 'cargando':
+        return _progreso_lote("Cargando clientes..."), no_update
+    return (_progreso_lote(f"Generando {estado['hechos']} de {estado['total']} clientes...",
+                           estado['hechos'], estado['total']), no_update)
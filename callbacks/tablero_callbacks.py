@@ -7,7 +7,9 @@ import plotly.graph_objects as go
 from dash import callback, Output, Input, html
 
 from data.queries import cargar_ventas_por_fecha
-from config import DARK
+from data.cache import normalizar_filtros
+from data.cierres import ventas_mensuales
+from config import DARK, CIERRES_CONFIG
 
 # Colores para las líneas de años
 COLORES_ANIOS = [
@@ -25,6 +27,35 @@ COLORES_ANIOS = [
 MESES_ES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
 
 
+def _cargar_mensual(anio, metrica, canales, subcanales, localidades, listas_precio, sucursales,
+                    genericos, marcas, rutas, preventistas, fv):
+    """Metrica por mes del anio (solo meses con ventas)."""
+    # Meses cerrados del almacen inmutable (data/cierres.py); los documentos no
+    # estan en el almacen y van siempre por la query
+    if CIERRES_CONFIG['habilitado'] and metrica != 'cantidad_documentos':
+        filtros = normalizar_filtros(
+            genericos=genericos, marcas=marcas, rutas=rutas, preventistas=preventistas, fuerza_venta=fv,
+            canales=canales, subcanales=subcanales, localidades=localidades,
+            listas_precio=listas_precio, sucursales=sucursales,
+        )
+        return ventas_mensuales(anio, filtros)[['mes', metrica]]
+
+    df_fecha = cargar_ventas_por_fecha(
+        f"{anio}-01-01", f"{anio}-12-31",
+        canales, subcanales, localidades, listas_precio, sucursales,
+        genericos, marcas, rutas, preventistas, fv
+    )
+    if len(df_fecha) == 0:
+        return df_fecha
+
+    # Convertir fecha y extraer mes
+    df_fecha['fecha'] = pd.to_datetime(df_fecha['fecha'])
+    df_fecha['mes'] = df_fecha['fecha'].dt.month
+
+    # Agregar por mes
+    return df_fecha.groupby('mes')[metrica].sum().reset_index()
+
+
 @callback(
     Output('grafico-linea-tiempo', 'figure'),
     [Input('selector-anios', 'value'),
@@ -72,26 +103,14 @@ def actualizar_grafico_comparacion_anual(anios_seleccionados, canales, subcanale
     for i, anio in enumerate(anios_seleccionados):
         color = COLORES_ANIOS[i % len(COLORES_ANIOS)]
 
-        # Rango de fechas para el año completo
-        fecha_inicio = f"{anio}-01-01"
-        fecha_fin = f"{anio}-12-31"
-
-        # Cargar datos
+        # Cargar datos del año completo
         fv = fuerza_venta if fuerza_venta != 'TODOS' else None
-        df_fecha = cargar_ventas_por_fecha(
-            fecha_inicio, fecha_fin,
-            canales, subcanales, localidades, listas_precio, sucursales,
+        df_mensual = _cargar_mensual(
+            anio, metrica, canales, subcanales, localidades, listas_precio, sucursales,
             genericos, marcas, rutas, preventistas, fv
         )
 
-        if len(df_fecha) > 0:
-            # Convertir fecha y extraer mes
-            df_fecha['fecha'] = pd.to_datetime(df_fecha['fecha'])
-            df_fecha['mes'] = df_fecha['fecha'].dt.month
-
-            # Agregar por mes
-            df_mensual = df_fecha.groupby('mes')[metrica].sum().reset_index()
-
+        if len(df_mensual) > 0:
             # Asegurar que todos los meses esten (1-12)
             df_completo = pd.DataFrame({'mes': range(1, 13)})
             df_mensual = df_completo.merge(df_mensual, on='mes', how='left').fillna(0)
@@ -167,22 +186,11 @@ def actualizar_tabla_comparativa(anios_seleccionados, canales, subcanales, local
     fv = fuerza_venta if fuerza_venta != 'TODOS' else None
 
     for anio in anios_seleccionados:
-        fecha_inicio = f"{anio}-01-01"
-        fecha_fin = f"{anio}-12-31"
-
-        df_fecha = cargar_ventas_por_fecha(
-            fecha_inicio, fecha_fin,
-            canales, subcanales, localidades, listas_precio, sucursales,
+        df_mensual = _cargar_mensual(
+            anio, metrica, canales, subcanales, localidades, listas_precio, sucursales,
             genericos, marcas, rutas, preventistas, fv
         )
-
-        if len(df_fecha) > 0:
-            df_fecha['fecha'] = pd.to_datetime(df_fecha['fecha'])
-            df_fecha['mes'] = df_fecha['fecha'].dt.month
-            df_mensual = df_fecha.groupby('mes')[metrica].sum().to_dict()
-            datos_por_anio[anio] = df_mensual
-        else:
-            datos_por_anio[anio] = {}
+        datos_por_anio[anio] = df_mensual.set_index('mes')[metrica].to_dict() if len(df_mensual) > 0 else {}
 
     # Construir filas de la tabla
     filas = []
@@ -2,6 +2,8 @@
 Configuración central del dashboard.
 Constantes, estilos y configuración de la aplicación.
 """
+import os
+
 from database import engine
 
 # Verificar disponibilidad de scipy para zonas
@@ -16,7 +18,10 @@ except ImportError:
 SERVER_CONFIG = {
     'host': '127.0.0.1',
     'port': 8050,
-    'debug': False
+    'debug': False,
+    # Proxies reversos delante de la app (nginx con TLS, etc.) cuyos X-Forwarded-Proto/Host
+    # se respetan: las URLs absolutas (tiles) salen con el esquema y host publicos
+    'proxies': int(os.environ.get('DASHBOARD_PROXIES', '1')),
 }
 
 # Labels para métricas
@@ -77,6 +82,14 @@ GRANULARIDAD_CONFIG = {
     'mes': ('month', '%Y-%m')
 }
 
+# Presupuesto de animaciones: puntos cliente-periodo maximos enviados al navegador.
+# Si se excede se pasa a una granularidad mas gruesa (dia -> semana -> mes)
+ANIMACION_CONFIG = {
+    'max_puntos': 150000,
+    'duracion_frame': 800,
+    'duracion_transicion': 300,
+}
+
 # Paleta de tema oscuro
 DARK = {
     'bg': '#0f1117',
@@ -111,6 +124,119 @@ GENERICOS_HOVER_FIJOS = [
     'FRATELLI B', 'VINOS', 'VINOS FINOS',
 ]
 
+# Cache en memoria de datasets filtrados (por fingerprint de filtros)
+CACHE_CONFIG = {
+    'max_datasets': 32,
+    'ttl_segundos': 300,
+    'max_hulls': 20000,  # hulls de zonas por (grupo, membresia)
+}
+
+# Vector tiles (MVT) de clientes: /tiles/clientes/{z}/{x}/{y}.pbf
+# Por encima de 'umbral_puntos' los mapas usan capas vectoriales en vez de Scattermap
+MVT_CONFIG = {
+    'extent': 4096,
+    'buffer': 64,
+    'umbral_puntos': 20000,
+    'max_tiles_cache': 4096,
+    'radio_punto': 4,
+    # (capa, valor_min, valor_max, color) sobre la escala fija 0-15 del mapa de burbujas
+    'tramos': [
+        ('con_ventas_bajo', 0, 5, 'rgb(220, 40, 40)'),
+        ('con_ventas_medio', 5, 10, 'rgb(240, 220, 0)'),
+        ('con_ventas_alto', 10, float('inf'), 'rgb(40, 180, 40)'),
+    ],
+}
+
+# Clustering jerarquico por grilla de los mapas de clientes
+# Debajo de 'zoom_max' se muestran clusters; desde 'zoom_max' los clientes individuales
+CLUSTER_CONFIG = {
+    'zoom_min': 0,
+    'zoom_max': 15,
+    'radio_px': 64,
+}
+
+# Filtrado en el navegador de los mapas de puntos (switch "Filtrar en el navegador"):
+# los clientes del periodo viajan una vez al browser y los filtros de atributo se
+# aplican ahi. Por encima de 'max_clientes' (y de MVT umbral_puntos) se filtra en el servidor
+FILTRADO_NAVEGADOR_CONFIG = {
+    'max_clientes': 15000,
+}
+
+# Piramide de grillas del mapa de calor: precisiones precalculadas (pasos del slider)
+GRILLA_CONFIG = {
+    'precisiones': [1 + 0.25 * i for i in range(13)],  # 1.0 .. 4.0 (10km .. 10m)
+    'n_grupos': 8,
+}
+
+# Raster de densidad (KDE) del mapa difuso, renderizado en el servidor como PNG
+DENSIDAD_CONFIG = {
+    'zoom_referencia': 8,   # zoom al que se interpreta el radio en pixeles
+    'px_por_celda': 2,
+    'max_lado': 768,
+    'opacidad': 0.5,
+    'escala': [
+        [0.0, 'rgb(0, 0, 150)'], [0.15, 'rgb(0, 100, 255)'],
+        [0.3, 'rgb(0, 200, 255)'], [0.45, 'rgb(0, 255, 150)'],
+        [0.55, 'rgb(200, 255, 0)'], [0.7, 'rgb(255, 200, 0)'],
+        [0.85, 'rgb(255, 100, 0)'], [1.0, 'rgb(200, 0, 0)']
+    ],
+}
+
+# Tabla de detalle de cliente: paginada en el servidor
+DETALLE_CLIENTE_CONFIG = {
+    'filas_por_pagina': 100,
+}
+
+# Export Excel por lote (ZIP con un libro por cliente de las rutas/preventistas elegidos)
+LOTE_CONFIG = {
+    'max_procesos': 4,
+    'max_clientes': 1000,
+    'intervalo_ms': 1000,         # polling del progreso
+    'retencion_segundos': 3600,   # los ZIP generados se borran despues de este tiempo
+    'directorio': os.environ.get('DASHBOARD_LOTES_DIR', 'lotes'),  # propio de la app (0700)
+}
+
+# Snapshot del estado de arranque (filtros, YTD, dataset del periodo default) en disco
+SNAPSHOT_CONFIG = {
+    'intervalo_refresco_segundos': 1800,
+    'directorio': os.environ.get('DASHBOARD_SNAPSHOT_DIR', 'snapshot'),  # propio de la app (0700)
+}
+
+# Cubo de ventas cliente x articulo x mes en arrays .npy mapeados en memoria (data/cubo.py)
+CUBO_CONFIG = {
+    'chequeo_segundos': 30,      # cada cuanto un worker relee el puntero de version
+    'versiones_retenidas': 2,    # versiones que quedan en disco al publicar una nueva
+    'directorio': os.environ.get('DASHBOARD_CUBO_DIR', 'cubo'),  # propio de la app (0700)
+}
+
+# Almacen de agregados mensuales de meses cerrados (data/cierres.py): YTD y tablero
+CIERRES_CONFIG = {
+    'habilitado': os.environ.get('DASHBOARD_CIERRES') != '0',  # '0' vuelve a las queries directas
+    'directorio': os.environ.get('DASHBOARD_CIERRES_DIR', 'cierres'),
+    'dias_gracia': 5,            # dias despues de fin de mes en los que el ETL todavia lo corrige
+    'max_meses_memoria': 60,     # meses cerrados que cada worker mantiene cruzados con dim_cliente
+}
+
+# Perfilado de callbacks bajo demanda (/admin/perfiles). Deshabilitado sin token
+PERFILADO_CONFIG = {
+    'token': os.environ.get('DASHBOARD_ADMIN_TOKEN'),
+    'max_por_callback': 20,         # perfiles que se conservan por callback
+    'duracion_cookie': 3600,        # segundos que dura el perfilado activado desde el navegador
+}
+
+# Trazas de requests de callbacks en JSONL formato OTLP (utils/trazas.py)
+TRAZAS_CONFIG = {
+    'habilitado': os.environ.get('DASHBOARD_TRAZAS') == '1',  # sin esto, solo requests con X-Trazar
+    'muestreo': 1.0,                # fraccion de requests trazados con 'habilitado'
+    'archivo': os.environ.get('DASHBOARD_TRAZAS_ARCHIVO', 'trazas.jsonl'),
+    'max_mb': 50,                   # al superarlo el archivo rota a .1
+}
+
+# Pruebas de carga (tools/carga.py): grabacion de payloads de callbacks
+CARGA_CONFIG = {
+    'archivo_grabacion': os.environ.get('DASHBOARD_GRABAR'),  # JSONL; sin definir no se graba
+}
+
 # Estilos comunes
 STYLES = {
     'filter_section': {
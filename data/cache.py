@@ -0,0 +1,379 @@
+"""
+Cache en memoria compartido por callbacks y rutas Flask.
+Los datasets filtrados se identifican por un fingerprint estable de los filtros activos.
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from config import CACHE_CONFIG, CLUSTER_CONFIG, GRILLA_CONFIG, DENSIDAD_CONFIG
+from data.queries import (
+    cargar_ventas_por_cliente, cargar_ventas_por_cliente_generico, cargar_ventas_cliente_detalle,
+    contar_puntos_animacion,
+)
+from utils.clusters import IndiceClusters
+from utils.visualization import PiramideGrilla, calcular_zonas, resumir_zonas
+from utils.raster import kde_mercator, normalizar_raster, colorear_raster, codificar_png, png_data_uri
+from data.cubo import cubo_actual
+from utils.pivot_cliente import PivotCliente, ultimos_periodos
+from utils.trazas import trazado, span_actual
+
+
+# Filtros que viajan a SQL (cargar_ventas_por_cliente) y filtros de atributo (pandas)
+FILTROS_SQL = ('fecha_desde', 'fecha_hasta', 'genericos', 'marcas', 'rutas', 'preventistas', 'fuerza_venta')
+FILTROS_ATRIBUTO = ('canales', 'subcanales', 'localidades', 'listas_precio', 'sucursales')
+
+
+class CacheLRU:
+    """Diccionario LRU thread-safe con tamaño maximo y TTL opcional."""
+
+    def __init__(self, max_items, ttl=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            valor, creado = item
+            if self.ttl is not None and time.monotonic() - creado > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return valor
+
+    def set(self, key, valor):
+        with self._lock:
+            self._data[key] = (valor, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def normalizar_filtros(**filtros):
+    """
+    Normaliza los filtros del dashboard a un dict canonico:
+    listas vacias -> None, listas ordenadas, fechas como string, FV 'TODOS' -> None.
+    """
+    normalizado = {}
+    for clave in FILTROS_SQL + FILTROS_ATRIBUTO:
+        valor = filtros.get(clave)
+        if isinstance(valor, (list, tuple)):
+            valor = sorted(str(v) for v in valor) or None
+        elif clave == 'fuerza_venta' and valor == 'TODOS':
+            valor = None
+        elif valor is not None:
+            valor = str(valor)[:10] if clave.startswith('fecha') else str(valor)
+        normalizado[clave] = valor or None
+    return normalizado
+
+
+def fingerprint_filtros(filtros):
+    """Hash corto y estable de un dict de filtros normalizado."""
+    payload = json.dumps(filtros, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def codificar_filtros(filtros):
+    """Serializa los filtros a un token URL-safe (para URLs de tiles)."""
+    payload = json.dumps(filtros, sort_keys=True, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_filtros(token):
+    """Inversa de codificar_filtros. Retorna None si el token es invalido."""
+    try:
+        padding = '=' * (-len(token) % 4)
+        filtros = json.loads(base64.urlsafe_b64decode(token + padding).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(filtros, dict):
+        return None
+    return normalizar_filtros(**filtros)
+
+
+@trazado('pandas.aplicar_filtros_atributo')
+def aplicar_filtros_atributo(df, canales=None, subcanales=None, localidades=None,
+                             listas_precio=None, sucursales=None):
+    """Aplica en pandas los filtros de atributo de cliente (canal, subcanal, etc)."""
+    if canales:
+        df = df[df['canal'].isin(canales)]
+    if subcanales:
+        df = df[df['subcanal'].isin(subcanales)]
+    if localidades:
+        df = df[df['localidad'].isin(localidades)]
+    if listas_precio:
+        lp_ids = [int(l) for l in listas_precio]
+        df = df[df['id_lista_precio'].isin(lp_ids)]
+    if sucursales:
+        df = df[df['sucursal'].isin(sucursales)]
+    return df
+
+
+_cache_clientes = CacheLRU(CACHE_CONFIG['max_datasets'], ttl=CACHE_CONFIG['ttl_segundos'])
+
+
+@trazado('datos.cargar_clientes_filtrados')
+def cargar_clientes_filtrados(filtros):
+    """
+    Retorna (fingerprint, df) con los clientes de cargar_ventas_por_cliente
+    ya filtrados por atributo. El resultado se cachea por fingerprint, de modo
+    que los tres mapas y las rutas de tiles comparten una sola query.
+    El DataFrame devuelto es compartido: no modificarlo in-place.
+    """
+    fp = fingerprint_filtros(filtros)
+    df = _cache_clientes.get(fp)
+    if span_actual() is not None:
+        span_actual().atributos['cache.hit'] = df is not None
+    if df is None:
+        df = cargar_ventas_por_cliente(
+            filtros['fecha_desde'], filtros['fecha_hasta'], filtros['genericos'],
+            filtros['marcas'], filtros['rutas'], filtros['preventistas'], filtros['fuerza_venta']
+        )
+        df = aplicar_filtros_atributo(df, *(filtros[k] for k in FILTROS_ATRIBUTO))
+        _cache_clientes.set(fp, df)
+    return fp, df
+
+
+def sembrar_clientes_filtrados(filtros, df):
+    """Precarga en el cache el dataset de unos filtros (snapshot de arranque)."""
+    _cache_clientes.set(fingerprint_filtros(filtros), df)
+
+
+_cache_clusters = CacheLRU(CACHE_CONFIG['max_datasets'])
+
+
+def cargar_indice_clusters(filtros, metrica):
+    """
+    Retorna el IndiceClusters del dataset filtrado para la metrica.
+    Se construye una sola vez por version del dataset: si el DataFrame
+    cacheado se recarga (TTL), el indice se reconstruye.
+    """
+    fp, df = cargar_clientes_filtrados(filtros)
+    clave = (fp, metrica)
+    entrada = _cache_clusters.get(clave)
+    if entrada is not None and entrada[0] is df:
+        return entrada[1]
+
+    validos = (df['latitud'].notna() & df['longitud'].notna()
+               & (df['latitud'] != 0) & (df['longitud'] != 0))
+    df_mapa = df[validos]
+    indice = IndiceClusters(
+        df_mapa['latitud'].to_numpy(), df_mapa['longitud'].to_numpy(),
+        pesos={
+            'total': df_mapa[metrica].to_numpy(dtype=float),
+            'con_ventas': (df_mapa['cantidad_total'] > 0).to_numpy(dtype=float),
+        },
+        zoom_min=CLUSTER_CONFIG['zoom_min'], zoom_max=CLUSTER_CONFIG['zoom_max'],
+        radio_px=CLUSTER_CONFIG['radio_px'],
+    )
+    _cache_clusters.set(clave, (df, indice))
+    return indice
+
+
+_cache_grillas = CacheLRU(CACHE_CONFIG['max_datasets'])
+
+
+def cargar_piramide_grilla(filtros, metrica):
+    """
+    Retorna la PiramideGrilla (todas las precisiones del slider) de los clientes
+    con ventas y coordenadas validas. Se construye una vez por version del dataset.
+    """
+    fp, df = cargar_clientes_filtrados(filtros)
+    clave = (fp, metrica)
+    entrada = _cache_grillas.get(clave)
+    if entrada is not None and entrada[0] is df:
+        return entrada[1]
+
+    validos = (df['latitud'].notna() & df['longitud'].notna()
+               & (df['latitud'] != 0) & (df['longitud'] != 0) & (df['cantidad_total'] > 0))
+    df_grilla = df[validos]
+    piramide = PiramideGrilla(
+        df_grilla['latitud'].to_numpy(), df_grilla['longitud'].to_numpy(),
+        df_grilla[metrica].to_numpy(dtype=float), GRILLA_CONFIG['precisiones'],
+    )
+    _cache_grillas.set(clave, (df, piramide))
+    return piramide
+
+
+_cache_rasters = CacheLRU(CACHE_CONFIG['max_datasets'] * 4)
+
+
+def cargar_raster_densidad(filtros, metrica, radio, tipo_normalizacion='normal', usar_log=False):
+    """
+    Retorna el raster de densidad del mapa difuso listo para una capa de imagen:
+    dict con 'source' (data URI PNG), 'coordinates' (esquinas lon/lat) y 'rango'
+    (valores de la escala de color). None si no hay clientes con ventas.
+    Cacheado por (fingerprint, metrica, radio, normalizacion, log).
+    """
+    fp, df = cargar_clientes_filtrados(filtros)
+    clave = (fp, metrica, radio, tipo_normalizacion, bool(usar_log))
+    entrada = _cache_rasters.get(clave)
+    if entrada is not None and entrada[0] is df:
+        return entrada[1]
+
+    validos = (df['latitud'].notna() & df['longitud'].notna()
+               & (df['latitud'] != 0) & (df['longitud'] != 0) & (df['cantidad_total'] > 0))
+    df_calor = df[validos]
+    capa = None
+    if len(df_calor) > 0:
+        raster, (lon_min, lat_min, lon_max, lat_max) = kde_mercator(
+            df_calor['latitud'].to_numpy(), df_calor['longitud'].to_numpy(),
+            df_calor[metrica].to_numpy(dtype=float), radio,
+            zoom_ref=DENSIDAD_CONFIG['zoom_referencia'], px_por_celda=DENSIDAD_CONFIG['px_por_celda'],
+            max_lado=DENSIDAD_CONFIG['max_lado'],
+        )
+        valores, rango = normalizar_raster(raster, tipo_normalizacion, usar_log)
+        rgba = colorear_raster(valores, rango, DENSIDAD_CONFIG['escala'], DENSIDAD_CONFIG['opacidad'])
+        capa = {
+            'source': png_data_uri(codificar_png(rgba)),
+            'coordinates': [[lon_min, lat_max], [lon_max, lat_max], [lon_max, lat_min], [lon_min, lat_min]],
+            'rango': rango,
+        }
+    _cache_rasters.set(clave, (df, capa))
+    return capa
+
+
+# Hulls por (grupo, firma de miembros): dependen solo de coordenadas y asignacion
+# de ruta (dim_cliente), no de ventas, asi que se reusan entre filtros
+_cache_hulls = CacheLRU(CACHE_CONFIG['max_hulls'])
+
+
+def calcular_zonas_cacheadas(df, tipo_zona):
+    """
+    calcular_zonas con cache de hulls: solo se recalculan los grupos cuya
+    membresia (clientes y coordenadas) cambio respecto de lo ya calculado.
+    """
+    return calcular_zonas(df, tipo_zona, cache=_cache_hulls)
+
+
+def precalcular_zonas(df):
+    """Precalcula los hulls de rutas y preventistas del snapshot completo de clientes."""
+    validos = (df['latitud'].notna() & df['longitud'].notna()
+               & (df['latitud'] != 0) & (df['longitud'] != 0))
+    for tipo_zona in ('ruta', 'preventista'):
+        calcular_zonas_cacheadas(df[validos], tipo_zona)
+
+
+_cache_generico = CacheLRU(CACHE_CONFIG['max_datasets'], ttl=CACHE_CONFIG['ttl_segundos'])
+_cache_resumen_zonas = CacheLRU(CACHE_CONFIG['max_datasets'] * 2)
+
+
+def cargar_desglose_generico(filtros):
+    """
+    cargar_ventas_por_cliente_generico cacheado por los filtros que usa la query
+    (genérico, marca, ruta, preventista, FV). No modificar el resultado in-place.
+    """
+    claves = ('genericos', 'marcas', 'rutas', 'preventistas', 'fuerza_venta')
+    fp = fingerprint_filtros({k: filtros[k] for k in claves})
+    df = _cache_generico.get(fp)
+    if df is None:
+        df = cargar_ventas_por_cliente_generico(*(filtros[k] for k in claves))
+        _cache_generico.set(fp, df)
+    return df
+
+
+def resumir_zonas_cacheado(filtros, tipo_zona, zonas, df_clientes, df_generico):
+    """
+    resumir_zonas cacheado por estado de filtros y tipo de zona. Se invalida
+    si cambia la version del dataset de clientes del que salen las zonas
+    (df_clientes) o la del desglose por genérico: los dos caches vencen por separado.
+    """
+    clave = (fingerprint_filtros(filtros), tipo_zona)
+    entrada = _cache_resumen_zonas.get(clave)
+    if entrada is not None and entrada[0] is df_clientes and entrada[1] is df_generico:
+        return entrada[2]
+    resumenes = resumir_zonas(zonas, df_generico)
+    _cache_resumen_zonas.set(clave, (df_clientes, df_generico, resumenes))
+    return resumenes
+
+
+def obtener_resumen_zona(filtros, tipo_zona, indice):
+    """
+    Zona y resumen por genérico de una sola zona (contenido de un badge al abrirlo).
+    Todo sale de los caches de dataset, hulls y resumenes; si otro worker no
+    tiene el cache, se reconstruye desde los filtros.
+
+    Returns:
+        (zona, resumen) o (None, None) si el indice no existe.
+    """
+    _, df = cargar_clientes_filtrados(filtros)
+    validos = (df['latitud'].notna() & df['longitud'].notna()
+               & (df['latitud'] != 0) & (df['longitud'] != 0))
+    zonas = calcular_zonas_cacheadas(df[validos], tipo_zona)
+    if not 0 <= indice < len(zonas):
+        return None, None
+    resumenes = resumir_zonas_cacheado(filtros, tipo_zona, zonas, df, cargar_desglose_generico(filtros))
+    return zonas[indice], resumenes[indice]
+
+
+_cache_conteos_animacion = CacheLRU(CACHE_CONFIG['max_datasets'], ttl=CACHE_CONFIG['ttl_segundos'])
+
+
+def cargar_conteos_animacion(filtros):
+    """
+    contar_puntos_animacion cacheado por los filtros que usa la query (fechas,
+    generico, marca, ruta, preventista, FV) y la version de datos: re-renderizar
+    una animacion con los mismos filtros no vuelve a contar en SQL.
+    """
+    clave = (fingerprint_filtros({k: filtros[k] for k in FILTROS_SQL}), version_datos())
+    conteos = _cache_conteos_animacion.get(clave)
+    if conteos is None:
+        conteos = contar_puntos_animacion(*(filtros[k] for k in FILTROS_SQL))
+        _cache_conteos_animacion.set(clave, conteos)
+    return conteos
+
+
+_cache_pivots = CacheLRU(CACHE_CONFIG['max_datasets'], ttl=CACHE_CONFIG['ttl_segundos'])
+
+
+def version_datos():
+    """
+    Version de los datos de ventas: el ETL carga una vez por dia y la ventana
+    de 12 meses del detalle de cliente tambien depende del dia. El TTL del cache
+    cubre una recarga en el mismo dia.
+    """
+    return date.today().isoformat()
+
+
+def cargar_pivot_cliente(id_cliente):
+    """
+    PivotCliente del cliente, cacheado por (id_cliente, version de datos, version del cubo).
+    La tabla de detalle y los exports Excel comparten la misma query y el mismo pivot.
+    Si hay un cubo publicado (data/cubo.py) y se construyo el dia de la version de
+    datos, las ventas salen de el sin query; si es de un dia anterior (el cron no
+    corrio despues del ETL) se consulta la base, asi el mes actual no queda congelado.
+
+    Returns:
+        PivotCliente, o None si no hay articulos.
+    """
+    version = version_datos()
+    cubo = cubo_actual()
+    if cubo is not None and not cubo.vigente(version):
+        cubo = None
+    clave = (int(id_cliente), version, cubo.version if cubo is not None else None)
+    pivot = _cache_pivots.get(clave)
+    if pivot is None:
+        if cubo is not None:
+            df = cubo.detalle_cliente(id_cliente)
+        else:
+            df = cargar_ventas_cliente_detalle(id_cliente)
+        if len(df) == 0:
+            return None
+        pivot = PivotCliente(df, ultimos_periodos(date.fromisoformat(version)))
+        _cache_pivots.set(clave, pivot)
+    return pivot
@@ -0,0 +1,127 @@
+"""
+Cancelacion de queries superadas. Cada ejecucion de un callback de mapa se
+registra por (sesion del navegador, callback); si llega una ejecucion mas
+nueva de la misma clave, la sentencia en curso de la anterior se cancela en
+el servidor con el pedido de cancelacion del protocolo sobre su conexion
+(cancel() del driver, equivalente a pg_cancel_backend, sin sacar otra conexion
+del pool), y la anterior termina con ConsultaCancelada (el callback devuelve
+no_update).
+"""
+import contextvars
+import itertools
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+from database import engine
+
+
+class ConsultaCancelada(Exception):
+    """La ejecucion fue superada por una mas nueva de la misma sesion y callback."""
+
+
+# SQLSTATE de PostgreSQL para "canceling statement due to user request"
+_QUERY_CANCELED = '57014'
+
+_lock = threading.Lock()
+_vigentes = {}      # (sesion, callback) -> token de la ejecucion mas nueva
+_ejecutando = {}    # token -> conexion DBAPI con una sentencia en curso
+_cancelando = {}    # id(conexion DBAPI) -> Event que se marca al terminar de enviar la cancelacion
+_contador = itertools.count()
+_token_actual = contextvars.ContextVar('token_consulta', default=None)
+
+
+def _superada(token):
+    return _vigentes.get(token[0]) != token
+
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    dbapi_conn = conn.connection.dbapi_connection
+    # Si la conexion volvio al pool mientras se cancelaba su sentencia anterior, se
+    # espera a que salga el pedido para que no caiga sobre esta sentencia
+    enviando = _cancelando.get(id(dbapi_conn))
+    if enviando is not None:
+        enviando.wait()
+    token = _token_actual.get()
+    if token is None:
+        return
+    with _lock:
+        if _superada(token):
+            raise ConsultaCancelada()
+        _ejecutando[token] = dbapi_conn
+
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    token = _token_actual.get()
+    if token is not None:
+        with _lock:
+            _ejecutando.pop(token, None)
+
+
+@event.listens_for(engine, 'handle_error')
+def _error_al_ejecutar(contexto):
+    token = _token_actual.get()
+    if token is not None:
+        with _lock:
+            _ejecutando.pop(token, None)
+
+
+def _cancelar_sentencia(dbapi_conn, enviando):
+    """Envia el pedido de cancelacion de la sentencia en curso de la conexion (sin lock tomado)."""
+    try:
+        dbapi_conn.cancel()
+    except engine.dialect.dbapi.Error as e:
+        print(f"No se pudo cancelar la query en curso: {e}")
+    finally:
+        with _lock:
+            _cancelando.pop(id(dbapi_conn), None)
+        enviando.set()
+
+
+@contextmanager
+def consulta_cancelable(sesion, nombre):
+    """
+    Ejecuta el bloque como la ejecucion vigente de (sesion, nombre) y cancela la
+    sentencia en curso de la ejecucion anterior, si la hay. Si durante el bloque
+    llega una ejecucion mas nueva, se lanza ConsultaCancelada. Sin sesion el
+    bloque corre sin seguimiento.
+    """
+    if not sesion:
+        yield
+        return
+
+    clave = (sesion, nombre)
+    token = (clave, next(_contador))
+    enviando = None
+    with _lock:
+        anterior = _vigentes.get(clave)
+        _vigentes[clave] = token
+        dbapi_conn = _ejecutando.get(anterior) if anterior is not None else None
+        if dbapi_conn is not None:
+            enviando = _cancelando[id(dbapi_conn)] = threading.Event()
+    # Con la anterior ya marcada como superada, la cancelacion sale fuera del lock:
+    # los hooks de ejecucion del resto del proceso no esperan el roundtrip
+    if dbapi_conn is not None:
+        _cancelar_sentencia(dbapi_conn, enviando)
+
+    reset = _token_actual.set(token)
+    try:
+        yield
+    except DBAPIError as e:
+        # pgcode en psycopg2, sqlstate en psycopg 3
+        if (getattr(e.orig, 'pgcode', None) or getattr(e.orig, 'sqlstate', None)) == _QUERY_CANCELED:
+            with _lock:
+                superada = _superada(token)
+            if superada:
+                raise ConsultaCancelada() from e
+        raise
+    finally:
+        _token_actual.reset(reset)
+        with _lock:
+            _ejecutando.pop(token, None)
+            if _vigentes.get(clave) == token:
+                del _vigentes[clave]
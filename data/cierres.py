@@ -0,0 +1,296 @@
+"""
+Almacen inmutable de agregados mensuales de meses cerrados: ventas por cliente,
+generico y marca, y totales por cliente, un archivo .npz por mes. Las ventas de
+un mes cerrado no cambian, asi que cada archivo se escribe una sola vez (la primera
+vez que se lo pide o con python -m data.cierres) y nunca se invalida. Solo los
+meses abiertos (el actual y los que siguen dentro de los dias de gracia del ETL)
+se consultan en vivo y se suman.
+
+Los loaders del YTD (data/ytd_queries.py) y del tablero leen de aca. Los atributos
+de cliente (sucursal, canal, ruta, preventista...) se cruzan al leer con la
+dim_cliente actual, igual que el JOIN de las queries: por (id_cliente, id_sucursal)
+como las del YTD o solo por id_cliente como cargar_ventas_por_fecha (tablero).
+Los documentos (nro_doc distintos en el rango) no se pueden sumar entre meses ni
+clientes: no se guardan y el YTD y el tablero los consultan en vivo.
+"""
+import calendar
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from config import CIERRES_CONFIG, CACHE_CONFIG
+from data.cache import CacheLRU, version_datos
+from data.facetas import IndiceFacetas
+from data.queries import cargar_agregados_mes, cargar_dimension_clientes, obtener_rango_fechas
+
+# Se incrementa si cambian las columnas de los archivos (los viejos quedan en su directorio)
+_VERSION_FORMATO = 2
+
+_COLUMNAS = {
+    'detalle': {'id_cliente': np.int64, 'id_sucursal': np.int64, 'generico': str, 'marca': str,
+                'bultos': float, 'facturacion': float},
+    'clientes': {'id_cliente': np.int64, 'id_sucursal': np.int64,
+                 'bultos': float, 'facturacion': float},
+}
+
+
+def directorio_cierres():
+    return os.path.join(CIERRES_CONFIG['directorio'], f'v{_VERSION_FORMATO}')
+
+
+def mes_cerrado(anio, mes, hoy=None):
+    """El mes termino hace mas de CIERRES_CONFIG['dias_gracia'] dias: el ETL ya no lo modifica."""
+    ultimo = date(anio, mes, calendar.monthrange(anio, mes)[1])
+    return ultimo + timedelta(days=CIERRES_CONFIG['dias_gracia']) < (hoy or date.today())
+
+
+def _meses(desde, hasta):
+    """Periodos (anio, mes) de desde a hasta inclusive."""
+    inicio, fin = desde[0] * 12 + desde[1] - 1, hasta[0] * 12 + hasta[1] - 1
+    return [(p // 12, p % 12 + 1) for p in range(inicio, fin + 1)]
+
+
+def _tipar(tabla, df):
+    return pd.DataFrame({columna: df[columna].to_numpy(dtype=tipo) if tipo is not str
+                         else df[columna].astype(str).to_numpy(dtype=object)
+                         for columna, tipo in _COLUMNAS[tabla].items()})
+
+
+# =============================================================================
+# ARCHIVOS (uno por mes cerrado, escritos una vez)
+# =============================================================================
+
+def _archivo(anio, mes):
+    return os.path.join(directorio_cierres(), f'{anio:04d}-{mes:02d}.npz')
+
+
+def _escribir(ruta, detalle, clientes):
+    """
+    Escribe el mes en un temporal y lo publica con os.replace (atomico). Las
+    columnas de texto (generico, marca) se guardan codificadas por diccionario.
+    """
+    arrays = {}
+    for tabla, df in (('detalle', detalle), ('clientes', clientes)):
+        for columna, tipo in _COLUMNAS[tabla].items():
+            if tipo is str:
+                codigos, valores = pd.factorize(df[columna])
+                arrays[f'{tabla}__{columna}'] = codigos.astype(np.int32)
+                arrays[f'{tabla}__{columna}__valores'] = np.asarray(valores, dtype=str)
+            else:
+                arrays[f'{tabla}__{columna}'] = df[columna].to_numpy()
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = f'{ruta}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, ruta)
+
+
+def _leer(ruta):
+    tablas = {'detalle': {}, 'clientes': {}}
+    with np.load(ruta) as datos:
+        for tabla in tablas:
+            for columna, tipo in _COLUMNAS[tabla].items():
+                valores = datos[f'{tabla}__{columna}']
+                if tipo is str:
+                    valores = datos[f'{tabla}__{columna}__valores'].astype(object)[valores]
+                tablas[tabla][columna] = valores
+    return tuple(_tipar(tabla, pd.DataFrame(tablas[tabla])) for tabla in ('detalle', 'clientes'))
+
+
+def guardar_mes(anio, mes):
+    """
+    Consulta y escribe un mes cerrado si todavia no esta en el almacen.
+
+    Returns:
+        True si se escribio, False si ya estaba.
+    """
+    if not mes_cerrado(anio, mes):
+        raise ValueError(f"{anio}-{mes:02d} no esta cerrado")
+    ruta = _archivo(anio, mes)
+    if os.path.exists(ruta):
+        return False
+    detalle, clientes = cargar_agregados_mes(anio, mes)
+    _escribir(ruta, _tipar('detalle', detalle), _tipar('clientes', clientes))
+    return True
+
+
+# =============================================================================
+# LECTURA (cruzada con la dim_cliente actual)
+# =============================================================================
+
+_dimension = {'version': None}
+_lock_dimension = threading.Lock()
+_cerrados = CacheLRU(CIERRES_CONFIG['max_meses_memoria'])
+_abiertos = CacheLRU(12, ttl=CACHE_CONFIG['ttl_segundos'])
+
+
+def _dimension_actual():
+    """
+    dim_cliente completa (con anulados, como el LEFT JOIN de las queries) por
+    version de datos: indice de facetas para los filtros, posicion de cada
+    (id_cliente, id_sucursal) y de cada id_cliente (primera fila), y sucursal/canal
+    con un lugar extra al final para las ventas sin cliente en la dimension (fila -1).
+    """
+    version = version_datos()
+    with _lock_dimension:
+        if _dimension['version'] != version:
+            df = cargar_dimension_clientes(solo_activos=False).drop_duplicates(['id_cliente', 'id_sucursal'])
+            df = df.reset_index(drop=True)
+            primeras = np.flatnonzero(~df['id_cliente'].duplicated().to_numpy())
+            _dimension.update(
+                version=version,
+                indice=IndiceFacetas(df),
+                posicion=pd.MultiIndex.from_arrays([df['id_cliente'].fillna(-1).astype(np.int64),
+                                                    df['id_sucursal'].fillna(-1).astype(np.int64)]),
+                posicion_cliente=pd.Index(df['id_cliente'].to_numpy()[primeras]),
+                filas_cliente=np.append(primeras, -1),
+                sucursal=np.append(df['sucursal'].to_numpy(dtype=object), 'Sin sucursal'),
+                canal=np.append(df['canal'].to_numpy(dtype=object), 'Sin canal'),
+            )
+        return dict(_dimension)
+
+
+def _con_fila(df, dimension):
+    """fila: JOIN por (id_cliente, id_sucursal); fila_cliente: JOIN solo por id_cliente."""
+    claves = pd.MultiIndex.from_arrays([df['id_cliente'], df['id_sucursal']])
+    por_cliente = dimension['posicion_cliente'].get_indexer(df['id_cliente'])
+    return df.assign(fila=dimension['posicion'].get_indexer(claves),
+                     fila_cliente=dimension['filas_cliente'][por_cliente])
+
+
+def agregados_mes(anio, mes):
+    """
+    (detalle, clientes) del mes con las columnas 'fila' y 'fila_cliente' (posicion
+    del cliente en la dim_cliente actual, -1 si no esta). Los meses cerrados salen del almacen (y se
+    escriben la primera vez); los abiertos se consultan en vivo y se cachean con TTL.
+    """
+    dimension = _dimension_actual()
+    cerrado = mes_cerrado(anio, mes)
+    cache = _cerrados if cerrado else _abiertos
+    clave = (anio, mes, dimension['version'])
+    entrada = cache.get(clave)
+    if entrada is None:
+        if cerrado:
+            guardar_mes(anio, mes)
+            tablas = _leer(_archivo(anio, mes))
+        elif date(anio, mes, 1) > date.today():
+            tablas = tuple(_tipar(tabla, pd.DataFrame(columns=list(_COLUMNAS[tabla])))
+                           for tabla in ('detalle', 'clientes'))
+        else:
+            detalle, clientes = cargar_agregados_mes(anio, mes)
+            tablas = (_tipar('detalle', detalle), _tipar('clientes', clientes))
+        entrada = tuple(_con_fila(df, dimension) for df in tablas)
+        cache.set(clave, entrada)
+    return entrada
+
+
+def _filas_permitidas(dimension, filtros, tipo_sucursal):
+    """
+    Mascara sobre las filas de la dimension (+1 al final para las ventas sin
+    cliente) o None si no hay filtros de cliente.
+    """
+    hay_filtros = any(filtros.get(k) for k in ('canales', 'subcanales', 'localidades', 'listas_precio',
+                                               'sucursales', 'rutas', 'preventistas'))
+    if not hay_filtros and tipo_sucursal in (None, 'TODAS'):
+        return None
+    mascara = dimension['indice'].mascara(filtros)
+    sucursal = dimension['sucursal'][:-1]
+    if tipo_sucursal == 'SUCURSALES':
+        mascara &= np.array([s != 'CASA CENTRAL' and s.startswith('SUCURSAL') for s in sucursal], dtype=bool)
+    elif tipo_sucursal == 'CASA_CENTRAL':
+        mascara &= sucursal == 'CASA CENTRAL'
+    # Las ventas sin cliente en la dimension no cumplen ningun filtro de cliente
+    return np.append(mascara, False)
+
+
+def ventas_filtradas(desde, hasta, filtros=None, tipo_sucursal='TODAS', join_sucursal=True):
+    """
+    Ventas de los meses desde..hasta ((anio, mes), inclusive) que cumplen los filtros.
+
+    Args:
+        filtros: dict como normalizar_filtros (facetas, rutas, preventistas,
+            fuerza_venta, genericos, marcas). genericos y marcas solo filtran el detalle
+        tipo_sucursal: 'TODAS', 'SUCURSALES', 'CASA_CENTRAL' (como las queries YTD)
+        join_sucursal: cruzar con dim_cliente por (id_cliente, id_sucursal) como las
+            queries YTD; False, solo por id_cliente como cargar_ventas_por_fecha
+
+    Returns:
+        (detalle, clientes): cliente x generico x marca x mes y totales por
+        cliente x mes, con las columnas anio, mes, sucursal y canal
+    """
+    filtros = filtros or {}
+    dimension = _dimension_actual()
+    permitidas = _filas_permitidas(dimension, filtros, tipo_sucursal)
+    columna_fila = 'fila' if join_sucursal else 'fila_cliente'
+    partes = {'detalle': [], 'clientes': []}
+    for anio, mes in _meses(desde, hasta):
+        for tabla, df in zip(('detalle', 'clientes'), agregados_mes(anio, mes)):
+            df = df.assign(fila=df[columna_fila])
+            if permitidas is not None:
+                df = df[permitidas[df['fila'].to_numpy()]]
+            partes[tabla].append(df.assign(anio=anio, mes=mes))
+
+    resultado = []
+    for tabla in ('detalle', 'clientes'):
+        df = pd.concat(partes[tabla], ignore_index=True) if partes[tabla] else \
+            _tipar(tabla, pd.DataFrame(columns=list(_COLUMNAS[tabla]))).assign(fila=0, fila_cliente=0, anio=0, mes=0)
+        if tabla == 'detalle':
+            if filtros.get('genericos'):
+                df = df[df['generico'].isin(filtros['genericos'])]
+            if filtros.get('marcas'):
+                df = df[df['marca'].isin(filtros['marcas'])]
+        filas = df['fila'].to_numpy()
+        resultado.append(df.assign(sucursal=dimension['sucursal'][filas], canal=dimension['canal'][filas]))
+    return tuple(resultado)
+
+
+def ventas_mensuales(anio, filtros=None):
+    """
+    Totales por mes del anio (tablero): mes, cantidad_total y facturacion. Cruza
+    con dim_cliente solo por id_cliente, como cargar_ventas_por_fecha.
+    """
+    detalle, _ = ventas_filtradas((anio, 1), (anio, 12), filtros, join_sucursal=False)
+    return (detalle.groupby('mes', as_index=False)[['bultos', 'facturacion']].sum()
+            .rename(columns={'bultos': 'cantidad_total'}))
+
+
+# =============================================================================
+# CONSTRUCCION (python -m data.cierres)
+# =============================================================================
+
+def guardar_cerrados(desde=None):
+    """
+    Escribe todos los meses cerrados que falten, desde (anio, mes) o desde el
+    primer mes con ventas.
+
+    Returns:
+        Cantidad de meses escritos.
+    """
+    if desde is None:
+        fecha_min, _ = obtener_rango_fechas()
+        if fecha_min is None or pd.isna(fecha_min):
+            return 0
+        desde = (fecha_min.year, fecha_min.month)
+    hoy = date.today()
+    escritos = 0
+    for anio, mes in _meses(desde, (hoy.year, hoy.month)):
+        if mes_cerrado(anio, mes, hoy) and guardar_mes(anio, mes):
+            escritos += 1
+    return escritos
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Escribe los agregados de los meses cerrados que falten")
+    parser.add_argument('--desde', help="primer mes (AAAA-MM); default: primer mes con ventas")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    desde = tuple(int(p) for p in args.desde.split('-')) if args.desde else None
+    escritos = guardar_cerrados(desde)
+    print(f"{escritos} meses escritos en {directorio_cierres()} ({time.perf_counter() - inicio:.1f}s)")
@@ -0,0 +1,224 @@
+"""
+Cubo de ventas compartido entre workers: ventas por cliente, articulo y mes
+(genericos del detalle de cliente) y el catalogo de articulos, guardados como
+arrays .npy que cada worker mapea en memoria de solo lectura. Las paginas se
+comparten a traves del page cache del sistema operativo en lugar de duplicar
+el dataset en cada worker de gunicorn.
+
+Un solo proceso lo construye (python -m data.cubo, p. ej. despues del ETL):
+cada version se escribe en su propio directorio y se publica reemplazando de
+forma atomica el puntero ACTUAL. Los workers toman la version nueva en el
+proximo chequeo, sin reiniciar. Cada version guarda el dia en que se construyo:
+un cubo de un dia anterior (el cron no corrio despues del ETL) no se usa.
+El directorio es propio de la app (0700): si es de otro usuario o escribible por
+otros no se construye ni se lee el cubo.
+"""
+import fcntl
+import os
+import shutil
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from config import CUBO_CONFIG
+from data.queries import cargar_catalogo_detalle, cargar_ventas_cubo
+from utils.archivos import es_propio, directorio_privado, abrir_privado
+
+
+DIRECTORIO_CUBO = CUBO_CONFIG['directorio']
+_PUNTERO = os.path.join(DIRECTORIO_CUBO, 'ACTUAL')
+
+
+class CuboVentas:
+    """
+    Version del cubo mapeada en memoria (arrays de solo lectura).
+
+    Atributos:
+        version: nombre del directorio de la version
+        fecha: dia de construccion (date), None en versiones sin fecha
+        clientes: ids de cliente ordenados; inicio: bordes de cada cliente en
+            los arrays de ventas (len(clientes) + 1)
+        id_articulo, periodo (anio * 12 + mes - 1), bultos: ventas ordenadas por cliente
+        cat_id_articulo, cat_generico, cat_marca, cat_articulo: catalogo de articulos
+    """
+
+    ARRAYS = ('clientes', 'inicio', 'id_articulo', 'periodo', 'bultos',
+              'cat_id_articulo', 'cat_generico', 'cat_marca', 'cat_articulo')
+
+    def __init__(self, directorio):
+        self.version = os.path.basename(directorio)
+        for nombre in self.ARRAYS:
+            setattr(self, nombre, np.load(os.path.join(directorio, f'{nombre}.npy'), mmap_mode='r'))
+        try:
+            with open(os.path.join(directorio, 'fecha')) as f:
+                self.fecha = date.fromisoformat(f.read().strip())
+        except (OSError, ValueError):
+            self.fecha = None
+
+    def vigente(self, version_datos):
+        """True si el cubo se construyo el dia de la version de datos (ver data.cache.version_datos)."""
+        return self.fecha is not None and self.fecha.isoformat() >= version_datos
+
+    def catalogo(self):
+        """Catalogo de articulos (mismas columnas que cargar_catalogo_detalle)."""
+        return pd.DataFrame({
+            'id_articulo': np.asarray(self.cat_id_articulo),
+            'generico': self.cat_generico.astype(object),
+            'marca': self.cat_marca.astype(object),
+            'articulo': self.cat_articulo.astype(object),
+        })
+
+    def ventas_cliente(self, id_cliente):
+        """Ventas del cliente: id_articulo, anio, mes, bultos (vacio si no tiene)."""
+        i = int(np.searchsorted(self.clientes, id_cliente))
+        if i < len(self.clientes) and self.clientes[i] == id_cliente:
+            filas = slice(int(self.inicio[i]), int(self.inicio[i + 1]))
+        else:
+            filas = slice(0, 0)
+        periodo = np.asarray(self.periodo[filas])
+        return pd.DataFrame({
+            'id_articulo': np.asarray(self.id_articulo[filas]),
+            'anio': periodo // 12,
+            'mes': periodo % 12 + 1,
+            'bultos': np.asarray(self.bultos[filas]),
+        })
+
+    def detalle_cliente(self, id_cliente):
+        """
+        Equivalente a cargar_ventas_cliente_detalle: todos los articulos con las
+        ventas del cliente por mes (articulos sin venta con anio/mes/bultos nulos).
+        """
+        return self.catalogo().merge(self.ventas_cliente(int(id_cliente)), on='id_articulo', how='left')
+
+
+# =============================================================================
+# CONSTRUCCION (un solo proceso)
+# =============================================================================
+
+def _escribir_puntero(version):
+    tmp = f"{_PUNTERO}.{os.getpid()}.tmp"
+    with abrir_privado(tmp, 'w') as f:
+        f.write(version)
+    os.replace(tmp, _PUNTERO)
+
+
+def _leer_puntero():
+    """Version publicada, o None si no hay o el directorio o el puntero no son propios."""
+    try:
+        if not es_propio(DIRECTORIO_CUBO) or not es_propio(_PUNTERO):
+            return None
+        with open(_PUNTERO) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return version if version[:1] == 'v' and version[1:].isdigit() else None
+
+
+def _limpiar_versiones(actual):
+    """
+    Borra las versiones viejas (quedan CUBO_CONFIG['versiones_retenidas']) y los
+    directorios temporales. Los workers que aun mapean una version borrada siguen
+    leyendola hasta su proximo chequeo: el sistema libera los archivos al desmapearlos.
+    """
+    directorios = [n for n in os.listdir(DIRECTORIO_CUBO)
+                   if n.startswith('v') and os.path.isdir(os.path.join(DIRECTORIO_CUBO, n))]
+    versiones = sorted(n for n in directorios if not n.endswith('.tmp'))
+    retenidas = set(versiones[-CUBO_CONFIG['versiones_retenidas']:]) | {actual}
+    for nombre in directorios:
+        if nombre not in retenidas:
+            shutil.rmtree(os.path.join(DIRECTORIO_CUBO, nombre), ignore_errors=True)
+
+
+def construir_cubo():
+    """
+    Consulta la base, escribe una version nueva del cubo y la publica.
+
+    Returns:
+        Nombre de la version publicada, o None si otro proceso ya esta construyendo.
+
+    Raises:
+        PermissionError: si el directorio del cubo es de otro usuario o escribible por otros
+    """
+    if not directorio_privado(DIRECTORIO_CUBO):
+        raise PermissionError(f"Directorio del cubo {DIRECTORIO_CUBO} de otro usuario o escribible por otros")
+    with abrir_privado(os.path.join(DIRECTORIO_CUBO, 'construccion.lock'), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+        fecha = date.today()
+        ventas = cargar_ventas_cubo()
+        catalogo = cargar_catalogo_detalle()
+
+        id_cliente = ventas['id_cliente'].to_numpy(dtype=np.int64)
+        orden = np.argsort(id_cliente, kind='stable')
+        id_cliente = id_cliente[orden]
+        clientes, inicio = np.unique(id_cliente, return_index=True)
+        arrays = {
+            'clientes': clientes,
+            'inicio': np.r_[inicio, len(id_cliente)].astype(np.int64),
+            'id_articulo': ventas['id_articulo'].to_numpy(dtype=np.int64)[orden],
+            'periodo': (ventas['anio'].to_numpy(dtype=np.int32) * 12
+                        + ventas['mes'].to_numpy(dtype=np.int32) - 1)[orden],
+            'bultos': ventas['bultos'].to_numpy(dtype=float)[orden],
+            'cat_id_articulo': catalogo['id_articulo'].to_numpy(dtype=np.int64),
+            'cat_generico': np.array(catalogo['generico'].tolist(), dtype=str),
+            'cat_marca': np.array(catalogo['marca'].tolist(), dtype=str),
+            'cat_articulo': np.array(catalogo['articulo'].tolist(), dtype=str),
+        }
+
+        version = f"v{time.time_ns()}"
+        tmp = os.path.join(DIRECTORIO_CUBO, version + '.tmp')
+        os.makedirs(tmp, mode=0o700)
+        for nombre, valores in arrays.items():
+            np.save(os.path.join(tmp, f'{nombre}.npy'), valores)
+        with abrir_privado(os.path.join(tmp, 'fecha'), 'w') as f:
+            f.write(fecha.isoformat())
+        os.replace(tmp, os.path.join(DIRECTORIO_CUBO, version))
+        _escribir_puntero(version)
+        _limpiar_versiones(version)
+    return version
+
+
+# =============================================================================
+# LECTURA (workers)
+# =============================================================================
+
+_cubo = None
+_ultimo_chequeo = float('-inf')
+_lock = threading.Lock()
+
+
+def cubo_actual():
+    """
+    Version publicada del cubo mapeada en este proceso, o None si no hay cubo.
+    El puntero se relee cada CUBO_CONFIG['chequeo_segundos'].
+    """
+    global _cubo, _ultimo_chequeo
+    with _lock:
+        ahora = time.monotonic()
+        if ahora - _ultimo_chequeo < CUBO_CONFIG['chequeo_segundos']:
+            return _cubo
+        _ultimo_chequeo = ahora
+        version = _leer_puntero()
+        if version is None:
+            _cubo = None
+        elif _cubo is None or _cubo.version != version:
+            try:
+                _cubo = CuboVentas(os.path.join(DIRECTORIO_CUBO, version))
+            except (OSError, ValueError) as e:
+                print(f"Error mapeando cubo {version}: {e}")
+        return _cubo
+
+
+if __name__ == '__main__':
+    inicio = time.perf_counter()
+    version = construir_cubo()
+    if version is None:
+        print("Otro proceso esta construyendo el cubo")
+    else:
+        print(f"Cubo {version} publicado en {DIRECTORIO_CUBO} ({time.perf_counter() - inicio:.1f}s)")
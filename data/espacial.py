@@ -0,0 +1,151 @@
+"""
+Indice espacial de los clientes ubicados de dim_cliente. Las coordenadas se
+proyectan a cartesianas geocentricas en km (x, y, z sobre la esfera) y se indexan en
+un KD-tree (scipy cKDTree): la distancia de cuerda ordena igual que la distancia
+sobre la superficie, asi que k vecinos y radio son exactos en toda la zona, sin el
+error de un plano proyectado. Se arma una vez por version de datos; k vecinos, radio
+y caja devuelven ids de cliente sin recorrer todos los puntos. Sin scipy las mismas
+consultas se resuelven por fuerza bruta vectorizada.
+"""
+import threading
+
+import numpy as np
+
+from config import SCIPY_AVAILABLE
+from data.queries import cargar_coordenadas_clientes
+
+if SCIPY_AVAILABLE:
+    from scipy.spatial import cKDTree
+
+RADIO_TIERRA_KM = 6371.0088
+
+
+def proyectar(lat, lon):
+    """lat/lon (grados, escalares o arrays) -> array (n, 3) geocentrico en km."""
+    lat = np.radians(np.atleast_1d(np.asarray(lat, dtype=float)))
+    lon = np.radians(np.atleast_1d(np.asarray(lon, dtype=float)))
+    cos_lat = np.cos(lat)
+    return RADIO_TIERRA_KM * np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def km_a_cuerda(km):
+    """Distancia sobre la superficie -> cuerda en linea recta."""
+    return 2 * RADIO_TIERRA_KM * np.sin(np.minimum(km, np.pi * RADIO_TIERRA_KM) / (2 * RADIO_TIERRA_KM))
+
+
+def cuerda_a_km(cuerda):
+    """Cuerda en linea recta -> distancia sobre la superficie."""
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.clip(cuerda / (2 * RADIO_TIERRA_KM), 0, 1))
+
+
+class IndiceEspacial:
+    """
+    Clientes ubicados en un KD-tree sobre coordenadas geocentricas en km.
+
+    Atributos:
+        ids: array int64 con el id_cliente de cada punto
+        lat, lon: coordenadas en grados, alineadas con ids
+        xyz: array (n, 3) con las coordenadas proyectadas en km
+    """
+
+    def __init__(self, df):
+        self.ids = df['id_cliente'].to_numpy(dtype=np.int64)
+        self.lat = df['latitud'].to_numpy(dtype=float)
+        self.lon = df['longitud'].to_numpy(dtype=float)
+        self.n = len(self.ids)
+        self.xyz = proyectar(self.lat, self.lon)
+        self._posicion = {int(c): i for i, c in enumerate(self.ids)}
+        self._arbol = cKDTree(self.xyz) if SCIPY_AVAILABLE and self.n else None
+
+    def _distancias(self, punto):
+        return np.sqrt(((self.xyz - punto) ** 2).sum(axis=1))
+
+    def cercanos(self, lat, lon, k=1):
+        """
+        Los k clientes mas cercanos a un punto.
+
+        Returns:
+            (ids, distancias_km) ordenados por distancia
+        """
+        k = min(int(k), self.n)
+        if k <= 0:
+            return self.ids[:0], np.empty(0)
+        punto = proyectar(lat, lon)[0]
+        if self._arbol is not None:
+            cuerdas, posiciones = self._arbol.query(punto, k=k)
+            posiciones, cuerdas = np.atleast_1d(posiciones), np.atleast_1d(cuerdas)
+        else:
+            cuerdas = self._distancias(punto)
+            posiciones = np.argpartition(cuerdas, k - 1)[:k]
+            posiciones = posiciones[np.argsort(cuerdas[posiciones], kind='stable')]
+            cuerdas = cuerdas[posiciones]
+        return self.ids[posiciones], cuerda_a_km(cuerdas)
+
+    def _posiciones_en_radio(self, punto, radio_km):
+        cuerda = km_a_cuerda(radio_km)
+        if self._arbol is not None:
+            return np.asarray(self._arbol.query_ball_point(punto, cuerda), dtype=np.int64)
+        return np.flatnonzero(self._distancias(punto) <= cuerda)
+
+    def en_radio(self, lat, lon, radio_km):
+        """Ids de los clientes a radio_km o menos de un punto (sin orden)."""
+        if not self.n:
+            return self.ids[:0]
+        return self.ids[self._posiciones_en_radio(proyectar(lat, lon)[0], radio_km)]
+
+    def vecinos(self, id_cliente, radio_km=None, k=None):
+        """
+        Clientes cercanos a otro cliente, sin incluirlo: los que estan a radio_km o
+        menos, o los k mas cercanos. Vacio si el cliente no esta ubicado.
+        """
+        posicion = self._posicion.get(int(id_cliente))
+        if posicion is None:
+            return self.ids[:0]
+        if k is not None:
+            ids, _ = self.cercanos(self.lat[posicion], self.lon[posicion], k + 1)
+        else:
+            ids = self.ids[self._posiciones_en_radio(self.xyz[posicion], radio_km)]
+        return ids[ids != self.ids[posicion]]
+
+    def en_caja(self, lon_min, lat_min, lon_max, lat_max):
+        """Ids de los clientes dentro de una caja lon/lat (p. ej. el viewport del mapa)."""
+        if not self.n:
+            return self.ids[:0]
+        if self._arbol is not None:
+            # Bola que cubre la caja (centro -> esquina o punto medio de lado mas lejano)
+            # y recorte exacto en lat/lon
+            lat_c, lon_c = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+            centro = proyectar(lat_c, lon_c)[0]
+            borde = proyectar([lat_min, lat_min, lat_max, lat_max, lat_min, lat_max, lat_c, lat_c],
+                              [lon_min, lon_max, lon_min, lon_max, lon_c, lon_c, lon_min, lon_max])
+            radio = np.sqrt(((borde - centro) ** 2).sum(axis=1)).max()
+            posiciones = np.asarray(self._arbol.query_ball_point(centro, radio * (1 + 1e-9)), dtype=np.int64)
+        else:
+            posiciones = np.arange(self.n)
+        lat, lon = self.lat[posiciones], self.lon[posiciones]
+        dentro = (lon >= lon_min) & (lon <= lon_max) & (lat >= lat_min) & (lat <= lat_max)
+        return self.ids[posiciones[dentro]]
+
+
+def caja_desde_relayout(relayout):
+    """
+    Caja (lon_min, lat_min, lon_max, lat_max) del viewport desde el relayoutData de
+    un mapa (esquinas en 'map._derived'); None si el evento no las trae.
+    """
+    esquinas = ((relayout or {}).get('map._derived') or {}).get('coordinates')
+    if not esquinas:
+        return None
+    lon, lat = np.asarray(esquinas, dtype=float).T
+    return float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())
+
+
+_indice = {'version': None, 'indice': None}
+_lock = threading.Lock()
+
+
+def indice_espacial(version):
+    """IndiceEspacial de la version de datos (se arma con una query a dim_cliente por version)."""
+    with _lock:
+        if _indice['version'] != version:
+            _indice.update(version=version, indice=IndiceEspacial(cargar_coordenadas_clientes()))
+        return _indice['indice']
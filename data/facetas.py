@@ -0,0 +1,141 @@
+"""
+Indice de facetas de los filtros de cliente (canal, subcanal, localidad, lista de
+precio y sucursal). Se arma en memoria desde dim_cliente una vez por version de
+datos; las opciones de cada filtro salen con la cantidad de clientes que quedan
+aplicando los demas filtros activos (busqueda facetada), sin query por cambio de
+filtros ni de fechas.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data.queries import cargar_dimension_clientes
+from utils.trazas import trazado
+
+# Filtro de atributo (mismas claves que FILTROS_ATRIBUTO de data/cache.py) -> columna de dim_cliente
+FACETAS = {
+    'canales': 'canal',
+    'subcanales': 'subcanal',
+    'localidades': 'localidad',
+    'listas_precio': 'id_lista_precio',
+    'sucursales': 'sucursal',
+}
+
+
+class IndiceFacetas:
+    """
+    Clientes activos codificados por faceta.
+
+    Atributos:
+        valores: faceta -> array de valores distintos (orden alfabetico; listas
+            de precio en orden numerico)
+        codigos: faceta -> array int con el indice del valor de cada cliente
+        rutas_fv1, rutas_fv4: clave 'id_sucursal|id_ruta' de cada cliente ('' si no tiene)
+        preventistas_fv1, preventistas_fv4: preventista de cada fuerza ('' si no tiene)
+    """
+
+    def __init__(self, df):
+        self.n = len(df)
+        self.valores = {}
+        self.codigos = {}
+        for faceta, columna in FACETAS.items():
+            serie = df[columna]
+            if faceta == 'listas_precio':
+                # Los valores del filtro son el id de la lista como texto; se ordenan numericamente
+                numeros = pd.to_numeric(serie, errors='coerce')
+                orden = np.sort(numeros.dropna().unique())
+                etiquetas = np.array([str(int(v)) for v in orden], dtype=object)
+                codigos = np.searchsorted(orden, numeros.fillna(-1).to_numpy())
+                codigos[numeros.isna().to_numpy()] = -1
+            else:
+                codigos, etiquetas = pd.factorize(serie, sort=True)
+                etiquetas = np.asarray(etiquetas, dtype=object)
+            self.valores[faceta] = etiquetas
+            self.codigos[faceta] = np.asarray(codigos, dtype=np.int64)
+
+        # Mismo formato que los values de obtener_rutas: 'id_sucursal|id_ruta'
+        sucursal = df['id_sucursal'].astype('Int64').astype(str)
+        for fuerza in ('fv1', 'fv4'):
+            ruta = df[f'id_ruta_{fuerza}']
+            clave = (sucursal + '|' + ruta.astype('Int64').astype(str)).where(ruta.notna(), '')
+            setattr(self, f'rutas_{fuerza}', clave.to_numpy(dtype=str))
+            setattr(self, f'preventistas_{fuerza}', df[f'preventista_{fuerza}'].fillna('').to_numpy(dtype=str))
+
+    def _mascara_faceta(self, faceta, seleccion):
+        posiciones = np.flatnonzero(np.isin(self.valores[faceta], list(seleccion)))
+        return np.isin(self.codigos[faceta], posiciones)
+
+    def _mascara_cliente(self, rutas, preventistas, fuerza_venta):
+        """Filtros de ruta y preventista con la misma semantica que _build_cliente_filters."""
+        mascara = np.ones(self.n, dtype=bool)
+        fuerzas = {'FV1': ('fv1',), 'FV4': ('fv4',)}.get(fuerza_venta, ('fv1', 'fv4'))
+        for seleccion, prefijo in ((rutas, 'rutas'), (preventistas, 'preventistas')):
+            if seleccion:
+                seleccion = [str(s) for s in seleccion]
+                cumple = np.zeros(self.n, dtype=bool)
+                for fuerza in fuerzas:
+                    cumple |= np.isin(getattr(self, f'{prefijo}_{fuerza}'), seleccion)
+                mascara &= cumple
+        return mascara
+
+    def mascara(self, filtros):
+        """Clientes que cumplen todos los filtros (facetas, ruta, preventista y fuerza de venta)."""
+        mascara = self._mascara_cliente(filtros.get('rutas'), filtros.get('preventistas'), filtros.get('fuerza_venta'))
+        for faceta in FACETAS:
+            if filtros.get(faceta):
+                mascara &= self._mascara_faceta(faceta, filtros[faceta])
+        return mascara
+
+    def contar(self, filtros):
+        """
+        Cantidad de clientes por valor de cada faceta, aplicando los filtros de
+        las demas facetas (y ruta/preventista/fuerza de venta) pero no los propios.
+
+        Args:
+            filtros: dict normalizado (normalizar_filtros) o con las claves de
+                FACETAS y rutas, preventistas, fuerza_venta
+
+        Returns:
+            dict faceta -> array de conteos alineado con self.valores[faceta]
+        """
+        base = self._mascara_cliente(filtros.get('rutas'), filtros.get('preventistas'), filtros.get('fuerza_venta'))
+        mascaras = {f: self._mascara_faceta(f, filtros[f]) for f in FACETAS if filtros.get(f)}
+        conteos = {}
+        for faceta in FACETAS:
+            mascara = base.copy()
+            for otra, m in mascaras.items():
+                if otra != faceta:
+                    mascara &= m
+            codigos = self.codigos[faceta][mascara]
+            conteos[faceta] = np.bincount(codigos[codigos >= 0], minlength=len(self.valores[faceta]))
+        return conteos
+
+    @trazado('pandas.opciones_facetas')
+    def opciones(self, filtros):
+        """
+        Opciones de cada MultiSelect: {'label': 'valor (n)', 'value': valor}. Los
+        valores sin clientes con los demas filtros quedan deshabilitados salvo
+        que ya esten seleccionados.
+        """
+        conteos = self.contar(filtros)
+        resultado = {}
+        for faceta, valores in self.valores.items():
+            seleccion = set(filtros.get(faceta) or [])
+            resultado[faceta] = [
+                {'label': f"{valor} ({n:,})", 'value': valor, 'disabled': bool(n == 0 and valor not in seleccion)}
+                for valor, n in zip(valores, conteos[faceta].tolist())
+            ]
+        return resultado
+
+
+_indice = {'version': None, 'indice': None}
+_lock = threading.Lock()
+
+
+def indice_facetas(version):
+    """IndiceFacetas de la version de datos (se arma con una query a dim_cliente por version)."""
+    with _lock:
+        if _indice['version'] != version:
+            _indice.update(version=version, indice=IndiceFacetas(cargar_dimension_clientes()))
+        return _indice['indice']
@@ -0,0 +1,144 @@
+"""
+Export Excel por lote: un ZIP con el Excel completo de cada cliente de las
+rutas/preventistas elegidos. Corre en un thread de fondo que reparte la
+generacion de los libros en un process pool. El estado y el ZIP quedan en
+disco, asi cualquier worker del servidor puede informar el progreso y servir
+el archivo, en un directorio propio de la app (0700, archivos 0600) que no se
+usa si es de otro usuario.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from config import LOTE_CONFIG
+from data.queries import cargar_catalogo_detalle, cargar_ventas_clientes_lote, contar_clientes_lote
+from utils.archivos import directorio_privado, abrir_privado
+from utils.pivot_cliente import ultimos_periodos
+
+
+DIRECTORIO_LOTES = LOTE_CONFIG['directorio']
+
+_METODO_INICIO = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def _directorio(job_id):
+    return os.path.join(DIRECTORIO_LOTES, job_id)
+
+
+def ruta_zip(job_id):
+    """Ruta del ZIP terminado del lote."""
+    return os.path.join(_directorio(job_id), 'clientes.zip')
+
+
+def _escribir_estado(job_id, estado, hechos=0, total=0, mensaje=''):
+    """Escribe el estado del lote de forma atomica (archivo temporal + os.replace)."""
+    ruta = os.path.join(_directorio(job_id), 'estado.json')
+    with abrir_privado(ruta + '.tmp', 'w') as f:
+        json.dump({'estado': estado, 'hechos': hechos, 'total': total, 'mensaje': mensaje}, f)
+    os.replace(ruta + '.tmp', ruta)
+
+
+def leer_estado(job_id):
+    """
+    Estado del lote: dict con 'estado' ('cargando', 'generando', 'listo', 'error'),
+    'hechos', 'total' y 'mensaje'. None si el lote no existe.
+    """
+    if not job_id or not str(job_id).isalnum():
+        return None
+    try:
+        if not directorio_privado(DIRECTORIO_LOTES):
+            return None
+        with open(os.path.join(_directorio(job_id), 'estado.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _limpiar_lotes_viejos():
+    """Borra los lotes con mas de LOTE_CONFIG['retencion_segundos']."""
+    limite = time.time() - LOTE_CONFIG['retencion_segundos']
+    for nombre in os.listdir(DIRECTORIO_LOTES):
+        ruta = os.path.join(DIRECTORIO_LOTES, nombre)
+        # Otro worker puede estar borrando el mismo lote
+        try:
+            if os.path.getmtime(ruta) < limite:
+                shutil.rmtree(ruta, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def iniciar_lote(rutas=None, preventistas=None, fuerza_venta=None):
+    """
+    Lanza el export en un thread de fondo y retorna el id del lote, o None si el
+    directorio de lotes es de otro usuario o escribible por otros.
+    """
+    if not directorio_privado(DIRECTORIO_LOTES):
+        print(f"Directorio de lotes {DIRECTORIO_LOTES} de otro usuario o escribible por otros: no se exporta")
+        return None
+    _limpiar_lotes_viejos()
+    job_id = uuid.uuid4().hex
+    os.mkdir(_directorio(job_id), 0o700)
+    _escribir_estado(job_id, 'cargando')
+    threading.Thread(target=_ejecutar_lote, args=(job_id, rutas, preventistas, fuerza_venta),
+                     daemon=True).start()
+    return job_id
+
+
+def _ejecutar_lote(job_id, rutas, preventistas, fuerza_venta):
+    """Carga los datos del lote (una query), genera los libros en paralelo y arma el ZIP."""
+    # openpyxl se importa lazy (solo al exportar Excel)
+    from utils.lote_worker import generar_excel_lote, inicializar_worker_lote
+
+    try:
+        # El tope se controla con un COUNT antes de traer las ventas de la seleccion
+        total = contar_clientes_lote(rutas, preventistas, fuerza_venta)
+        if total == 0:
+            _escribir_estado(job_id, 'error', mensaje='No hay clientes para la seleccion.')
+            return
+        if total > LOTE_CONFIG['max_clientes']:
+            _escribir_estado(job_id, 'error', total=total,
+                             mensaje=f"{total} clientes superan el maximo de {LOTE_CONFIG['max_clientes']}.")
+            return
+
+        df = cargar_ventas_clientes_lote(rutas, preventistas, fuerza_venta)
+        clientes = df.drop_duplicates('id_cliente')[['id_cliente', 'razon_social']]
+        total = len(clientes)
+        catalogo = cargar_catalogo_detalle()
+        ventas = df.dropna(subset=['id_articulo'])[['id_cliente', 'id_articulo', 'anio', 'mes', 'bultos']]
+        ventas_por_cliente = {id_cliente: grupo.drop(columns='id_cliente')
+                              for id_cliente, grupo in ventas.groupby('id_cliente')}
+        sin_ventas = ventas.iloc[:0].drop(columns='id_cliente')
+        _escribir_estado(job_id, 'generando', total=total)
+
+        # Sin fork: este thread corre en un servidor multi-thread y un hijo forkeado
+        # heredaria locks tomados (pool de SQLAlchemy, snapshot, trazas). Los procesos
+        # arrancan limpios: bajo gunicorn __main__ es el script de gunicorn, y con
+        # python app.py importan app.py como __mp_main__, donde no se arranca nada (crear_app)
+        contexto = multiprocessing.get_context(_METODO_INICIO)
+        n_procesos = min(LOTE_CONFIG['max_procesos'], os.cpu_count() or 1)
+        tmp = ruta_zip(job_id) + '.tmp'
+        with ProcessPoolExecutor(max_workers=n_procesos, mp_context=contexto,
+                                 initializer=inicializar_worker_lote,
+                                 initargs=(catalogo, ultimos_periodos(date.today()))) as pool, \
+                abrir_privado(tmp) as archivo, zipfile.ZipFile(archivo, 'w', zipfile.ZIP_STORED) as zf:
+            futuros = [
+                pool.submit(generar_excel_lote, int(c.id_cliente), f'{c.razon_social} [{c.id_cliente}]',
+                            ventas_por_cliente.get(c.id_cliente, sin_ventas))
+                for c in clientes.itertuples(index=False)
+            ]
+            # Los .xlsx ya vienen comprimidos: el ZIP solo los empaqueta
+            for hechos, futuro in enumerate(as_completed(futuros), 1):
+                nombre, contenido = futuro.result()
+                zf.writestr(nombre, contenido)
+                _escribir_estado(job_id, 'generando', hechos=hechos, total=total)
+        os.replace(tmp, ruta_zip(job_id))
+        _escribir_estado(job_id, 'listo', hechos=total, total=total)
+    except Exception as e:
+        _escribir_estado(job_id, 'error', mensaje=str(e))
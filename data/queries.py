@@ -5,6 +5,7 @@ Todas las queries SQL y carga de datos del dashboard.
 import pandas as pd
 from database import engine
 from config import GENERICOS_EXCLUIDOS
+from utils.trazas import trazado
 
 
 def obtener_genericos():
@@ -110,6 +111,55 @@ def obtener_preventistas(fuerza_venta=None):
     return df['preventista'].tolist()
 
 
+def cargar_dimension_clientes(solo_activos=True):
+    """
+    Atributos de filtro de los clientes (indice de facetas, data/facetas.py).
+    Con solo_activos=False incluye los anulados, como los JOINs de las queries de
+    ventas (agregados de meses cerrados, data/cierres.py).
+    """
+    query = f"""
+        SELECT
+            c.id_cliente,
+            COALESCE(c.des_canal_mkt, 'Sin canal') as canal,
+            COALESCE(c.des_subcanal_mkt, 'Sin subcanal') as subcanal,
+            COALESCE(c.des_localidad, 'Sin localidad') as localidad,
+            c.id_lista_precio,
+            COALESCE(c.des_sucursal, 'Sin sucursal') as sucursal,
+            c.id_sucursal,
+            c.id_ruta_fv1,
+            c.id_ruta_fv4,
+            c.des_personal_fv1 as preventista_fv1,
+            c.des_personal_fv4 as preventista_fv4
+        FROM gold.dim_cliente c
+        WHERE {"c.anulado = FALSE" if solo_activos else "TRUE"}
+    """
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn)
+    return df
+
+
+def cargar_coordenadas_clientes():
+    """
+    Coordenadas de los clientes activos ubicados (indice espacial, data/espacial.py).
+    Mismo criterio que los mapas: sin nulos ni ceros.
+    """
+    query = """
+        SELECT
+            c.id_cliente,
+            c.latitud,
+            c.longitud
+        FROM gold.dim_cliente c
+        WHERE c.anulado = FALSE
+          AND c.latitud IS NOT NULL AND c.longitud IS NOT NULL
+          AND c.latitud != 0 AND c.longitud != 0
+    """
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn)
+    df['latitud'] = df['latitud'].astype(float)
+    df['longitud'] = df['longitud'].astype(float)
+    return df
+
+
 def obtener_anios_disponibles():
     """Obtiene la lista de años disponibles en fact_ventas."""
     query = """
@@ -198,6 +248,7 @@ def _build_cliente_filters(rutas, preventistas, fuerza_venta):
     return where_cliente
 
 
+@trazado('pandas._process_ventas_df')
 def _process_ventas_df(df):
     """Procesa DataFrame de ventas: tipos y columnas derivadas."""
     df['latitud'] = df['latitud'].astype(float)
@@ -294,7 +345,10 @@ def cargar_ventas_por_cliente(fecha_desde=None, fecha_hasta=None, genericos=None
 
 
 def cargar_ventas_animacion(fecha_desde=None, fecha_hasta=None, genericos=None, marcas=None, rutas=None, preventistas=None, fuerza_venta=None, granularidad='semana'):
-    """Carga ventas agregadas por cliente y período partiendo de fact_ventas para incluir TODAS las ventas."""
+    """
+    Carga ventas agregadas por cliente y período partiendo de fact_ventas para incluir TODAS las ventas.
+    Solo devuelve pares cliente-período con actividad (cantidad > 0).
+    """
 
     trunc_map = {
         'dia': ('day', '%Y-%m-%d'),
@@ -351,6 +405,7 @@ def cargar_ventas_animacion(fecha_desde=None, fecha_hasta=None, genericos=None,
                  c.des_canal_mkt, c.des_segmento_mkt, c.des_subcanal_mkt, c.des_lista_precio, c.id_lista_precio,
                  c.id_ruta_fv1, c.id_ruta_fv4, c.des_personal_fv1, c.des_personal_fv4, c.des_sucursal,
                  DATE_TRUNC('{trunc_sql}', f.fecha_comprobante)
+        HAVING SUM(f.cantidades_total) > 0
         ORDER BY periodo
     """
 
@@ -366,6 +421,45 @@ def cargar_ventas_animacion(fecha_desde=None, fecha_hasta=None, genericos=None,
     return df
 
 
+def contar_puntos_animacion(fecha_desde=None, fecha_hasta=None, genericos=None, marcas=None, rutas=None, preventistas=None, fuerza_venta=None):
+    """
+    Cuenta los pares cliente-período con actividad por granularidad (dia, semana, mes),
+    sin traer las filas. Lo usa el planificador de animaciones para elegir granularidad.
+    """
+    where_clauses = []
+
+    if fecha_desde and fecha_hasta:
+        where_clauses.append(f"f.fecha_comprobante BETWEEN '{fecha_desde}' AND '{fecha_hasta}'")
+
+    join_articulo, where_articulo = _build_articulo_filters(genericos, marcas)
+    where_clauses.extend(where_articulo)
+    where_clauses.extend(_build_cliente_filters(rutas, preventistas, fuerza_venta))
+
+    where_sql = " AND ".join(where_clauses) if where_clauses else "TRUE"
+
+    query = f"""
+        WITH diario AS (
+            SELECT f.id_cliente, f.fecha_comprobante::date as dia
+            FROM gold.fact_ventas f
+            LEFT JOIN gold.dim_cliente c ON f.id_cliente = c.id_cliente
+            {join_articulo}
+            WHERE {where_sql}
+            GROUP BY f.id_cliente, f.fecha_comprobante::date
+            HAVING SUM(f.cantidades_total) > 0
+        )
+        SELECT
+            COUNT(*) as dia,
+            COUNT(DISTINCT (id_cliente, DATE_TRUNC('week', dia))) as semana,
+            COUNT(DISTINCT (id_cliente, DATE_TRUNC('month', dia))) as mes
+        FROM diario
+    """
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn)
+
+    return {gran: int(df[gran].iloc[0] or 0) for gran in ('dia', 'semana', 'mes')}
+
+
 def cargar_ventas_por_fecha(fecha_desde=None, fecha_hasta=None, canales=None, subcanales=None, localidades=None, listas_precio=None, sucursales=None, genericos=None, marcas=None, rutas=None, preventistas=None, fuerza_venta=None):
     """Carga ventas agregadas por fecha para el gráfico de evolución."""
 
@@ -647,6 +741,10 @@ def cargar_info_cliente(id_cliente):
     return df
 
 
+# Genericos del detalle de cliente (tabla y exports Excel)
+_GENERICOS_DETALLE_SQL = "'CERVEZAS', 'VINOS CCU', 'AGUAS DANONE', 'FRATELLI B', 'VINOS', 'VINOS FINOS'"
+
+
 def cargar_ventas_cliente_detalle(id_cliente):
     """
     Obtiene todos los articulos con ventas desglosadas por mes,
@@ -674,9 +772,146 @@ def cargar_ventas_cliente_detalle(id_cliente):
             v.bultos
         FROM gold.dim_articulo a
         LEFT JOIN ventas v ON a.id_articulo = v.id_articulo
-        WHERE a.generico IN ('CERVEZAS', 'VINOS CCU', 'AGUAS DANONE', 'FRATELLI B', 'VINOS', 'VINOS FINOS')
+        WHERE a.generico IN ({_GENERICOS_DETALLE_SQL})
         ORDER BY a.generico, a.marca, a.des_articulo, v.anio, v.mes
     """
     with engine.connect() as conn:
         df = pd.read_sql(query, conn)
     return df
+
+
+def cargar_catalogo_detalle():
+    """Articulos del detalle de cliente (mismos genericos y nombres que cargar_ventas_cliente_detalle)."""
+    query = f"""
+        SELECT
+            a.id_articulo,
+            COALESCE(a.generico, 'Sin categoria') as generico,
+            COALESCE(a.marca, 'Sin marca') as marca,
+            COALESCE(a.des_articulo, 'Articulo ' || a.id_articulo::text) as articulo
+        FROM gold.dim_articulo a
+        WHERE a.generico IN ({_GENERICOS_DETALLE_SQL})
+        ORDER BY a.generico, a.marca, a.des_articulo
+    """
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn)
+    return df
+
+
+def cargar_ventas_cubo():
+    """
+    Ventas por cliente, articulo y mes de todos los clientes (genericos del
+    detalle de cliente), ordenadas por cliente. Fuente del cubo compartido (data/cubo.py).
+    """
+    query = f"""
+        SELECT
+            f.id_cliente,
+            f.id_articulo,
+            EXTRACT(YEAR FROM f.fecha_comprobante)::int as anio,
+            EXTRACT(MONTH FROM f.fecha_comprobante)::int as mes,
+            SUM(f.cantidades_total) as bultos
+        FROM gold.fact_ventas f
+        JOIN gold.dim_articulo a ON f.id_articulo = a.id_articulo
+        WHERE a.generico IN ({_GENERICOS_DETALLE_SQL})
+          AND f.id_cliente IS NOT NULL
+        GROUP BY f.id_cliente, f.id_articulo, anio, mes
+        ORDER BY f.id_cliente
+    """
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn)
+    return df
+
+
+def cargar_agregados_mes(anio, mes):
+    """
+    Ventas de un mes por cliente (id_cliente, id_sucursal; -1 si son nulos),
+    generico y marca, y totales por cliente. Los documentos (nro_doc distintos) no
+    se suman entre meses ni clientes y no forman parte del almacen.
+    Fuente del almacen de meses cerrados (data/cierres.py).
+
+    Returns:
+        (df_detalle, df_clientes)
+    """
+    rango = f"""
+        f.fecha_comprobante >= make_date({int(anio)}, {int(mes)}, 1)
+        AND f.fecha_comprobante < (make_date({int(anio)}, {int(mes)}, 1) + INTERVAL '1 month')
+    """
+    query_detalle = f"""
+        SELECT
+            COALESCE(f.id_cliente, -1) as id_cliente,
+            COALESCE(f.id_sucursal, -1) as id_sucursal,
+            COALESCE(a.generico, 'Sin categoría') as generico,
+            COALESCE(a.marca, 'Sin marca') as marca,
+            COALESCE(SUM(f.cantidades_total), 0) as bultos,
+            COALESCE(SUM(f.subtotal_final), 0) as facturacion
+        FROM gold.fact_ventas f
+        LEFT JOIN gold.dim_articulo a ON f.id_articulo = a.id_articulo
+        WHERE {rango}
+        GROUP BY 1, 2, 3, 4
+    """
+    query_clientes = f"""
+        SELECT
+            COALESCE(f.id_cliente, -1) as id_cliente,
+            COALESCE(f.id_sucursal, -1) as id_sucursal,
+            COALESCE(SUM(f.cantidades_total), 0) as bultos,
+            COALESCE(SUM(f.subtotal_final), 0) as facturacion
+        FROM gold.fact_ventas f
+        WHERE {rango}
+        GROUP BY 1, 2
+    """
+    with engine.connect() as conn:
+        df_detalle = pd.read_sql(query_detalle, conn)
+        df_clientes = pd.read_sql(query_clientes, conn)
+    return df_detalle, df_clientes
+
+
+def contar_clientes_lote(rutas=None, preventistas=None, fuerza_venta=None):
+    """Cantidad de clientes activos de las rutas/preventistas elegidos (tope del lote, sin leer ventas)."""
+    where_cliente = ["c.anulado = FALSE"]
+    where_cliente.extend(_build_cliente_filters(rutas, preventistas, fuerza_venta))
+    query = f"""
+        SELECT COUNT(*) as n
+        FROM gold.dim_cliente c
+        WHERE {" AND ".join(where_cliente)}
+    """
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn)
+    return int(df['n'].iloc[0])
+
+
+def cargar_ventas_clientes_lote(rutas=None, preventistas=None, fuerza_venta=None):
+    """
+    Ventas por articulo y mes de todos los clientes de las rutas/preventistas
+    elegidos, en una sola query (export Excel por lote). Los clientes sin ventas
+    vienen con una fila con id_articulo/anio/mes/bultos NULL.
+    """
+    where_cliente = ["c.anulado = FALSE"]
+    where_cliente.extend(_build_cliente_filters(rutas, preventistas, fuerza_venta))
+    where_sql = " AND ".join(where_cliente)
+
+    query = f"""
+        WITH clientes AS (
+            SELECT c.id_cliente, c.razon_social
+            FROM gold.dim_cliente c
+            WHERE {where_sql}
+        ),
+        ventas AS (
+            SELECT
+                f.id_cliente,
+                f.id_articulo,
+                EXTRACT(YEAR FROM f.fecha_comprobante)::int as anio,
+                EXTRACT(MONTH FROM f.fecha_comprobante)::int as mes,
+                SUM(f.cantidades_total) as bultos
+            FROM gold.fact_ventas f
+            JOIN clientes cl ON f.id_cliente = cl.id_cliente
+            JOIN gold.dim_articulo a ON f.id_articulo = a.id_articulo
+            WHERE a.generico IN ({_GENERICOS_DETALLE_SQL})
+            GROUP BY f.id_cliente, f.id_articulo, anio, mes
+        )
+        SELECT cl.id_cliente, cl.razon_social, v.id_articulo, v.anio, v.mes, v.bultos
+        FROM clientes cl
+        LEFT JOIN ventas v ON cl.id_cliente = v.id_cliente
+        ORDER BY cl.id_cliente
+    """
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn)
+    return df
@@ -0,0 +1,210 @@
+"""
+Snapshot del estado de arranque: rango de fechas, opciones de filtros, datos
+del YTD y del tablero, y el dataset de clientes del periodo default.
+Se persiste en disco para que cada worker arranque en milisegundos sin depender
+de la latencia de la base; un thread de fondo lo refresca. El archivo es un .npz
+sin objetos pickleados: el estado va como JSON y el dataset en columnas, en un
+directorio propio de la app (0700) que se ignora si es de otro usuario.
+"""
+import json
+import os
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from config import SNAPSHOT_CONFIG
+from data.queries import (
+    obtener_genericos, obtener_marcas, obtener_rutas, obtener_preventistas,
+    obtener_rango_fechas, obtener_anios_disponibles, cargar_ventas_por_cliente
+)
+from data.ytd_queries import obtener_anios_disponibles_ytd, obtener_mes_actual, obtener_anio_actual
+from utils.archivos import es_propio, directorio_privado, abrir_privado
+
+
+ARCHIVO_SNAPSHOT = os.path.join(SNAPSHOT_CONFIG['directorio'], 'estado.npz')
+
+# Se incrementa si cambian las claves del snapshot (invalida los archivos viejos)
+_VERSION_FORMATO = 2
+
+_estado = None
+_lock = threading.Lock()
+_refresco_iniciado = False
+
+
+def consultar_estado_inicial():
+    """Arma el estado de arranque consultando la base."""
+    hoy = date.today()
+    fecha_min, fecha_max = obtener_rango_fechas()
+    estado = {
+        'version': _VERSION_FORMATO,
+        'creado': time.time(),
+        'fecha_min': fecha_min,
+        'fecha_max': fecha_max,
+        'lista_genericos': obtener_genericos(),
+        'lista_marcas': obtener_marcas(),
+        'lista_rutas': obtener_rutas(),
+        'lista_preventistas': obtener_preventistas(),
+        # Rango default: mes corriente (1ro del mes actual hasta hoy)
+        'fecha_desde_default': hoy.replace(day=1),
+        'fecha_hasta_default': hoy,
+        'lista_anios': obtener_anios_disponibles(),
+    }
+    estado['df_ventas'] = cargar_ventas_por_cliente(estado['fecha_desde_default'], estado['fecha_hasta_default'])
+
+    try:
+        estado['ytd_anios'] = obtener_anios_disponibles_ytd()
+        estado['ytd_anio_actual'] = obtener_anio_actual()
+        estado['ytd_mes_actual'] = obtener_mes_actual()
+    except Exception as e:
+        print(f"  - Error cargando datos YTD: {e}")
+        estado['ytd_anios'] = [2025, 2024]
+        estado['ytd_anio_actual'] = 2025
+        estado['ytd_mes_actual'] = 12
+    return estado
+
+
+def _directorio_seguro():
+    """Crea el directorio del snapshot (0700) si falta; False si existe y es ajeno."""
+    directorio = os.path.dirname(ARCHIVO_SNAPSHOT)
+    if not directorio_privado(directorio):
+        print(f"Directorio de snapshot {directorio} de otro usuario o escribible por otros: se ignora")
+        return False
+    return True
+
+
+def _json_default(valor):
+    if isinstance(valor, date):
+        return {'__fecha__': valor.isoformat()}
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"{type(valor).__name__} no serializable en el snapshot")
+
+
+def _json_fechas(objeto):
+    return date.fromisoformat(objeto['__fecha__']) if '__fecha__' in objeto else objeto
+
+
+def _columnas_df(df):
+    """DataFrame -> arrays del .npz (texto codificado por diccionario, -1 = nulo) y tipos."""
+    arrays, tipos = {}, {}
+    for i, columna in enumerate(df.columns):
+        serie = df[columna]
+        if pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+            arrays[f'df__{i}'] = serie.to_numpy()
+            tipos[columna] = 'numero'
+        else:
+            codigos, valores = pd.factorize(serie)
+            arrays[f'df__{i}'] = codigos.astype(np.int32)
+            arrays[f'df__{i}__valores'] = np.asarray(valores, dtype=str)
+            tipos[columna] = 'texto'
+    return arrays, tipos
+
+
+def _df_columnas(datos, tipos):
+    columnas = {}
+    for i, (columna, tipo) in enumerate(tipos.items()):
+        valores = datos[f'df__{i}']
+        if tipo == 'texto':
+            codigos = valores
+            valores = np.append(datos[f'df__{i}__valores'].astype(object), None)[codigos]
+        columnas[columna] = valores
+    return pd.DataFrame(columnas)
+
+
+def _guardar(estado):
+    """Escribe el snapshot de forma atomica (archivo temporal propio + os.replace)."""
+    if not _directorio_seguro():
+        return
+    estado = dict(estado)
+    arrays, tipos = _columnas_df(estado.pop('df_ventas'))
+    estado['df_ventas_tipos'] = tipos
+    arrays['estado'] = np.array(json.dumps(estado, default=_json_default))
+    tmp = f"{ARCHIVO_SNAPSHOT}.{os.getpid()}.tmp"
+    with abrir_privado(tmp) as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, ARCHIVO_SNAPSHOT)
+
+
+def _leer():
+    """Snapshot en disco, o None si no existe, no es propio, esta corrupto o es de otro formato."""
+    try:
+        if not _directorio_seguro() or not es_propio(ARCHIVO_SNAPSHOT):
+            return None
+        with np.load(ARCHIVO_SNAPSHOT, allow_pickle=False) as datos:
+            estado = json.loads(str(datos['estado']), object_hook=_json_fechas)
+            if not isinstance(estado, dict) or estado.get('version') != _VERSION_FORMATO:
+                return None
+            estado['df_ventas'] = _df_columnas(datos, estado.pop('df_ventas_tipos'))
+    except (OSError, ValueError, KeyError, EOFError):
+        return None
+    return estado
+
+
+def _vigente(estado):
+    """True si el snapshot es mas nuevo que el intervalo de refresco y del mismo dia."""
+    edad = time.time() - estado['creado']
+    return edad < SNAPSHOT_CONFIG['intervalo_refresco_segundos'] and estado['fecha_hasta_default'] == date.today()
+
+
+def obtener_estado_inicial():
+    """
+    Estado de arranque de la app. Se lee del snapshot en disco si existe (aunque
+    este vencido: el refresco de fondo lo actualiza); solo sin snapshot se
+    consulta la base antes de servir. Lanza el thread de refresco.
+    """
+    global _estado
+    estado = _leer()
+    if estado is None:
+        print("Snapshot de arranque no disponible, consultando la base...")
+        estado = consultar_estado_inicial()
+        _guardar(estado)
+    else:
+        print(f"Snapshot de arranque cargado ({time.time() - estado['creado']:.0f}s de antiguedad)")
+    with _lock:
+        _estado = estado
+    _iniciar_refresco(inmediato=not _vigente(estado))
+    return estado
+
+
+def estado_actual():
+    """Ultimo estado de arranque cargado o refrescado en este proceso."""
+    with _lock:
+        return _estado
+
+
+def refrescar_estado():
+    """
+    Actualiza el estado: si otro worker ya refresco el snapshot se relee el
+    archivo, si no se consulta la base y se persiste.
+    """
+    global _estado
+    estado = _leer()
+    if estado is None or not _vigente(estado):
+        estado = consultar_estado_inicial()
+        _guardar(estado)
+    with _lock:
+        _estado = estado
+    return estado
+
+
+def _refrescar_periodicamente(inmediato):
+    intervalo = SNAPSHOT_CONFIG['intervalo_refresco_segundos']
+    while True:
+        if not inmediato:
+            time.sleep(intervalo)
+        inmediato = False
+        try:
+            refrescar_estado()
+        except Exception as e:
+            print(f"Error refrescando snapshot de arranque: {e}")
+
+
+def _iniciar_refresco(inmediato):
+    global _refresco_iniciado
+    if _refresco_iniciado:
+        return
+    _refresco_iniciado = True
+    threading.Thread(target=_refrescar_periodicamente, args=(inmediato,), daemon=True).start()
@@ -5,6 +5,34 @@ Incluye cálculos de targets automáticos, comparación año anterior, y métric
 import pandas as pd
 from datetime import date
 from database import engine
+from config import CIERRES_CONFIG
+from data.cierres import ventas_filtradas
+
+
+def _ventas_cierres(anio, mes_hasta, tipo_sucursal):
+    """Ventas de enero a mes_hasta desde el almacen de meses cerrados (data/cierres.py)."""
+    return ventas_filtradas((int(anio), 1), (int(anio), int(mes_hasta)), tipo_sucursal=tipo_sucursal)
+
+
+def _contar_documentos_ytd(anio, mes_hasta, filtro_sucursal):
+    """
+    Documentos (nro_doc distintos) de enero a mes_hasta. Un mismo nro_doc cuenta
+    una vez en todo el rango, asi que no sale de sumar los agregados por mes del
+    almacen y se consulta siempre en vivo.
+    """
+    query = f"""
+        SELECT COUNT(DISTINCT f.nro_doc) as documentos
+        FROM gold.fact_ventas f
+        LEFT JOIN gold.dim_cliente c ON f.id_cliente = c.id_cliente AND f.id_sucursal = c.id_sucursal
+        WHERE f.fecha_comprobante >= make_date({anio}, 1, 1)
+          AND f.fecha_comprobante < (make_date({anio}, {mes_hasta}, 1) + INTERVAL '1 month')
+          {filtro_sucursal}
+    """
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn)
+
+    return int(df['documentos'].iloc[0])
 
 
 def obtener_ventas_ytd(anio, mes_hasta, tipo_sucursal='TODAS'):
@@ -25,6 +53,17 @@ def obtener_ventas_ytd(anio, mes_hasta, tipo_sucursal='TODAS'):
     elif tipo_sucursal == 'CASA_CENTRAL':
         filtro_sucursal = "AND c.des_sucursal = 'CASA CENTRAL'"
 
+    if CIERRES_CONFIG['habilitado']:
+        detalle, clientes = _ventas_cierres(anio, mes_hasta, tipo_sucursal)
+        # Sin ventas, SUM devuelve NULL como en la query
+        vacio = len(detalle) == 0
+        return pd.DataFrame([{
+            'bultos': None if vacio else detalle['bultos'].sum(),
+            'facturacion': None if vacio else detalle['facturacion'].sum(),
+            'documentos': _contar_documentos_ytd(anio, mes_hasta, filtro_sucursal),
+            'clientes': clientes.loc[clientes['id_cliente'] >= 0, 'id_cliente'].nunique(),
+        }])
+
     query = f"""
         SELECT
             SUM(f.cantidades_total) as bultos,
@@ -48,6 +87,10 @@ def obtener_ventas_por_mes(anio, mes_hasta, tipo_sucursal='TODAS'):
     """
     Obtiene ventas desglosadas por mes para el año indicado.
     """
+    if CIERRES_CONFIG['habilitado']:
+        detalle, _ = _ventas_cierres(anio, mes_hasta, tipo_sucursal)
+        return detalle.groupby('mes', as_index=False)[['bultos', 'facturacion']].sum()
+
     filtro_sucursal = ""
     if tipo_sucursal == 'SUCURSALES':
         filtro_sucursal = "AND c.des_sucursal != 'CASA CENTRAL' AND c.des_sucursal LIKE 'SUCURSAL%'"
@@ -78,6 +121,11 @@ def obtener_ventas_por_generico(anio, mes_hasta, top_n=5, tipo_sucursal='TODAS')
     """
     Obtiene ventas por genérico (categoría de producto).
     """
+    if CIERRES_CONFIG['habilitado']:
+        detalle, _ = _ventas_cierres(anio, mes_hasta, tipo_sucursal)
+        df = detalle.groupby('generico', as_index=False)[['bultos', 'facturacion']].sum()
+        return df.sort_values('bultos', ascending=False).head(top_n).reset_index(drop=True)
+
     filtro_sucursal = ""
     if tipo_sucursal == 'SUCURSALES':
         filtro_sucursal = "AND c.des_sucursal != 'CASA CENTRAL' AND c.des_sucursal LIKE 'SUCURSAL%'"
@@ -110,6 +158,11 @@ def obtener_ventas_por_sucursal(anio, mes_hasta, tipo_sucursal='TODAS'):
     """
     Obtiene ventas por sucursal (región).
     """
+    if CIERRES_CONFIG['habilitado']:
+        detalle, _ = _ventas_cierres(anio, mes_hasta, tipo_sucursal)
+        df = detalle.groupby('sucursal', as_index=False)[['bultos', 'facturacion']].sum()
+        return df.sort_values('bultos', ascending=False).reset_index(drop=True)
+
     filtro_sucursal = ""
     if tipo_sucursal == 'SUCURSALES':
         filtro_sucursal = "AND c.des_sucursal != 'CASA CENTRAL' AND c.des_sucursal LIKE 'SUCURSAL%'"
@@ -140,6 +193,11 @@ def obtener_ventas_por_canal(anio, mes_hasta, tipo_sucursal='TODAS'):
     """
     Obtiene ventas por canal.
     """
+    if CIERRES_CONFIG['habilitado']:
+        detalle, _ = _ventas_cierres(anio, mes_hasta, tipo_sucursal)
+        df = detalle.groupby('canal', as_index=False)[['bultos', 'facturacion']].sum()
+        return df.sort_values('bultos', ascending=False).reset_index(drop=True)
+
     filtro_sucursal = ""
     if tipo_sucursal == 'SUCURSALES':
         filtro_sucursal = "AND c.des_sucursal != 'CASA CENTRAL' AND c.des_sucursal LIKE 'SUCURSAL%'"
@@ -10,7 +10,6 @@ def create_cliente_layout(id_cliente):
     """Crea el layout del detalle de cliente con store para el ID."""
     return html.Div([
         dcc.Store(id='cliente-id-store', data={'id_cliente': id_cliente}),
-        dcc.Store(id='excel-marca-trigger', data=''),
         dcc.Download(id='download-excel-marca'),
         dcc.Download(id='download-excel-completo'),
 
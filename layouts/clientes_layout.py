@@ -3,12 +3,21 @@ Layout de busqueda de clientes.
 Permite buscar clientes por razon social, fantasia o ID y navegar a su detalle.
 """
 from dash import html, dcc
-from config import DARK
+from config import DARK, LOTE_CONFIG
 
 
-def create_clientes_layout():
-    """Crea el layout de la pagina de busqueda de clientes."""
+def create_clientes_layout(lista_rutas=None, lista_preventistas=None):
+    """
+    Crea el layout de la pagina de busqueda de clientes.
+
+    Args:
+        lista_rutas: opciones de rutas (obtener_rutas) para el export por lote
+        lista_preventistas: preventistas para el export por lote
+    """
     return html.Div([
+        dcc.Store(id='lote-job'),
+        dcc.Interval(id='lote-intervalo', interval=LOTE_CONFIG['intervalo_ms'], disabled=True),
+
         # Header
         html.Div([
             html.Div([
@@ -59,6 +68,40 @@ def create_clientes_layout():
                 'padding': '30px 20px 20px 20px',
             }),
 
+            # Export Excel por lote
+            html.Div([
+                html.Div("Exportar Excel por ruta o preventista", style={
+                    'fontSize': '15px', 'fontWeight': 'bold', 'color': DARK['text'], 'marginBottom': '4px'
+                }),
+                html.Div("Genera un ZIP con el Excel completo de cada cliente de la seleccion.", style={
+                    'fontSize': '12px', 'color': DARK['text_muted'], 'marginBottom': '10px'
+                }),
+                html.Div([
+                    html.Div(dcc.Dropdown(
+                        id='lote-rutas', options=lista_rutas or [], multi=True,
+                        placeholder='Rutas...', style={'fontSize': '13px'},
+                    ), style={'flex': '1', 'minWidth': '200px'}),
+                    html.Div(dcc.Dropdown(
+                        id='lote-preventistas', options=lista_preventistas or [], multi=True,
+                        placeholder='Preventistas...', style={'fontSize': '13px'},
+                    ), style={'flex': '1', 'minWidth': '200px'}),
+                    html.Button("Exportar ZIP", id='btn-lote-excel', style={
+                        'padding': '8px 20px', 'fontSize': '14px', 'cursor': 'pointer',
+                        'border': f'1px solid {DARK["accent_green"]}', 'borderRadius': '6px',
+                        'backgroundColor': 'transparent', 'color': DARK['accent_green'], 'fontWeight': 'bold',
+                        'whiteSpace': 'nowrap',
+                    }),
+                ], style={'display': 'flex', 'gap': '15px', 'alignItems': 'center', 'flexWrap': 'wrap'}),
+                html.Div(id='lote-progreso', style={'marginTop': '10px'}),
+            ], style={
+                'maxWidth': '900px',
+                'margin': '0 auto 20px auto',
+                'padding': '15px 20px',
+                'backgroundColor': DARK['card'],
+                'borderRadius': '8px',
+                'border': f'1px solid {DARK["border"]}',
+            }),
+
             # Resultados
             html.Div(id='clientes-resultados', style={
                 'maxWidth': '900px',
@@ -41,6 +41,21 @@ def create_ventas_layout(fecha_min, fecha_max, fecha_desde_default, fecha_hasta_
         # Store para coordenadas del cliente buscado
         dcc.Store(id='busqueda-cliente-store', data={}),
 
+        # Badges de zonas: filtros del ultimo render y badge que se esta abriendo
+        dcc.Store(id='badges-filtros', data=None),
+        dcc.Store(id='badge-zona-abierta', data=None),
+
+        # Nivel de zoom entero de cada mapa (solo cambia con clusters activos)
+        dcc.Store(id='zoom-mapa-ventas', data=None),
+        dcc.Store(id='zoom-mapa-compro', data=None),
+
+        # Filtrado en el navegador: clientes del periodo en columnas y disparo de los
+        # mapas del servidor ante cambios de filtros de atributo
+        dcc.Store(id='datos-navegador-ventas', data=None),
+        dcc.Store(id='datos-navegador-compro', data=None),
+        dcc.Store(id='disparo-atributos-ventas', data=None),
+        dcc.Store(id='disparo-atributos-compro', data=None),
+
         # =================================================================
         # DRAWER DE FILTROS (panel lateral colapsable)
         # =================================================================
@@ -244,6 +259,22 @@ def create_ventas_layout(fecha_min, fecha_max, fecha_desde_default, fecha_hasta_
                                     multiple=True,
                                 ),
                             ]),
+                            dmc.Switch(
+                                id='opcion-clusters',
+                                label="Agrupar clientes (clusters)",
+                                checked=False,
+                                size="sm",
+                                styles={"label": {"color": DARK['text_secondary']}},
+                            ),
+                            dmc.Switch(
+                                id='opcion-filtrado-navegador',
+                                label="Filtrar en el navegador",
+                                description="Canal, subcanal, localidad, lista y sucursal sin recargar los mapas de puntos",
+                                checked=False,
+                                size="sm",
+                                styles={"label": {"color": DARK['text_secondary']},
+                                        "description": {"color": DARK['text_secondary']}},
+                            ),
                             dmc.Switch(
                                 id='opcion-escala-log',
                                 label="Escala Logaritmica",
@@ -270,13 +301,14 @@ def create_ventas_layout(fecha_min, fecha_max, fecha_desde_default, fecha_hasta_
                                 dmc.Slider(
                                     id='slider-precision',
                                     min=1,
-                                    max=3,
+                                    max=4,
                                     step=0.25,
                                     value=2,
                                     marks=[
                                         {"value": 1, "label": "10km"},
                                         {"value": 2, "label": "1km"},
                                         {"value": 3, "label": "100m"},
+                                        {"value": 4, "label": "10m"},
                                     ],
                                     mb="lg",
                                 ),
@@ -0,0 +1,91 @@
+"""
+Soporte para pruebas de carga (tools/carga.py).
+Con CARGA_CONFIG['archivo_grabacion'] (env DASHBOARD_GRABAR=<archivo.jsonl>) cada
+request de callback de Dash se agrega al archivo con su payload, para reproducir
+la sesion despues. /admin/pool expone el uso del pool de conexiones a la base
+(en uso, maximo alcanzado, esperas) para medir la saturacion durante la prueba.
+El pool y sus contadores son del proceso: con varios workers (gunicorn) cada
+respuesta describe solo el worker que la atendio, identificado por su pid.
+"""
+import json
+import os
+import threading
+import time
+
+from flask import abort, jsonify, request
+from sqlalchemy import event
+
+from config import CARGA_CONFIG
+from routes.perfiles import nombre_callback, token_admin_valido
+
+_RUTA_CALLBACKS = '/_dash-update-component'
+
+_lock = threading.Lock()
+_pool = {'en_uso': 0, 'max_en_uso': 0, 'checkouts': 0, 'saturados': 0}
+
+
+def _capacidad(pool):
+    """Conexiones que el pool puede entregar a la vez (size + max_overflow), o None si no tiene limite."""
+    size = getattr(pool, 'size', None)
+    if not callable(size):
+        return None
+    return size() + max(getattr(pool, '_max_overflow', 0), 0)
+
+
+def instrumentar_pool(engine):
+    """Cuenta las conexiones en uso del pool del engine y cuantas veces se llego a la capacidad."""
+    capacidad = _capacidad(engine.pool)
+
+    @event.listens_for(engine, 'checkout')
+    def _checkout(dbapi_connection, registro, proxy):
+        with _lock:
+            _pool['en_uso'] += 1
+            _pool['checkouts'] += 1
+            _pool['max_en_uso'] = max(_pool['max_en_uso'], _pool['en_uso'])
+            if capacidad is not None and _pool['en_uso'] >= capacidad:
+                _pool['saturados'] += 1
+
+    @event.listens_for(engine, 'checkin')
+    def _checkin(dbapi_connection, registro):
+        with _lock:
+            _pool['en_uso'] = max(_pool['en_uso'] - 1, 0)
+
+
+def estado_pool(engine, reiniciar=False):
+    """
+    Uso del pool de este worker: en uso, maximo alcanzado, capacidad, checkouts y
+    checkouts con el pool lleno, con el pid del proceso.
+    """
+    with _lock:
+        estado = dict(_pool, pid=os.getpid(), alcance='worker', capacidad=_capacidad(engine.pool),
+                      detalle=engine.pool.status())
+        if reiniciar:
+            _pool.update(max_en_uso=_pool['en_uso'], checkouts=0, saturados=0)
+    return estado
+
+
+def registrar_carga(app, engine):
+    """Registra la grabacion de payloads y la ruta /admin/pool en el servidor de la app Dash."""
+    server = app.server
+    instrumentar_pool(engine)
+    lock_archivo = threading.Lock()
+
+    @server.before_request
+    def grabar_payload():
+        archivo = CARGA_CONFIG['archivo_grabacion']
+        if not archivo or request.path != _RUTA_CALLBACKS:
+            return
+        payload = request.get_json(silent=True)
+        if not payload:
+            return
+        linea = json.dumps({'t': time.time(), 'callback': nombre_callback(app, payload), 'payload': payload},
+                           separators=(',', ':'), default=str)
+        with lock_archivo:
+            with open(archivo, 'a') as f:
+                f.write(linea + '\n')
+
+    @server.route('/admin/pool')
+    def admin_pool():
+        if not token_admin_valido(request.args.get('token') or request.headers.get('X-Admin-Token')):
+            abort(403)
+        return jsonify(estado_pool(engine, reiniciar=request.args.get('reiniciar') == '1'))
@@ -0,0 +1,31 @@
+"""
+Ruta Flask de descarga del export Excel por lote (data/lotes.py).
+Sirve /lotes/<job_id>.zip desde disco con flask.send_file: el ZIP (hasta
+LOTE_CONFIG['max_clientes'] libros) no pasa por la respuesta JSON de un callback.
+"""
+from flask import abort, send_file
+
+from data.lotes import leer_estado, ruta_zip
+
+
+def url_zip(job_id):
+    """URL de descarga del ZIP terminado del lote."""
+    return f"/lotes/{job_id}.zip"
+
+
+def registrar_rutas_lotes(server):
+    """Registra la ruta de descarga de lotes en el servidor Flask de Dash."""
+
+    @server.route('/lotes/<job_id>.zip')
+    def descargar_lote(job_id):
+        if not job_id.isalnum():
+            abort(404)
+        estado = leer_estado(job_id)
+        if estado is None or estado['estado'] != 'listo':
+            abort(404)
+        try:
+            return send_file(ruta_zip(job_id), mimetype='application/zip', as_attachment=True,
+                             download_name='clientes_excel.zip', max_age=0)
+        except FileNotFoundError:
+            # Borrado por la limpieza de lotes viejos
+            abort(404)
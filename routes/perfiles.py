@@ -0,0 +1,146 @@
+"""
+Perfilado de callbacks bajo demanda (solo administradores).
+Con PERFILADO_CONFIG['token'] definido, un request de callback de Dash se corre
+bajo cProfile si trae el header X-Perfilar con el token (y opcionalmente
+X-Perfilar-Callback con el nombre del callback), o si el navegador activo el
+perfilado desde /admin/perfiles. Los perfiles se listan en /admin/perfiles.
+"""
+import cProfile
+import hmac
+import time
+from html import escape
+
+from flask import Response, abort, g, redirect, request, send_file
+
+from config import PERFILADO_CONFIG
+from utils.perfilado import guardar_perfil, listar_perfiles, ruta_perfil, resumen_perfil
+
+_RUTA_CALLBACKS = '/_dash-update-component'
+_COOKIE_TOKEN = 'perfilar_token'
+_COOKIE_CALLBACK = 'perfilar_callback'
+
+
+def token_admin_valido(valor):
+    """True si valor es el token de admin (PERFILADO_CONFIG['token']) y hay uno definido."""
+    token = PERFILADO_CONFIG['token']
+    return bool(token) and bool(valor) and hmac.compare_digest(str(valor), token)
+
+
+def _es_admin():
+    return token_admin_valido(request.args.get('token') or request.cookies.get(_COOKIE_TOKEN))
+
+
+def _callback_objetivo():
+    """Nombre del callback a perfilar en este request ('*' = cualquiera), o None."""
+    if token_admin_valido(request.headers.get('X-Perfilar')):
+        return request.headers.get('X-Perfilar-Callback') or '*'
+    if token_admin_valido(request.cookies.get(_COOKIE_TOKEN)):
+        return request.cookies.get(_COOKIE_CALLBACK)
+    return None
+
+
+def nombre_callback(app, payload):
+    """Nombre de la funcion del callback a partir del output del request de Dash."""
+    salida = (payload or {}).get('output', '')
+    funcion = app.callback_map.get(salida, {}).get('callback')
+    return getattr(funcion, '__name__', None) or salida
+
+
+def _pagina_perfiles():
+    filas = []
+    for callback_id, perfiles in listar_perfiles().items():
+        for meta in perfiles:
+            base = f"/admin/perfiles/{escape(callback_id)}/{escape(meta['archivo'])}"
+            filas.append(
+                f"<tr><td>{escape(callback_id)}</td>"
+                f"<td>{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(meta['creado']))}</td>"
+                f"<td style='text-align:right'>{meta['duracion'] * 1000:,.0f} ms</td>"
+                f"<td><a href='{base}'>resumen</a> · <a href='{base}?formato=prof'>.prof</a> · "
+                f"<a href='{base}?formato=collapsed'>.collapsed</a></td></tr>"
+            )
+    activo = request.cookies.get(_COOKIE_CALLBACK)
+    estado = (f"Perfilado activo en este navegador: <b>{escape(activo)}</b> "
+              f"(<a href='/admin/perfiles/desactivar'>desactivar</a>)" if activo else
+              "Perfilado inactivo. Activar con /admin/perfiles/activar?callback=&lt;nombre o *&gt;")
+    return (
+        "<html><head><title>Perfiles de callbacks</title></head>"
+        "<body style='font-family:monospace;background:#1a1a2e;color:#e0e0e0;padding:20px'>"
+        f"<h2>Perfiles de callbacks</h2><p>{estado}</p>"
+        "<table cellpadding='6' style='border-collapse:collapse'>"
+        "<tr><th align='left'>Callback</th><th align='left'>Fecha</th><th>Duracion</th><th></th></tr>"
+        + ''.join(filas) + "</table></body></html>"
+    )
+
+
+def registrar_perfilado(app):
+    """Registra los hooks de perfilado y las rutas /admin/perfiles en el servidor de la app Dash."""
+    server = app.server
+
+    @server.before_request
+    def iniciar_perfil():
+        if request.path != _RUTA_CALLBACKS or not PERFILADO_CONFIG['token']:
+            return
+        objetivo = _callback_objetivo()
+        if objetivo is None:
+            return
+        nombre = nombre_callback(app, request.get_json(silent=True))
+        if objetivo not in ('*', nombre):
+            return
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Ya hay otro perfil activo (otro request perfilado en paralelo)
+            return
+        g.perfil = (perfil, nombre, time.perf_counter())
+
+    @server.after_request
+    def terminar_perfil(respuesta):
+        activo = g.pop('perfil', None)
+        if activo is not None:
+            perfil, nombre, inicio = activo
+            perfil.disable()
+            guardar_perfil(perfil, nombre, time.perf_counter() - inicio,
+                           detalle={'output': (request.get_json(silent=True) or {}).get('output')},
+                           max_por_callback=PERFILADO_CONFIG['max_por_callback'])
+        return respuesta
+
+    @server.route('/admin/perfiles')
+    def admin_perfiles():
+        if not _es_admin():
+            abort(403)
+        return _pagina_perfiles()
+
+    @server.route('/admin/perfiles/activar')
+    def activar_perfilado():
+        if not _es_admin():
+            abort(403)
+        respuesta = redirect('/admin/perfiles')
+        opciones = {'httponly': True, 'samesite': 'Strict', 'max_age': PERFILADO_CONFIG['duracion_cookie']}
+        respuesta.set_cookie(_COOKIE_TOKEN, request.args.get('token') or request.cookies.get(_COOKIE_TOKEN),
+                             **opciones)
+        respuesta.set_cookie(_COOKIE_CALLBACK, request.args.get('callback') or '*', **opciones)
+        return respuesta
+
+    @server.route('/admin/perfiles/desactivar')
+    def desactivar_perfilado():
+        if not _es_admin():
+            abort(403)
+        respuesta = redirect('/admin/perfiles')
+        respuesta.delete_cookie(_COOKIE_CALLBACK)
+        return respuesta
+
+    @server.route('/admin/perfiles/<callback_id>/<archivo>')
+    def ver_perfil(callback_id, archivo):
+        if not _es_admin():
+            abort(403)
+        formato = request.args.get('formato')
+        ruta = ruta_perfil(callback_id, archivo, '.prof')
+        if ruta is None:
+            abort(404)
+        if formato == 'prof':
+            return send_file(ruta, as_attachment=True, download_name=f"{callback_id}-{archivo}.prof")
+        if formato == 'collapsed':
+            return send_file(ruta_perfil(callback_id, archivo, '.collapsed'), as_attachment=True,
+                             download_name=f"{callback_id}-{archivo}.collapsed")
+        return Response(resumen_perfil(ruta), mimetype='text/plain')
@@ -0,0 +1,119 @@
+"""
+Ruta Flask de vector tiles de clientes.
+Sirve /tiles/clientes/{z}/{x}/{y}.pbf a partir del dataset cacheado de los filtros activos,
+para que el navegador descargue solo los puntos del viewport.
+"""
+import numpy as np
+from flask import Response, abort, request
+
+from config import METRICA_LABELS, MVT_CONFIG
+from data.cache import CacheLRU, cargar_clientes_filtrados, codificar_filtros, decodificar_filtros
+from utils.tiles import codificar_tile, lonlat_a_mundo, puntos_en_tile
+
+# Proyeccion por dataset (fingerprint, metrica) y tiles ya codificados. Cada entrada guarda
+# el objeto del que salio (dataset / proyeccion): si el dataset cacheado se recargo
+# (TTL vencido, ETL) se rearman, como los demas caches derivados de data/cache.py
+_cache_proyeccion = CacheLRU(32)
+_cache_tiles = CacheLRU(MVT_CONFIG['max_tiles_cache'])
+
+
+def _proyeccion_clientes(filtros, metrica):
+    """
+    Proyecta una sola vez los clientes con coordenadas validas del dataset.
+    Retorna (fingerprint, dict con wx, wy, id_cliente, valor, ventas).
+    """
+    fp, df = cargar_clientes_filtrados(filtros)
+    clave = (fp, metrica)
+    entrada = _cache_proyeccion.get(clave)
+    if entrada is not None and entrada[0] is df:
+        proyeccion = entrada[1]
+    else:
+        validos = (df['latitud'].notna() & df['longitud'].notna()
+                   & (df['latitud'] != 0) & (df['longitud'] != 0))
+        df_mapa = df[validos]
+        wx, wy = lonlat_a_mundo(df_mapa['longitud'].to_numpy(), df_mapa['latitud'].to_numpy())
+        proyeccion = {
+            'wx': wx,
+            'wy': wy,
+            'id_cliente': df_mapa['id_cliente'].to_numpy(dtype=np.int64),
+            'valor': df_mapa[metrica].to_numpy(dtype=float),
+            'ventas': df_mapa['cantidad_total'].to_numpy(dtype=float),
+        }
+        _cache_proyeccion.set(clave, (df, proyeccion))
+    return fp, proyeccion
+
+
+def _generar_tile(proyeccion, z, x, y):
+    """Codifica el tile z/x/y con una capa para sin ventas y una por tramo de valor."""
+    extent = MVT_CONFIG['extent']
+    indices, px, py = puntos_en_tile(proyeccion['wx'], proyeccion['wy'], z, x, y,
+                                     extent=extent, buffer=MVT_CONFIG['buffer'])
+    ids = proyeccion['id_cliente'][indices]
+    valores = proyeccion['valor'][indices]
+    con_ventas = proyeccion['ventas'][indices] > 0
+
+    capas = []
+    sin = ~con_ventas
+    capas.append({'nombre': 'sin_ventas', 'px': px[sin], 'py': py[sin],
+                  'propiedades': {'id_cliente': ids[sin]}})
+    for nombre, val_min, val_max, _ in MVT_CONFIG['tramos']:
+        m = con_ventas & (valores >= val_min) & (valores < val_max)
+        capas.append({'nombre': nombre, 'px': px[m], 'py': py[m],
+                      'propiedades': {'id_cliente': ids[m], 'valor': valores[m]}})
+    return codificar_tile(capas, extent=extent)
+
+
+def construir_capas_tiles(filtros, metrica, modo='burbujas'):
+    """
+    Construye las capas vectoriales (layout.map.layers) que consumen los tiles
+    de los filtros activos.
+
+    Args:
+        filtros: dict normalizado (ver data.cache.normalizar_filtros)
+        metrica: columna de metrica para los tramos de color
+        modo: 'burbujas' (color por tramo) o 'compro' (verde compro / rojo no compro)
+    """
+    url = (f"{request.host_url.rstrip('/')}/tiles/clientes/{{z}}/{{x}}/{{y}}.pbf"
+           f"?f={codificar_filtros(filtros)}&m={metrica}")
+    radio = MVT_CONFIG['radio_punto']
+
+    def _capa(sourcelayer, color, radio_capa):
+        return dict(
+            sourcetype='vector', source=[url], sourcelayer=sourcelayer,
+            type='circle', color=color, opacity=0.85, circle=dict(radius=radio_capa),
+        )
+
+    if modo == 'compro':
+        capas = [_capa('sin_ventas', '#ff0000', radio)]
+        capas += [_capa(nombre, '#27ae60', radio + 1) for nombre, _, _, _ in MVT_CONFIG['tramos']]
+    else:
+        capas = [_capa('sin_ventas', '#ff0000', radio)]
+        capas += [_capa(nombre, color, radio + 1) for nombre, _, _, color in MVT_CONFIG['tramos']]
+    return capas
+
+
+def registrar_rutas_tiles(server):
+    """Registra la ruta de tiles en el servidor Flask de Dash."""
+
+    @server.route('/tiles/clientes/<int:z>/<int:x>/<int:y>.pbf')
+    def tile_clientes(z, x, y):
+        filtros = decodificar_filtros(request.args.get('f', ''))
+        metrica = request.args.get('m', 'cantidad_total')
+        if filtros is None or metrica not in METRICA_LABELS:
+            abort(400)
+        if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            abort(404)
+
+        fp, proyeccion = _proyeccion_clientes(filtros, metrica)
+        clave = (fp, metrica, z, x, y)
+        entrada = _cache_tiles.get(clave)
+        if entrada is not None and entrada[0] is proyeccion:
+            tile = entrada[1]
+        else:
+            tile = _generar_tile(proyeccion, z, x, y)
+            _cache_tiles.set(clave, (proyeccion, tile))
+
+        if not tile:
+            return Response(status=204)
+        return Response(tile, mimetype='application/vnd.mapbox-vector-tile',
+                        headers={'Cache-Control': 'private, max-age=300'})
@@ -0,0 +1,60 @@
+"""
+Trazas de los requests de callbacks de Dash (utils/trazas.py).
+Con TRAZAS_CONFIG['habilitado'] (env DASHBOARD_TRAZAS=1) se traza cada request
+de callback; si no, solo los que traen el header X-Trazar con el token de admin.
+"""
+import random
+
+from flask import g, request
+
+from config import TRAZAS_CONFIG
+from routes.perfiles import nombre_callback, token_admin_valido
+from utils.trazas import iniciar_traza, terminar_traza, instrumentar_engine, Span
+
+_RUTA_CALLBACKS = '/_dash-update-component'
+
+
+def _trazar_request():
+    if token_admin_valido(request.headers.get('X-Trazar')):
+        return True
+    return TRAZAS_CONFIG['habilitado'] and random.random() < TRAZAS_CONFIG['muestreo']
+
+
+def registrar_trazas(app, engine):
+    """Registra los hooks de trazas en el servidor de la app Dash e instrumenta el engine SQL."""
+    server = app.server
+    instrumentar_engine(engine)
+
+    @server.before_request
+    def iniciar_traza_request():
+        if request.path != _RUTA_CALLBACKS or not _trazar_request():
+            return
+        payload = request.get_json(silent=True) or {}
+        nombre = nombre_callback(app, payload)
+        raiz, token = iniciar_traza(f"POST {_RUTA_CALLBACKS} {nombre}", **{
+            'http.method': request.method,
+            'http.route': _RUTA_CALLBACKS,
+            'dash.callback': nombre,
+            'dash.output': payload.get('output', ''),
+            'dash.changed': ','.join(payload.get('changedPropIds') or []),
+        })
+        g.traza = (raiz, token)
+
+    @server.after_request
+    def terminar_traza_request(respuesta):
+        activa = g.pop('traza', None)
+        if activa is None:
+            return respuesta
+        raiz, token = activa
+        # Lo que va del fin del callback hasta aca es la serializacion de la respuesta (to_json de Dash)
+        hijos = [s for s in raiz.traza.spans if s.padre is raiz and s.fin is not None]
+        if hijos:
+            serializacion = Span('dash.serializacion', raiz.traza, raiz)
+            serializacion.inicio = max(s.fin for s in hijos)
+            serializacion.atributos['http.response_content_length'] = respuesta.calculate_content_length() or 0
+            serializacion.terminar()
+        raiz.atributos['http.status_code'] = respuesta.status_code
+        terminar_traza(raiz, token, TRAZAS_CONFIG['archivo'],
+                       error=None if respuesta.status_code < 500 else f"HTTP {respuesta.status_code}",
+                       max_bytes=TRAZAS_CONFIG['max_mb'] * 1024 * 1024)
+        return respuesta
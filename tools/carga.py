@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de los callbacks de Dash a partir de una sesion grabada.
+
+1. Grabar: levantar la app con DASHBOARD_GRABAR=sesion.jsonl y usar el tablero como
+   un supervisor (filtros del mapa, selectores YTD, detalle de cliente).
+2. Reproducir: N usuarios virtuales repiten los payloads grabados, en orden y con
+   tiempo de pensar entre requests, contra una app corriendo en local.
+
+Reporta throughput, p50/p95/p99 por callback y la saturacion del pool de conexiones
+(via /admin/pool, requiere DASHBOARD_ADMIN_TOKEN en el servidor y en --token). El pool
+es de cada worker del servidor: las muestras se agrupan por pid y se reporta un pool
+por worker.
+
+Uso:
+    python -m tools.carga sesion.jsonl --usuarios 20 --pensar 2 --duracion 120
+    python -m tools.carga sesion.jsonl --en-proceso --usuarios 10 --callbacks actualizar_mapa,actualizar_ytd
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+_RUTA_CALLBACKS = '/_dash-update-component'
+
+
+def leer_sesion(archivo, callbacks=None):
+    """Requests grabados en orden: lista de (callback, payload), opcionalmente filtrados por callback."""
+    grabados = []
+    with open(archivo) as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            registro = json.loads(linea)
+            if callbacks and registro['callback'] not in callbacks:
+                continue
+            grabados.append((registro['callback'], registro['payload']))
+    return grabados
+
+
+def _con_sesion(payload, sesion):
+    """Copia del payload con el id de sesion del usuario virtual (la cancelacion de queries es por sesion)."""
+    payload = copy.deepcopy(payload)
+
+    def _reemplazar(items):
+        for item in items or []:
+            if isinstance(item, list):
+                _reemplazar(item)
+            elif isinstance(item, dict) and item.get('id') == 'sesion-id':
+                item['value'] = sesion
+    _reemplazar(payload.get('inputs'))
+    _reemplazar(payload.get('state'))
+    return payload
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista ya ordenada."""
+    if not valores:
+        return float('nan')
+    return valores[min(len(valores) - 1, int(p / 100 * len(valores)))]
+
+
+class Resultados:
+    """Latencias y errores por callback, compartidos entre los usuarios virtuales."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencias = {}     # callback -> [segundos]
+        self.errores = {}       # callback -> cantidad
+        self.sin_cambios = {}   # callback -> respuestas 204 (PreventUpdate / no_update)
+
+    def agregar(self, callback, segundos, estado):
+        with self.lock:
+            self.latencias.setdefault(callback, []).append(segundos)
+            if estado == 204:
+                self.sin_cambios[callback] = self.sin_cambios.get(callback, 0) + 1
+            elif estado is None or estado >= 400:
+                self.errores[callback] = self.errores.get(callback, 0) + 1
+
+
+def _post(url, payload, timeout):
+    datos = json.dumps(payload).encode()
+    pedido = urllib.request.Request(url + _RUTA_CALLBACKS, data=datos,
+                                    headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(pedido, timeout=timeout) as respuesta:
+            respuesta.read()
+            return respuesta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        return None
+
+
+def usuario_virtual(url, grabados, resultados, fin, pensar, timeout):
+    """Recorre la sesion grabada en orden (y vuelve a empezar) hasta el fin de la prueba."""
+    sesion = uuid.uuid4().hex
+    # Cada usuario arranca desfasado para no sincronizar los requests
+    time.sleep(random.uniform(0, pensar))
+    while time.monotonic() < fin:
+        for callback, payload in grabados:
+            if time.monotonic() >= fin:
+                return
+            inicio = time.perf_counter()
+            estado = _post(url, _con_sesion(payload, sesion), timeout)
+            resultados.agregar(callback, time.perf_counter() - inicio, estado)
+            time.sleep(random.uniform(0.5, 1.5) * pensar)
+
+
+def _estado_pool(url, token, reiniciar=False):
+    consulta = f"{url}/admin/pool?token={token}" + ('&reiniciar=1' if reiniciar else '')
+    try:
+        with urllib.request.urlopen(consulta, timeout=5) as respuesta:
+            return json.loads(respuesta.read())
+    except (urllib.error.URLError, TimeoutError, ConnectionError, ValueError):
+        return None
+
+
+def monitorear_pool(url, token, muestras, fin, intervalo=0.5):
+    """Muestrea /admin/pool durante la prueba."""
+    while time.monotonic() < fin:
+        estado = _estado_pool(url, token)
+        if estado is not None:
+            muestras.append(estado)
+        time.sleep(intervalo)
+
+
+def levantar_en_proceso(puerto):
+    """Importa la app y sirve app.server con el servidor threaded de werkzeug en un thread."""
+    from werkzeug.serving import make_server
+    from app import server
+    servidor = make_server('127.0.0.1', puerto, server, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{puerto}"
+
+
+def _pools_por_worker(muestras, reiniciado):
+    """
+    Agrupa las muestras de /admin/pool por pid del worker. Los contadores del worker
+    reiniciado al empezar valen tal cual; los de los demas se toman como diferencia
+    desde su primera muestra (acumulan trafico previo a la prueba) y el maximo en uso
+    sale de las muestras.
+    """
+    por_pid = {}
+    for muestra in muestras:
+        por_pid.setdefault(muestra.get('pid'), []).append(muestra)
+    pools = {}
+    for pid, lista in por_pid.items():
+        primera, ultima = lista[0], lista[-1]
+        en_uso = [m['en_uso'] for m in lista]
+        if pid == reiniciado:
+            checkouts, saturados, max_en_uso = ultima['checkouts'], ultima['saturados'], ultima['max_en_uso']
+        else:
+            checkouts = ultima['checkouts'] - primera['checkouts']
+            saturados = ultima['saturados'] - primera['saturados']
+            max_en_uso = max(en_uso)
+        pools[pid] = {'capacidad': ultima['capacidad'], 'max_en_uso': max_en_uso, 'checkouts': checkouts,
+                      'saturados': saturados, 'en_uso': en_uso, 'detalle': ultima['detalle']}
+    return pools
+
+
+def reportar(resultados, duracion, muestras_pool, estado_final_pool, pid_reiniciado=None):
+    total = sum(len(v) for v in resultados.latencias.values())
+    errores = sum(resultados.errores.values())
+    print(f"\nRequests: {total:,} en {duracion:.0f}s ({total / duracion:.1f} req/s), errores: {errores}")
+    print(f"\n{'callback':<40} {'n':>6} {'req/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'204':>5} {'err':>5}")
+    for callback, latencias in sorted(resultados.latencias.items(), key=lambda x: -len(x[1])):
+        latencias.sort()
+        print(f"{callback[:40]:<40} {len(latencias):>6} {len(latencias) / duracion:>7.1f} "
+              f"{percentil(latencias, 50) * 1000:>9.0f} {percentil(latencias, 95) * 1000:>9.0f} "
+              f"{percentil(latencias, 99) * 1000:>9.0f} {resultados.sin_cambios.get(callback, 0):>5} "
+              f"{resultados.errores.get(callback, 0):>5}")
+
+    if estado_final_pool is None:
+        print("\nPool: sin datos (definir DASHBOARD_ADMIN_TOKEN en el servidor y pasar --token)")
+        return
+    pools = _pools_por_worker(muestras_pool + [estado_final_pool], pid_reiniciado)
+    print(f"\nPool de conexiones por worker ({len(pools)} worker(s) respondieron /admin/pool)")
+    for pid, pool in sorted(pools.items(), key=lambda x: str(x[0])):
+        capacidad, en_uso = pool['capacidad'], pool['en_uso']
+        print(f"  worker pid {pid}: capacidad {capacidad}, maximo en uso {pool['max_en_uso']}, "
+              f"checkouts {pool['checkouts']:,} ({pool['saturados']:,} con el pool lleno)")
+        if en_uso and capacidad:
+            llenas = sum(1 for n in en_uso if n >= capacidad)
+            print(f"    en uso promedio {sum(en_uso) / len(en_uso):.1f}, "
+                  f"muestras con el pool lleno: {100 * llenas / len(en_uso):.0f}% de {len(en_uso)}")
+        print(f"    {pool['detalle']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de callbacks de Dash con una sesion grabada")
+    parser.add_argument('sesion', help="archivo JSONL grabado con DASHBOARD_GRABAR")
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help="app corriendo (ignorado con --en-proceso)")
+    parser.add_argument('--en-proceso', action='store_true', help="levantar app.server en este proceso")
+    parser.add_argument('--puerto', type=int, default=8051, help="puerto para --en-proceso")
+    parser.add_argument('--usuarios', type=int, default=10, help="usuarios virtuales concurrentes")
+    parser.add_argument('--pensar', type=float, default=2.0, help="segundos medios entre requests de un usuario")
+    parser.add_argument('--duracion', type=float, default=60.0, help="segundos de prueba")
+    parser.add_argument('--callbacks', help="solo estos callbacks (separados por coma)")
+    parser.add_argument('--timeout', type=float, default=120.0, help="timeout por request (s)")
+    parser.add_argument('--token', default=os.environ.get('DASHBOARD_ADMIN_TOKEN'),
+                        help="token de admin para /admin/pool")
+    args = parser.parse_args(argv)
+
+    grabados = leer_sesion(args.sesion, set(args.callbacks.split(',')) if args.callbacks else None)
+    if not grabados:
+        print("La sesion no tiene requests (o ninguno de los callbacks pedidos)")
+        return 1
+    url = levantar_en_proceso(args.puerto) if args.en_proceso else args.url.rstrip('/')
+    print(f"{len(grabados)} requests grabados, {args.usuarios} usuarios, pensar {args.pensar}s, "
+          f"{args.duracion:.0f}s contra {url}")
+
+    reiniciado = _estado_pool(url, args.token, reiniciar=True) if args.token else None
+    resultados = Resultados()
+    muestras_pool = []
+    inicio = time.monotonic()
+    fin = inicio + args.duracion
+    hilos = [threading.Thread(target=usuario_virtual,
+                              args=(url, grabados, resultados, fin, args.pensar, args.timeout), daemon=True)
+             for _ in range(args.usuarios)]
+    if args.token:
+        hilos.append(threading.Thread(target=monitorear_pool, args=(url, args.token, muestras_pool, fin),
+                                      daemon=True))
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    estado_final = _estado_pool(url, args.token) if args.token else None
+    reportar(resultados, time.monotonic() - inicio, muestras_pool, estado_final,
+             pid_reiniciado=reiniciado and reiniciado.get('pid'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Animaciones temporales de los mapas con presupuesto de puntos.
+Planifica la granularidad (dia -> semana -> mes) segun la cantidad de
+puntos cliente-periodo y arma los frames desde una matriz cliente x periodo.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+ORDEN_GRANULARIDAD = ('dia', 'semana', 'mes')
+
+
+def planificar_granularidad(conteos, granularidad, max_puntos):
+    """
+    Elige la granularidad mas fina (desde la pedida) que entra en el presupuesto.
+
+    Args:
+        conteos: dict {granularidad: puntos cliente-periodo} (ver contar_puntos_animacion)
+        granularidad: granularidad pedida por el usuario
+        max_puntos: presupuesto total de puntos de la animacion
+
+    Returns:
+        granularidad a usar. Si ni 'mes' entra, retorna 'mes' y el recorte
+        queda a cargo de pivotar_periodos.
+    """
+    if granularidad not in ORDEN_GRANULARIDAD:
+        granularidad = 'semana'
+    for gran in ORDEN_GRANULARIDAD[ORDEN_GRANULARIDAD.index(granularidad):]:
+        if conteos.get(gran, 0) <= max_puntos:
+            return gran
+    return ORDEN_GRANULARIDAD[-1]
+
+
+def pivotar_periodos(df, metrica, max_puntos):
+    """
+    Pivotea el DataFrame largo (cliente, periodo) a una matriz cliente x periodo.
+    Descarta celdas sin actividad y, si se excede el presupuesto, conserva los
+    clientes de mayor total hasta completarlo.
+
+    Returns:
+        dict con 'periodos', 'lat', 'lon', 'nombre', 'matriz' (n_clientes x n_periodos)
+        y 'descartados' (clientes fuera del presupuesto).
+    """
+    df = df[df[metrica] > 0]
+    if len(df) == 0:
+        return None
+
+    cod_cliente, clientes = pd.factorize(df['id_cliente'])
+    cod_periodo, periodos = pd.factorize(df['periodo'], sort=True)
+    matriz = np.zeros((len(clientes), len(periodos)))
+    np.add.at(matriz, (cod_cliente, cod_periodo), df[metrica].to_numpy(dtype=float))
+
+    # Atributos fijos por cliente (primera fila de cada uno)
+    _, primera = np.unique(cod_cliente, return_index=True)
+    atributos = df.iloc[primera]
+    lat = atributos['latitud'].to_numpy(dtype=float)
+    lon = atributos['longitud'].to_numpy(dtype=float)
+    nombre = atributos['razon_social'].to_numpy()
+
+    descartados = 0
+    puntos_por_cliente = (matriz > 0).sum(axis=1)
+    if puntos_por_cliente.sum() > max_puntos:
+        orden = np.argsort(-matriz.sum(axis=1), kind='stable')
+        entran = np.cumsum(puntos_por_cliente[orden]) <= max_puntos
+        conservar = np.sort(orden[entran])
+        descartados = len(clientes) - len(conservar)
+        matriz, lat, lon, nombre = matriz[conservar], lat[conservar], lon[conservar], nombre[conservar]
+
+    return {
+        'periodos': list(periodos),
+        'lat': lat,
+        'lon': lon,
+        'nombre': nombre,
+        'matriz': matriz,
+        'descartados': descartados,
+    }
+
+
+def crear_figura_animada(pivote, crear_traza, center, zoom=8, duracion_frame=800, duracion_transicion=300):
+    """
+    Arma la figura animada con un frame por periodo.
+
+    Args:
+        pivote: resultado de pivotar_periodos
+        crear_traza: funcion (lat, lon, valores, nombres, periodo) -> traza plotly
+        center: dict(lat=..., lon=...)
+    """
+    matriz = pivote['matriz']
+    frames = []
+    for k, periodo in enumerate(pivote['periodos']):
+        activos = matriz[:, k] > 0
+        traza = crear_traza(pivote['lat'][activos], pivote['lon'][activos],
+                            matriz[activos, k], pivote['nombre'][activos], periodo)
+        frames.append(go.Frame(data=[traza], name=str(periodo)))
+
+    fig = go.Figure(data=list(frames[0].data), frames=frames)
+
+    args_play = dict(frame=dict(duration=duracion_frame, redraw=True), fromcurrent=True,
+                     transition=dict(duration=duracion_transicion))
+    args_pause = dict(frame=dict(duration=0, redraw=False), mode='immediate',
+                      transition=dict(duration=0))
+    fig.update_layout(
+        map=dict(style='open-street-map', center=center, zoom=zoom),
+        updatemenus=[dict(
+            type='buttons', direction='left', showactive=False,
+            x=0.1, y=0, xanchor='right', yanchor='top', pad=dict(r=10, t=70),
+            buttons=[
+                dict(label='&#9654;', method='animate', args=[None, args_play]),
+                dict(label='&#9724;', method='animate', args=[[None], args_pause]),
+            ],
+        )],
+        sliders=[dict(
+            active=0, x=0.1, y=0, len=0.9, xanchor='left', yanchor='top', pad=dict(b=10, t=60),
+            currentvalue=dict(prefix='periodo='),
+            steps=[
+                dict(label=str(p), method='animate',
+                     args=[[str(p)], dict(frame=dict(duration=0, redraw=True), mode='immediate',
+                                          transition=dict(duration=0))])
+                for p in pivote['periodos']
+            ],
+        )],
+    )
+    return fig
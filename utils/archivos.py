@@ -0,0 +1,26 @@
+"""
+Archivos propios de la app en disco (snapshot de arranque, lotes, cubo).
+Los directorios se crean 0700 y los archivos 0600; un directorio o archivo de
+otro usuario, o escribible por otros, no se usa.
+"""
+import os
+import stat
+
+
+def es_propio(ruta):
+    """La ruta es del usuario de la app y nadie mas puede escribirla."""
+    info = os.stat(ruta)
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        return False
+    return not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def directorio_privado(directorio):
+    """Crea el directorio (0700) si falta; False si existe y es ajeno."""
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    return es_propio(directorio)
+
+
+def abrir_privado(ruta, modo='wb'):
+    """Abre para escribir un archivo nuevo o truncado con permisos 0600."""
+    return open(os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), modo)
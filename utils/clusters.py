@@ -0,0 +1,108 @@
+"""
+Indice jerarquico de clusters de puntos por grilla (estilo supercluster).
+Se construye una vez por dataset: cada nivel de zoom queda precalculado,
+por lo que consultar un zoom es un lookup y no un recalculo.
+"""
+import numpy as np
+
+from utils.tiles import lonlat_a_mundo
+
+
+class IndiceClusters:
+    """
+    Piramide de celdas Web Mercator anidadas (cada celda de zoom z contiene
+    4 celdas de zoom z+1). El nivel mas fino se arma desde los puntos y los
+    niveles superiores agregando los inferiores, sin volver a los puntos.
+
+    Args:
+        lat, lon: coordenadas de los clientes (solo validas)
+        pesos: dict {nombre: array} de valores a sumar por cluster
+        zoom_min, zoom_max: rango de niveles precalculados
+        radio_px: lado de la celda en pixeles de pantalla (tile de 256 px)
+    """
+
+    def __init__(self, lat, lon, pesos=None, zoom_min=0, zoom_max=16, radio_px=64):
+        self.zoom_min = zoom_min
+        self.zoom_max = zoom_max
+        self.n_puntos = len(lat)
+        self.niveles = {}
+
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        pesos = {k: np.asarray(v, dtype=float) for k, v in (pesos or {}).items()}
+
+        # Bits de la grilla en zoom_max: 2^z tiles de 256 px, celdas de radio_px
+        extra = max(int(np.log2(256 // radio_px)), 0)
+        bits = zoom_max + extra
+        n = 2 ** bits
+        wx, wy = lonlat_a_mundo(lon, lat)
+        cx = np.clip((wx * n).astype(np.int64), 0, n - 1)
+        cy = np.clip((wy * n).astype(np.int64), 0, n - 1)
+
+        # Nivel base (zoom_max) desde los puntos
+        codigos = (cx << bits) | cy
+        _, primero, inversa = np.unique(codigos, return_index=True, return_inverse=True)
+        nivel = self._agregar(inversa, len(primero), np.ones(len(lat)), lat, lon, pesos)
+        nivel['cx'] = cx[primero]
+        nivel['cy'] = cy[primero]
+        nivel['punto'] = primero
+        self.niveles[zoom_max] = nivel
+        self._inversa_puntos = inversa
+
+        # Niveles superiores: cada celda hija sube a su celda padre (cx >> 1, cy >> 1)
+        for z in range(zoom_max - 1, zoom_min - 1, -1):
+            hijo = self.niveles[z + 1]
+            bits -= 1
+            cx_p = hijo['cx'] >> 1
+            cy_p = hijo['cy'] >> 1
+            _, primero, inversa = np.unique((cx_p << bits) | cy_p, return_index=True, return_inverse=True)
+            # Los centroides se recombinan ponderando por cantidad de clientes
+            nivel = self._agregar(
+                inversa, len(primero), hijo['n'],
+                hijo['lat'] * hijo['n'], hijo['lon'] * hijo['n'],
+                {k: hijo[k] for k in pesos}, ponderado=True
+            )
+            nivel['cx'] = cx_p[primero]
+            nivel['cy'] = cy_p[primero]
+            nivel['punto'] = hijo['punto'][primero]
+            hijo['padre'] = inversa
+            self.niveles[z] = nivel
+
+    @staticmethod
+    def _agregar(inversa, n_celdas, n, lat, lon, pesos, ponderado=False):
+        """Suma por celda cantidades, coordenadas y pesos (np.bincount)."""
+        total_n = np.bincount(inversa, weights=n, minlength=n_celdas)
+        if ponderado:
+            sum_lat, sum_lon = lat, lon
+        else:
+            sum_lat, sum_lon = lat * n, lon * n
+        nivel = {
+            'n': total_n,
+            'lat': np.bincount(inversa, weights=sum_lat, minlength=n_celdas) / total_n,
+            'lon': np.bincount(inversa, weights=sum_lon, minlength=n_celdas) / total_n,
+        }
+        for clave, valores in pesos.items():
+            nivel[clave] = np.bincount(inversa, weights=valores, minlength=n_celdas)
+        return nivel
+
+    def nivel_para_zoom(self, zoom):
+        """Nivel entero precalculado para un zoom (float) del mapa."""
+        return int(min(max(np.floor(zoom or 0), self.zoom_min), self.zoom_max))
+
+    def clusters(self, zoom):
+        """
+        Clusters del nivel correspondiente al zoom (lookup).
+
+        Returns:
+            dict de arrays: 'n', 'lat', 'lon', 'punto' (indice de un cliente
+            representativo) y una entrada por cada peso.
+        """
+        return self.niveles[self.nivel_para_zoom(zoom)]
+
+    def cluster_de_puntos(self, zoom):
+        """Indice de cluster de cada punto original en el nivel del zoom."""
+        z_obj = self.nivel_para_zoom(zoom)
+        inversa = self._inversa_puntos
+        for z in range(self.zoom_max, z_obj, -1):
+            inversa = self.niveles[z]['padre'][inversa]
+        return inversa
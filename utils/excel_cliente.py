@@ -0,0 +1,181 @@
+"""
+Exports Excel del detalle de cliente en modo write-only (streaming).
+Las filas se escriben completas desde el PivotCliente con estilos con nombre
+compartidos por todo el libro, sin armar la hoja celda por celda en memoria.
+openpyxl se importa aca: este modulo se carga lazy al exportar.
+"""
+import io
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+from utils.pivot_cliente import etiqueta_periodo
+
+
+_FORMATO_NUM = '#,##0'
+
+
+def _estilos():
+    """Estilos con nombre del libro (se crean por libro: openpyxl los asocia a uno solo)."""
+    bold = Font(bold=True)
+    derecha = Alignment(horizontal='right')
+    centro = Alignment(horizontal='center')
+    relleno = {
+        'header': PatternFill('solid', fgColor='E0E0E0'),
+        'generico': PatternFill('solid', fgColor='D6E4F0'),
+        'marca': PatternFill('solid', fgColor='F0F0F0'),
+        'subtotal': PatternFill('solid', fgColor='F5F8FC'),
+        'total': PatternFill('solid', fgColor='D6E4F0'),
+    }
+    return [
+        NamedStyle('cli_cliente', font=Font(bold=True, size=14)),
+        NamedStyle('cli_titulo', font=Font(bold=True, size=12)),
+        NamedStyle('cli_header', font=Font(bold=True, size=11), fill=relleno['header'], alignment=centro),
+        NamedStyle('cli_header_izq', font=Font(bold=True, size=11), fill=relleno['header']),
+        NamedStyle('cli_generico', font=Font(bold=True, size=12), fill=relleno['generico']),
+        NamedStyle('cli_marca', font=Font(bold=True, size=11, color='333333'), fill=relleno['marca']),
+        NamedStyle('cli_fill_generico', font=DEFAULT_FONT, fill=relleno['generico']),
+        NamedStyle('cli_fill_marca', font=DEFAULT_FONT, fill=relleno['marca']),
+        NamedStyle('cli_fill_total', font=DEFAULT_FONT, fill=relleno['total']),
+        NamedStyle('cli_bold', font=bold),
+        NamedStyle('cli_total', font=Font(bold=True, size=11)),
+        NamedStyle('cli_total_generico', font=Font(bold=True, size=11), fill=relleno['generico']),
+        NamedStyle('cli_total_total', font=Font(bold=True, size=11), fill=relleno['total']),
+        NamedStyle('cli_cod', font=DEFAULT_FONT, alignment=centro),
+        NamedStyle('cli_num', font=DEFAULT_FONT, alignment=derecha, number_format=_FORMATO_NUM),
+        NamedStyle('cli_num_bold', font=bold, alignment=derecha, number_format=_FORMATO_NUM),
+        NamedStyle('cli_num_subtotal', font=bold, alignment=derecha, number_format=_FORMATO_NUM,
+                   fill=relleno['subtotal']),
+        NamedStyle('cli_num_generico', font=bold, alignment=derecha, number_format=_FORMATO_NUM,
+                   fill=relleno['generico']),
+        NamedStyle('cli_num_total', font=bold, alignment=derecha, number_format=_FORMATO_NUM,
+                   fill=relleno['total']),
+    ]
+
+
+def _nuevo_libro():
+    wb = Workbook(write_only=True)
+    for estilo in _estilos():
+        wb.add_named_style(estilo)
+    return wb
+
+
+def _nueva_hoja(wb, titulo, anchos, n_columnas):
+    """Hoja write-only con anchos de columna (dict letra -> ancho, el resto 12)."""
+    ws = wb.create_sheet(titulo)
+    for c in range(1, n_columnas + 1):
+        letra = chr(ord('A') + c - 1)
+        ws.column_dimensions[letra].width = anchos.get(letra, 12)
+    return ws
+
+
+def _celda(ws, valor, estilo):
+    celda = WriteOnlyCell(ws, value=valor)
+    celda.style = estilo
+    return celda
+
+
+def _valor(val):
+    """Celda mensual: vacia si no hubo movimiento o el total es 0."""
+    return None if val != val or val == 0 else val
+
+
+def _meses(ws, valores, estilo):
+    return [_celda(ws, _valor(v), estilo) for v in valores.tolist()]
+
+
+def _filas_tabla_marca(ws, pivot, m, etiquetas):
+    """Filas de la tabla de articulos de la marca m: header, articulos y total."""
+    yield ([_celda(ws, 'Cod', 'cli_header'), _celda(ws, 'Articulo', 'cli_header_izq')]
+           + [_celda(ws, h, 'cli_header') for h in etiquetas + ['Total']])
+
+    arts = pivot.articulos_de_marca(m)
+    for cod, articulo, valores, total in zip(pivot.id_articulo[arts].tolist(), pivot.articulo[arts].tolist(),
+                                             pivot.matriz[arts], pivot.total_articulo[arts].tolist()):
+        yield ([_celda(ws, cod, 'cli_cod'), articulo] + _meses(ws, valores, 'cli_num')
+               + [_celda(ws, total, 'cli_num_bold')])
+
+    yield ([None, _celda(ws, 'Total', 'cli_bold')] + _meses(ws, pivot.sub_marca[m], 'cli_num_subtotal')
+           + [_celda(ws, float(pivot.total_marca[m]), 'cli_num_subtotal')])
+
+
+def _guardar(wb):
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def generar_excel_marca(pivot, m):
+    """Excel de una marca del pivot: titulo y tabla de articulos."""
+    etiquetas = [etiqueta_periodo(a, mes) for a, mes in pivot.periodos]
+    generico, marca = pivot.genericos[pivot.gen_de_marca[m]], pivot.marcas[m]
+
+    wb = _nuevo_libro()
+    ws = _nueva_hoja(wb, marca[:31], {'A': 8, 'B': 35}, 3 + len(etiquetas))
+    ws.append([_celda(ws, f'{generico} — {marca}', 'cli_titulo')])
+    ws.append([])
+    for fila in _filas_tabla_marca(ws, pivot, m, etiquetas):
+        ws.append(fila)
+    return _guardar(wb)
+
+
+def generar_excel_completo(pivot, titulo):
+    """
+    Excel completo del cliente con 3 hojas: Por Generico, Por Marca y Detalle Articulos.
+
+    Args:
+        pivot: PivotCliente del cliente
+        titulo: texto de la primera fila de cada hoja (nombre y codigo del cliente)
+    """
+    etiquetas = [etiqueta_periodo(a, mes) for a, mes in pivot.periodos]
+    n_meses = len(etiquetas)
+    wb = _nuevo_libro()
+
+    # ===================== HOJA 1: POR GENÉRICO =====================
+    ws = _nueva_hoja(wb, 'Por Generico', {'A': 25}, 2 + n_meses)
+    ws.append([_celda(ws, titulo, 'cli_cliente')])
+    ws.append([])
+    ws.append([_celda(ws, 'Generico', 'cli_header_izq')]
+              + [_celda(ws, h, 'cli_header') for h in etiquetas + ['Total']])
+    for g, generico in enumerate(pivot.genericos.tolist()):
+        ws.append([_celda(ws, generico, 'cli_bold')] + _meses(ws, pivot.sub_generico[g], 'cli_num')
+                  + [_celda(ws, float(pivot.total_generico[g]), 'cli_num_bold')])
+    ws.append([_celda(ws, 'TOTAL', 'cli_total_total')] + _meses(ws, pivot.sub_generico.sum(axis=0), 'cli_num_total')
+              + [_celda(ws, float(pivot.total_generico.sum()), 'cli_num_total')])
+
+    # ===================== HOJA 2: POR MARCA =====================
+    ws = _nueva_hoja(wb, 'Por Marca', {'A': 20, 'B': 25}, 3 + n_meses)
+    ws.append([_celda(ws, titulo, 'cli_cliente')])
+    ws.append([])
+    ws.append([_celda(ws, 'Generico', 'cli_header_izq'), _celda(ws, 'Marca', 'cli_header_izq')]
+              + [_celda(ws, h, 'cli_header') for h in etiquetas + ['Total']])
+    for g, generico in enumerate(pivot.genericos.tolist()):
+        for m in pivot.marcas_de_generico(g):
+            ws.append([generico, pivot.marcas[m]] + _meses(ws, pivot.sub_marca[m], 'cli_num')
+                      + [_celda(ws, float(pivot.total_marca[m]), 'cli_num_bold')])
+        ws.append([_celda(ws, f'TOTAL {generico}', 'cli_total_generico'), _celda(ws, None, 'cli_fill_generico')]
+                  + _meses(ws, pivot.sub_generico[g], 'cli_num_generico')
+                  + [_celda(ws, float(pivot.total_generico[g]), 'cli_num_generico')])
+
+    # ===================== HOJA 3: DETALLE ARTÍCULOS =====================
+    n_cols = 3 + n_meses
+    ws = _nueva_hoja(wb, 'Detalle Articulos', {'A': 10, 'B': 35}, n_cols)
+    ws.append([_celda(ws, titulo, 'cli_cliente')])
+    ws.append([])
+    for g, generico in enumerate(pivot.genericos.tolist()):
+        ws.append([_celda(ws, generico, 'cli_generico')]
+                  + [_celda(ws, None, 'cli_fill_generico') for _ in range(n_cols - 1)])
+        for m in pivot.marcas_de_generico(g):
+            ws.append([_celda(ws, f'  {pivot.marcas[m]}', 'cli_marca')]
+                      + [_celda(ws, None, 'cli_fill_marca') for _ in range(n_cols - 1)])
+            for fila in _filas_tabla_marca(ws, pivot, m, etiquetas):
+                ws.append(fila)
+            ws.append([])
+        ws.append([_celda(ws, f'TOTAL {generico}', 'cli_total'), None]
+                  + _meses(ws, pivot.sub_generico[g], 'cli_num_total')
+                  + [_celda(ws, float(pivot.total_generico[g]), 'cli_num_total')])
+        ws.append([])
+
+    return _guardar(wb)
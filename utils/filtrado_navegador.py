@@ -0,0 +1,90 @@
+"""
+Modo de filtrado en el navegador de los mapas de puntos. Los clientes del periodo
+se envian una sola vez a un dcc.Store en columnas: los arrays de cada traza de
+marcadores (lat, lon, texto, customdata, tamanio y color) y los atributos de filtro
+codificados por diccionario (valores distintos + un codigo entero por punto).
+assets/filtrado_navegador.js aplica canal, subcanal, localidad, lista de precio y
+sucursal sobre esas columnas y rearma las trazas sin volver al servidor.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+# Atributos de cada traza que se mueven al Store (ruta 'marker.x' = traza.marker.x)
+COLUMNAS_TRAZA = ('lat', 'lon', 'text', 'customdata', 'marker.size', 'marker.color')
+
+
+def codificar_dimension(serie):
+    """
+    Codificacion por diccionario de una columna de atributo.
+
+    Returns:
+        (valores, codigos): lista de valores distintos como texto (los mismos que
+        usan los MultiSelect de filtros; ids numericos sin decimales) y array int
+        con el indice de cada fila (-1 si es nulo)
+    """
+    codigos, valores = pd.factorize(serie, sort=True)
+    if is_numeric_dtype(serie):
+        valores = [str(int(v)) for v in valores]
+    else:
+        valores = [str(v) for v in valores]
+    return valores, codigos
+
+
+def _es_array(valor):
+    return valor is not None and not isinstance(valor, str) and np.ndim(valor) > 0
+
+
+def _columna(traza, ruta):
+    objeto = traza
+    for parte in ruta.split('.'):
+        objeto = objeto[parte]
+    return objeto
+
+
+def separar_trazas_puntos(fig, trazas, dimensiones):
+    """
+    Mueve las trazas de puntos de la figura a un payload columnar para el Store;
+    las trazas quedan vacias en la figura y las completa el clientside callback.
+
+    Args:
+        fig: go.Figure ya armada
+        trazas: lista de (indice de la traza en fig.data, DataFrame de sus puntos en
+            el mismo orden, plantilla de nombre con '{n}' o None)
+        dimensiones: filtro -> columna del DataFrame (data.facetas.FACETAS)
+
+    Returns:
+        dict {'valores': {filtro: [...]}, 'trazas': [{'indice', 'n', 'nombre',
+        'codigos': {filtro: [...]}, 'columnas': {ruta: [...]}}]}
+    """
+    if not trazas:
+        return None
+    todos = pd.concat([df for _, df, _ in trazas], ignore_index=True)
+    valores, codigos = {}, {}
+    for filtro, columna in dimensiones.items():
+        valores[filtro], codigos[filtro] = codificar_dimension(todos[columna])
+
+    payload = {'valores': valores, 'trazas': []}
+    inicio = 0
+    for indice, df, nombre in trazas:
+        fin = inicio + len(df)
+        traza = fig.data[indice]
+        columnas = {}
+        for ruta in COLUMNAS_TRAZA:
+            valor = _columna(traza, ruta)
+            if not _es_array(valor):
+                continue
+            if ruta in ('lat', 'lon'):
+                # 5 decimales (~1 m) alcanzan para el mapa y achican el JSON
+                valor = np.round(np.asarray(valor, dtype=float), 5)
+            columnas[ruta] = valor
+            traza.update({ruta.replace('.', '_'): []})
+        payload['trazas'].append({
+            'indice': indice,
+            'n': len(df),
+            'nombre': nombre,
+            'codigos': {filtro: c[inicio:fin] for filtro, c in codigos.items()},
+            'columnas': columnas,
+        })
+        inicio = fin
+    return payload
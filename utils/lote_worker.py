@@ -0,0 +1,33 @@
+"""
+Procesos del pool del export Excel por lote (data/lotes.py). Modulo chico a
+proposito: los procesos arrancan limpios (forkserver/spawn) e importan solo esto,
+utils.excel_cliente y utils.pivot_cliente; nada de la app, la base ni sus locks.
+"""
+from utils.excel_cliente import generar_excel_completo
+from utils.pivot_cliente import PivotCliente
+
+# Catalogo y periodos comunes a todos los clientes del lote, cargados una vez por proceso
+_catalogo_lote = None
+_periodos_lote = None
+
+
+def inicializar_worker_lote(catalogo, periodos):
+    """Initializer del pool: guarda el catalogo de articulos y los periodos del lote."""
+    global _catalogo_lote, _periodos_lote
+    _catalogo_lote = catalogo
+    _periodos_lote = periodos
+
+
+def generar_excel_lote(id_cliente, titulo, ventas):
+    """
+    Genera el Excel completo de un cliente del lote.
+
+    Args:
+        ventas: ventas del cliente (id_articulo, anio, mes, bultos)
+
+    Returns:
+        (nombre de archivo, bytes)
+    """
+    df_all = _catalogo_lote.merge(ventas, on='id_articulo', how='left')
+    pivot = PivotCliente(df_all, _periodos_lote)
+    return f"cliente_{id_cliente}_completo.xlsx", generar_excel_completo(pivot, titulo)
@@ -0,0 +1,125 @@
+"""
+Perfiles de callbacks bajo demanda: guarda el pstats de cProfile y un archivo
+de stacks colapsados (formato de flamegraph.pl / speedscope) por ejecucion,
+en un directorio local con los ultimos perfiles de cada callback.
+"""
+import io
+import json
+import os
+import pstats
+import re
+import tempfile
+import time
+
+DIRECTORIO_PERFILES = os.path.join(tempfile.gettempdir(), 'sales-dashboard-perfiles')
+
+_NOMBRE_VALIDO = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+def _etiqueta(funcion):
+    archivo, linea, nombre = funcion
+    if archivo == '~':
+        return nombre
+    return f"{nombre} ({os.path.basename(archivo)}:{linea})"
+
+
+def colapsar_stacks(stats, max_profundidad=64):
+    """
+    Stacks colapsados ("raiz;...;funcion microsegundos") a partir de un pstats.
+    cProfile solo guarda pares llamador -> llamado, asi que el tiempo de cada
+    camino se reparte en proporcion al tiempo acumulado desde cada llamador.
+    """
+    datos = stats.stats
+    llamados = {}
+    for funcion, (_, _, _, _, llamadores) in datos.items():
+        for llamador, (_, _, _, ct) in llamadores.items():
+            llamados.setdefault(llamador, []).append((funcion, ct))
+
+    lineas = {}
+
+    def _visitar(funcion, pila, escala):
+        _, _, tt, ct, _ = datos[funcion]
+        pila = pila + [_etiqueta(funcion)]
+        propio = int(tt * escala * 1e6)
+        if propio > 0:
+            clave = ';'.join(pila)
+            lineas[clave] = lineas.get(clave, 0) + propio
+        if len(pila) >= max_profundidad:
+            return
+        for hijo, ct_desde_aca in llamados.get(funcion, []):
+            ct_hijo = datos[hijo][3]
+            if ct_hijo <= 0 or _etiqueta(hijo) in pila:
+                continue
+            _visitar(hijo, pila, escala * ct_desde_aca / ct_hijo)
+
+    for funcion, (_, _, _, _, llamadores) in datos.items():
+        if not llamadores:
+            _visitar(funcion, [], 1.0)
+    return '\n'.join(f"{pila} {valor}" for pila, valor in sorted(lineas.items())) + '\n'
+
+
+def guardar_perfil(perfil, callback_id, duracion, detalle=None, max_por_callback=20):
+    """
+    Guarda un perfil de cProfile: <callback>/<marca>.prof, .collapsed y .json
+    (metadatos). Conserva los ultimos max_por_callback perfiles del callback.
+    """
+    nombre = callback_id if _NOMBRE_VALIDO.match(callback_id) else 'callback'
+    directorio = os.path.join(DIRECTORIO_PERFILES, nombre)
+    os.makedirs(directorio, exist_ok=True)
+    base = os.path.join(directorio, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**6:06d}")
+
+    perfil.dump_stats(base + '.prof')
+    stats = pstats.Stats(base + '.prof')
+    with open(base + '.collapsed', 'w') as f:
+        f.write(colapsar_stacks(stats))
+    with open(base + '.json', 'w') as f:
+        json.dump({'callback': callback_id, 'duracion': duracion, 'creado': time.time(),
+                   'detalle': detalle or {}}, f)
+
+    metadatos = sorted(n for n in os.listdir(directorio) if n.endswith('.json'))
+    for viejo in metadatos[:-max_por_callback]:
+        for extension in ('.prof', '.collapsed', '.json'):
+            try:
+                os.remove(os.path.join(directorio, viejo[:-5] + extension))
+            except OSError:
+                pass
+    return base
+
+
+def listar_perfiles():
+    """Perfiles guardados: dict callback -> lista de metadatos (mas nuevo primero)."""
+    perfiles = {}
+    if not os.path.isdir(DIRECTORIO_PERFILES):
+        return perfiles
+    for callback_dir in sorted(os.listdir(DIRECTORIO_PERFILES)):
+        directorio = os.path.join(DIRECTORIO_PERFILES, callback_dir)
+        if not os.path.isdir(directorio):
+            continue
+        for nombre in sorted(os.listdir(directorio), reverse=True):
+            if not nombre.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directorio, nombre)) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            meta['archivo'] = nombre[:-5]
+            perfiles.setdefault(callback_dir, []).append(meta)
+    return perfiles
+
+
+def ruta_perfil(callback_dir, archivo, extension):
+    """Ruta de un archivo de perfil, o None si los nombres no son validos o no existe."""
+    if not (_NOMBRE_VALIDO.match(callback_dir) and _NOMBRE_VALIDO.match(archivo)):
+        return None
+    if extension not in ('.prof', '.collapsed'):
+        return None
+    ruta = os.path.join(DIRECTORIO_PERFILES, callback_dir, archivo + extension)
+    return ruta if os.path.isfile(ruta) else None
+
+
+def resumen_perfil(ruta, orden='cumulative', limite=40):
+    """Texto de pstats con las funciones principales del perfil."""
+    salida = io.StringIO()
+    pstats.Stats(ruta, stream=salida).sort_stats(orden).print_stats(limite)
+    return salida.getvalue()
@@ -0,0 +1,141 @@
+"""
+Pivot de ventas de un cliente: matriz articulo x mes con indices de generico y
+marca y subtotales precalculados. Lo comparten la tabla de detalle y los exports
+Excel, de modo que una sola query y un solo pivot sirven a todas las vistas.
+"""
+import numpy as np
+import pandas as pd
+
+
+MESES_CORTOS = {
+    1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr', 5: 'May', 6: 'Jun',
+    7: 'Jul', 8: 'Ago', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dic'
+}
+
+
+def etiqueta_periodo(anio, mes):
+    """Formatea un periodo como 'Ene 25'."""
+    return f"{MESES_CORTOS[int(mes)]} {str(int(anio))[2:]}"
+
+
+def ultimos_periodos(hoy, n=12):
+    """Ultimos n meses calendario hasta el mes de hoy (inclusive), como [anio, mes]."""
+    base = hoy.year * 12 + hoy.month - 1
+    return [[(base - i) // 12, (base - i) % 12 + 1] for i in range(n - 1, -1, -1)]
+
+
+class PivotCliente:
+    """
+    Articulos del cliente en orden de presentacion: generico, marca y articulo
+    por total historico descendente (empates en orden alfabetico).
+
+    Args:
+        df_all: resultado de cargar_ventas_cliente_detalle (articulos sin venta
+            con anio/mes/bultos nulos)
+        periodos: lista [anio, mes] consecutivos de las columnas mensuales;
+            el ultimo es el mes actual
+
+    Atributos:
+        genericos, marcas: nombres; gen_de_marca: indice de generico de cada marca
+        id_articulo, articulo, cod_generico, cod_marca: arrays por articulo
+        inicio_marca: bordes de las marcas en los arrays de articulos (n_marcas + 1)
+        matriz: n_articulos x n_periodos (NaN = sin movimiento en el mes)
+        total_articulo, total_marca, total_generico: bultos del historico completo
+        sub_marca, sub_generico: bultos por mes (0 si no hubo movimiento)
+        marca_con_historia: marcas con al menos un movimiento en el historico
+        kpis: indicadores del mes actual y conteo de articulos con/sin venta
+    """
+
+    def __init__(self, df_all, periodos):
+        self.periodos = [list(p) for p in periodos]
+        n_per = len(self.periodos)
+
+        # Articulos sin venta: bultos 0, sin periodo
+        df_all = df_all.copy()
+        con_venta = df_all['bultos'].notna()
+        ids_con_venta = df_all.loc[con_venta, 'id_articulo'].unique()
+        df_all['bultos'] = df_all['bultos'].astype(float).fillna(0.0)
+
+        grupos = df_all.groupby(['generico', 'marca', 'articulo'], sort=True)
+        cod_art = grupos.ngroup().to_numpy()
+        primeros = grupos['id_articulo'].first()
+        n_art = len(primeros)
+        gen_art = primeros.index.get_level_values('generico').to_numpy()
+        marca_art = primeros.index.get_level_values('marca').to_numpy()
+
+        bultos = df_all['bultos'].to_numpy(dtype=float)
+        total_art = np.bincount(cod_art, weights=bultos, minlength=n_art)
+
+        # Matriz articulo x mes (periodos consecutivos: columna = meses desde el primero)
+        anio = pd.to_numeric(df_all['anio'], errors='coerce').to_numpy(dtype=float)
+        mes = pd.to_numeric(df_all['mes'], errors='coerce').to_numpy(dtype=float)
+        con_periodo = ~np.isnan(anio)
+        inicio = self.periodos[0][0] * 12 + self.periodos[0][1] - 1
+        col = np.where(con_periodo, anio * 12 + mes - 1 - inicio, -1).astype(np.int64)
+        en_ventana = (col >= 0) & (col < n_per)
+        matriz = np.zeros((n_art, n_per))
+        movimientos = np.zeros((n_art, n_per))
+        np.add.at(matriz, (cod_art[en_ventana], col[en_ventana]), bultos[en_ventana])
+        np.add.at(movimientos, (cod_art[en_ventana], col[en_ventana]), 1)
+        matriz[movimientos == 0] = np.nan
+        con_historia = np.bincount(cod_art[con_periodo], minlength=n_art) > 0
+
+        # Codigos alfabeticos de generico y marca (los articulos vienen ordenados por nombre)
+        nuevo_gen = np.r_[True, gen_art[1:] != gen_art[:-1]]
+        nuevo_marca = nuevo_gen | np.r_[True, marca_art[1:] != marca_art[:-1]]
+        cod_gen = np.cumsum(nuevo_gen) - 1
+        cod_marca = np.cumsum(nuevo_marca) - 1
+        total_gen = np.bincount(cod_gen, weights=total_art)
+        total_marca = np.bincount(cod_marca, weights=total_art)
+
+        # Orden de presentacion y recodificacion de generico/marca en ese orden
+        orden = np.lexsort((np.arange(n_art), -total_art, cod_marca, -total_marca[cod_marca],
+                            cod_gen, -total_gen[cod_gen]))
+        cod_gen, cod_marca = cod_gen[orden], cod_marca[orden]
+        nuevo_gen = np.r_[True, cod_gen[1:] != cod_gen[:-1]]
+        nuevo_marca = nuevo_gen | np.r_[True, cod_marca[1:] != cod_marca[:-1]]
+
+        self.cod_generico = np.cumsum(nuevo_gen) - 1
+        self.cod_marca = np.cumsum(nuevo_marca) - 1
+        self.genericos = gen_art[orden][nuevo_gen]
+        self.marcas = marca_art[orden][nuevo_marca]
+        self.gen_de_marca = self.cod_generico[nuevo_marca]
+        self.inicio_marca = np.r_[np.flatnonzero(nuevo_marca), n_art]
+        self.id_articulo = primeros.to_numpy()[orden]
+        self.articulo = primeros.index.get_level_values('articulo').to_numpy()[orden]
+        self.matriz = matriz[orden]
+        self.total_articulo = total_art[orden]
+
+        n_gen, n_marca = len(self.genericos), len(self.marcas)
+        self.total_generico = np.bincount(self.cod_generico, weights=self.total_articulo, minlength=n_gen)
+        self.total_marca = np.bincount(self.cod_marca, weights=self.total_articulo, minlength=n_marca)
+        self.marca_con_historia = np.bincount(self.cod_marca, weights=con_historia[orden], minlength=n_marca) > 0
+
+        matriz_ceros = np.nan_to_num(self.matriz)
+        self.sub_marca = np.zeros((n_marca, n_per))
+        np.add.at(self.sub_marca, self.cod_marca, matriz_ceros)
+        self.sub_generico = np.zeros((n_gen, n_per))
+        np.add.at(self.sub_generico, self.cod_generico, matriz_ceros)
+
+        # KPIs: mes actual (ultima columna) y articulos con/sin venta en el historico
+        mov_mes = ~np.isnan(self.matriz[:, -1])
+        self.kpis = {
+            'mes_bultos': float(matriz_ceros[:, -1].sum()),
+            'mes_genericos': int(np.unique(self.cod_generico[mov_mes]).size),
+            'mes_articulos': int(np.unique(self.articulo[mov_mes]).size),
+            'n_con_venta': int(len(ids_con_venta)),
+            'n_sin_venta': int(df_all['id_articulo'].nunique() - len(ids_con_venta)),
+        }
+
+    def articulos_de_marca(self, m):
+        """Slice de los articulos de la marca m en los arrays por articulo."""
+        return slice(self.inicio_marca[m], self.inicio_marca[m + 1])
+
+    def marcas_de_generico(self, g):
+        """Indices de las marcas del generico g, en orden de presentacion."""
+        return np.flatnonzero(self.gen_de_marca == g)
+
+    def indice_marca(self, generico, marca):
+        """Indice de la marca (generico, marca) o None si el cliente no la tiene."""
+        candidatas = np.flatnonzero((self.marcas == marca) & (self.genericos[self.gen_de_marca] == generico))
+        return int(candidatas[0]) if len(candidatas) else None
@@ -0,0 +1,139 @@
+"""
+Raster de densidad (KDE) del mapa de calor difuso, calculado en el servidor.
+Binning en una grilla Web Mercator, convolucion gaussiana por FFT y
+codificacion PNG propia (zlib), para usar como capa de imagen del mapa.
+"""
+import base64
+import struct
+import zlib
+
+import numpy as np
+
+from utils.tiles import lonlat_a_mundo
+from utils.trazas import trazado
+
+
+def _mundo_a_lonlat(x, y):
+    """Inversa de lonlat_a_mundo."""
+    lon = x * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * y))))
+    return lon, lat
+
+
+@trazado('geometria.kde_mercator')
+def kde_mercator(lat, lon, pesos, radio_px, zoom_ref=8, px_por_celda=2, max_lado=768):
+    """
+    Densidad por kernel gaussiano en una grilla Web Mercator.
+
+    Args:
+        lat, lon, pesos: arrays de puntos y peso de cada uno
+        radio_px: radio de influencia en pixeles de pantalla al zoom de referencia
+        zoom_ref: zoom al que se interpreta el radio (zoom inicial del mapa)
+        px_por_celda: pixeles de pantalla por celda de la grilla al zoom de referencia
+        max_lado: lado maximo de la grilla (se agranda la celda si hace falta)
+
+    Returns:
+        (raster, bounds): raster (alto x ancho, fila 0 = norte) y bounds
+        (lon_min, lat_min, lon_max, lat_max) del area cubierta.
+    """
+    wx, wy = lonlat_a_mundo(lon, lat)
+    px_mundo = 1.0 / (256 * 2 ** zoom_ref)
+    sigma_mundo = radio_px / 3.0 * px_mundo
+    margen = 3 * sigma_mundo
+
+    x0, x1 = wx.min() - margen, wx.max() + margen
+    y0, y1 = wy.min() - margen, wy.max() + margen
+    celda = max(px_por_celda * px_mundo, max(x1 - x0, y1 - y0) / max_lado)
+    ancho = int(np.ceil((x1 - x0) / celda))
+    alto = int(np.ceil((y1 - y0) / celda))
+    x1, y1 = x0 + ancho * celda, y0 + alto * celda
+
+    # Binning de los puntos (suma de pesos por celda)
+    ix = np.clip(((wx - x0) / celda).astype(np.int64), 0, ancho - 1)
+    iy = np.clip(((wy - y0) / celda).astype(np.int64), 0, alto - 1)
+    grilla = np.bincount(iy * ancho + ix, weights=pesos, minlength=alto * ancho).reshape(alto, ancho)
+
+    # Kernel gaussiano centrado en el origen (con wrap-around); el margen de 3 sigma evita
+    # que la convolucion circular mezcle bordes opuestos
+    sigma = sigma_mundo / celda
+    dy = np.minimum(np.arange(alto), alto - np.arange(alto))
+    dx = np.minimum(np.arange(ancho), ancho - np.arange(ancho))
+    kernel = np.exp(-(dy[:, None] ** 2 + dx[None, :] ** 2) / (2 * sigma ** 2))
+    kernel /= kernel.sum()
+    raster = np.fft.irfft2(np.fft.rfft2(grilla) * np.fft.rfft2(kernel), s=grilla.shape)
+    raster[raster < 0] = 0
+
+    lon_min, lat_max = _mundo_a_lonlat(x0, y0)
+    lon_max, lat_min = _mundo_a_lonlat(x1, y1)
+    return raster, (float(lon_min), float(lat_min), float(lon_max), float(lat_max))
+
+
+def normalizar_raster(raster, tipo_normalizacion='normal', usar_log=False, umbral=1e-3):
+    """
+    Aplica la normalizacion del mapa de calor sobre el raster.
+    Los pixeles por debajo de umbral * max se consideran vacios (NaN).
+
+    Returns:
+        (valores, rango): raster normalizado y rango [min, max] para la escala de color
+    """
+    valores = raster.astype(float).copy()
+    vacio = valores <= raster.max() * umbral
+    valores[vacio] = np.nan
+    activos = valores[~vacio]
+    if activos.size == 0:
+        return valores, [0.0, 1.0]
+
+    if tipo_normalizacion == 'percentil':
+        rangos = np.empty(activos.size)
+        rangos[np.argsort(activos, kind='stable')] = np.arange(1, activos.size + 1)
+        valores[~vacio] = rangos / activos.size * 100
+        return valores, [0.0, 100.0]
+    if tipo_normalizacion == 'limitado':
+        p95 = float(np.percentile(activos, 95))
+        valores[~vacio] = np.minimum(activos, p95)
+        return valores, [0.0, p95]
+    if usar_log:
+        valores[~vacio] = np.log1p(activos)
+    return valores, [float(np.nanmin(valores)), float(np.nanmax(valores))]
+
+
+def colorear_raster(valores, rango, escala, opacidad=0.5):
+    """
+    Convierte el raster normalizado a RGBA uint8 con una escala de color plotly
+    ([[pos, 'rgb(r, g, b)'], ...]). NaN queda transparente.
+    """
+    v_min, v_max = rango
+    t = (valores - v_min) / (v_max - v_min) if v_max > v_min else np.full(valores.shape, 0.5)
+    t = np.clip(np.nan_to_num(t, nan=0.0), 0, 1)
+
+    posiciones = [p for p, _ in escala]
+    colores = np.array([[float(c) for c in color[color.index('(') + 1:-1].split(',')] for _, color in escala])
+    rgba = np.empty(valores.shape + (4,), dtype=np.uint8)
+    for canal in range(3):
+        rgba[..., canal] = np.interp(t, posiciones, colores[:, canal]).astype(np.uint8)
+    # Transparencia creciente en los valores bajos, como el heatmap del navegador
+    alfa = opacidad * 255 * np.clip(t / 0.15, 0.2, 1)
+    alfa[np.isnan(valores)] = 0
+    rgba[..., 3] = alfa.astype(np.uint8)
+    return rgba
+
+
+@trazado('figura.codificar_png')
+def codificar_png(rgba):
+    """Codifica un array RGBA (alto x ancho x 4, uint8) como PNG."""
+    alto, ancho = rgba.shape[:2]
+
+    def _chunk(tipo, datos):
+        return (struct.pack('>I', len(datos)) + tipo + datos
+                + struct.pack('>I', zlib.crc32(tipo + datos) & 0xFFFFFFFF))
+
+    # Filtro 0 (None) al inicio de cada fila
+    filas = np.hstack([np.zeros((alto, 1), dtype=np.uint8), rgba.reshape(alto, ancho * 4)])
+    return (b'\x89PNG\r\n\x1a\n'
+            + _chunk(b'IHDR', struct.pack('>IIBBBBB', ancho, alto, 8, 6, 0, 0, 0))
+            + _chunk(b'IDAT', zlib.compress(filas.tobytes(), 6))
+            + _chunk(b'IEND', b''))
+
+
+def png_data_uri(png):
+    return 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
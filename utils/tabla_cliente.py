@@ -0,0 +1,79 @@
+"""
+Modelo de filas de la tabla de detalle de cliente (generico -> marca -> articulo).
+Se arma una vez desde el PivotCliente; la tabla paginada del navegador solo
+recibe las filas de la pagina visible.
+"""
+import numpy as np
+
+
+def construir_modelo_filas(pivot):
+    """
+    Arma todas las filas de la tabla (headers de grupo, articulos y subtotales).
+
+    Args:
+        pivot: PivotCliente del cliente
+
+    Returns:
+        dict de arrays alineados por fila: 'tipo' ('generico', 'marca', 'articulo',
+        'articulo_cero', 'subtotal_marca', 'subtotal_generico'), 'etiqueta', 'cod',
+        'generico', 'marca', 'valores' (n_filas x n_periodos, NaN = celda vacia) y 'total'.
+    """
+    vacio = np.full(len(pivot.periodos), np.nan)
+    # En los subtotales un mes sin ventas se muestra vacio
+    sub_marca = np.where(pivot.sub_marca == 0, np.nan, pivot.sub_marca)
+    sub_gen = np.where(pivot.sub_generico == 0, np.nan, pivot.sub_generico)
+    filas = {'tipo': [], 'etiqueta': [], 'cod': [], 'generico': [], 'marca': [], 'valores': [], 'total': []}
+
+    def _agregar(tipo, etiqueta, cod, generico, marca, valores, total):
+        filas['tipo'].append(np.atleast_1d(tipo))
+        filas['etiqueta'].append(np.atleast_1d(etiqueta))
+        filas['cod'].append(np.atleast_1d(cod))
+        filas['generico'].append(np.atleast_1d(generico))
+        filas['marca'].append(np.atleast_1d(marca))
+        filas['valores'].append(np.atleast_2d(valores))
+        filas['total'].append(np.atleast_1d(total))
+
+    for g, generico in enumerate(pivot.genericos):
+        _agregar('generico', generico, '', generico, '', vacio, pivot.total_generico[g])
+        for m in pivot.marcas_de_generico(g):
+            marca = pivot.marcas[m]
+            arts = pivot.articulos_de_marca(m)
+            totales = pivot.total_articulo[arts]
+            k = len(totales)
+            _agregar('marca', marca, '', generico, marca, vacio, pivot.total_marca[m])
+            _agregar(np.where(totales == 0, 'articulo_cero', 'articulo'), pivot.articulo[arts],
+                     pivot.id_articulo[arts].astype(str), np.full(k, generico, dtype=object),
+                     np.full(k, marca, dtype=object), pivot.matriz[arts], totales)
+            if pivot.marca_con_historia[m]:
+                _agregar('subtotal_marca', f"Subtotal {marca}", '', generico, marca,
+                         sub_marca[m], pivot.total_marca[m])
+        _agregar('subtotal_generico', f"TOTAL {generico}", '', generico, '',
+                 sub_gen[g], pivot.total_generico[g])
+
+    modelo = {clave: np.concatenate([np.asarray(b, dtype=object) for b in bloques])
+              for clave, bloques in filas.items() if clave not in ('valores', 'total')}
+    modelo['valores'] = np.vstack(filas['valores'])
+    modelo['total'] = np.concatenate(filas['total']).astype(float)
+    return modelo
+
+
+def filas_pagina(modelo, inicio, fin):
+    """
+    Serializa las filas [inicio, fin) del modelo como records de DataTable.
+    Columnas: 'id' (fila global), 'tipo', 'cod', 'articulo', 'p0'..'pN', 'total', 'excel'.
+    """
+    registros = []
+    for i in range(inicio, min(fin, len(modelo['tipo']))):
+        tipo = modelo['tipo'][i]
+        registro = {'id': i, 'tipo': tipo, 'cod': modelo['cod'][i], 'articulo': modelo['etiqueta'][i]}
+        for k, valor in enumerate(modelo['valores'][i]):
+            registro[f'p{k}'] = '' if np.isnan(valor) else f"{valor:,.0f}"
+        registro['total'] = f"{modelo['total'][i]:,.0f}"
+        registro['excel'] = 'Excel' if tipo == 'marca' else ''
+        registros.append(registro)
+    return registros
+
+
+def filas_de_tipo(modelo, tipo):
+    """Indices globales de las filas de un tipo (para los saltos a generico/marca)."""
+    return np.flatnonzero(modelo['tipo'] == tipo)
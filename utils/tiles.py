@@ -0,0 +1,133 @@
+"""
+Utilidades de vector tiles (Mapbox Vector Tile, MVT).
+Proyeccion Web Mercator y codificacion protobuf de capas de puntos, sin dependencias extra.
+"""
+import struct
+
+import numpy as np
+
+
+def lonlat_a_mundo(lon, lat):
+    """
+    Proyecta lon/lat (grados) a coordenadas de mundo Web Mercator normalizadas [0, 1].
+    El eje y crece hacia el sur, igual que la numeracion de tiles.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.clip(np.asarray(lat, dtype=float), -85.05112878, 85.05112878)
+    x = (lon + 180.0) / 360.0
+    lat_rad = np.radians(lat)
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0
+    return x, y
+
+
+def puntos_en_tile(wx, wy, z, x, y, extent=4096, buffer=64):
+    """
+    Selecciona los puntos (en coordenadas de mundo) que caen en el tile z/x/y.
+
+    Returns:
+        (indices, px, py): posiciones en los arrays originales y coordenadas
+        enteras relativas al tile en [0, extent] (con buffer).
+    """
+    n = 2 ** z
+    px = (wx * n - x) * extent
+    py = (wy * n - y) * extent
+    mascara = (px >= -buffer) & (px <= extent + buffer) & (py >= -buffer) & (py <= extent + buffer)
+    indices = np.flatnonzero(mascara)
+    return indices, np.rint(px[indices]).astype(np.int64), np.rint(py[indices]).astype(np.int64)
+
+
+# -----------------------------------------------------------------------------
+# Codificacion protobuf minima (solo lo necesario para capas de puntos)
+# -----------------------------------------------------------------------------
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        bits = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _campo_bytes(numero, payload):
+    return _varint((numero << 3) | 2) + _varint(len(payload)) + payload
+
+
+def _campo_varint(numero, valor):
+    return _varint(numero << 3) + _varint(valor)
+
+
+def _valor_mvt(valor):
+    """Codifica un mensaje Value de MVT (string, double o sint64)."""
+    if isinstance(valor, str):
+        return _campo_bytes(1, valor.encode('utf-8'))
+    if isinstance(valor, (bool, np.bool_)):
+        return _campo_varint(7, int(valor))
+    if isinstance(valor, (int, np.integer)):
+        return _campo_varint(6, _zigzag(int(valor)))
+    return _varint((3 << 3) | 1) + struct.pack('<d', float(valor))
+
+
+def _codificar_capa(nombre, px, py, propiedades, extent):
+    """
+    Codifica una capa MVT de puntos.
+
+    Args:
+        nombre: nombre de la capa (source-layer en el mapa)
+        px, py: arrays de coordenadas enteras relativas al tile
+        propiedades: dict {clave: array} con un valor por punto
+        extent: resolucion del tile
+    """
+    claves = list(propiedades.keys())
+    valores_idx = {}
+    valores = []
+    features = []
+
+    for i in range(len(px)):
+        tags = bytearray()
+        for k_idx, clave in enumerate(claves):
+            valor = propiedades[clave][i]
+            if isinstance(valor, np.generic):
+                valor = valor.item()
+            llave = (type(valor).__name__, valor)
+            v_idx = valores_idx.get(llave)
+            if v_idx is None:
+                v_idx = len(valores)
+                valores_idx[llave] = v_idx
+                valores.append(valor)
+            tags += _varint(k_idx) + _varint(v_idx)
+        geometria = _varint(9) + _varint(_zigzag(int(px[i]))) + _varint(_zigzag(int(py[i])))
+        feature = (_campo_varint(1, i + 1) + _campo_bytes(2, bytes(tags))
+                   + _campo_varint(3, 1) + _campo_bytes(4, geometria))
+        features.append(_campo_bytes(2, feature))
+
+    capa = _campo_varint(15, 2) + _campo_bytes(1, nombre.encode('utf-8'))
+    capa += b''.join(features)
+    capa += b''.join(_campo_bytes(3, c.encode('utf-8')) for c in claves)
+    capa += b''.join(_campo_bytes(4, _valor_mvt(v)) for v in valores)
+    capa += _campo_varint(5, extent)
+    return capa
+
+
+def codificar_tile(capas, extent=4096):
+    """
+    Codifica un tile MVT completo.
+
+    Args:
+        capas: lista de dicts con 'nombre', 'px', 'py' y 'propiedades'
+        extent: resolucion del tile
+
+    Returns:
+        bytes del tile (sin comprimir). Capas vacias se omiten.
+    """
+    return b''.join(
+        _campo_bytes(3, _codificar_capa(c['nombre'], c['px'], c['py'], c['propiedades'], extent))
+        for c in capas if len(c['px']) > 0
+    )
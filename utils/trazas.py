@@ -0,0 +1,246 @@
+"""
+Trazas por request: spans anidados (callback -> queries SQL -> transformaciones
+pandas -> geometria -> figura -> serializacion) con un trace id por request de
+Dash. Cada traza terminada se escribe como una linea JSON en formato OTLP
+(ExportTraceServiceRequest), legible por el file receiver de OpenTelemetry.
+Sin traza activa, span() y trazado() no hacen nada.
+
+Uso:
+    python -m utils.trazas <archivo.jsonl> [nombre_raiz]   # resumen por span
+"""
+import contextvars
+import functools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+
+_span_actual = contextvars.ContextVar('span_actual', default=None)
+_lock_archivo = threading.Lock()
+
+SERVICIO = 'sales-dashboard'
+
+
+class Span:
+    """Span de una traza. Los spans de fase se cierran al abrir la siguiente fase o al cerrar el padre."""
+
+    def __init__(self, nombre, traza, padre=None, atributos=None, es_fase=False):
+        self.nombre = nombre
+        self.traza = traza
+        self.padre = padre
+        self.span_id = secrets.token_hex(8)
+        self.atributos = dict(atributos or {})
+        self.es_fase = es_fase
+        self.fase_abierta = None
+        self.error = None
+        self.inicio = time.time_ns()
+        self.fin = None
+        traza.spans.append(self)
+
+    def terminar(self, error=None):
+        if self.fin is not None:
+            return
+        if self.fase_abierta is not None:
+            self.fase_abierta.terminar()
+            self.fase_abierta = None
+        self.error = error
+        self.fin = time.time_ns()
+
+    def a_otlp(self):
+        span = {
+            'traceId': self.traza.trace_id,
+            'spanId': self.span_id,
+            'name': self.nombre,
+            'kind': 2 if self.padre is None else 1,  # SERVER / INTERNAL
+            'startTimeUnixNano': str(self.inicio),
+            'endTimeUnixNano': str(self.fin or time.time_ns()),
+            'attributes': [_atributo_otlp(k, v) for k, v in self.atributos.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.padre is not None:
+            span['parentSpanId'] = self.padre.span_id
+        return span
+
+
+class Traza:
+    """Spans de un request; se escribe completa al terminar la raiz."""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+
+
+def _atributo_otlp(clave, valor):
+    if isinstance(valor, bool):
+        return {'key': clave, 'value': {'boolValue': valor}}
+    if isinstance(valor, int):
+        return {'key': clave, 'value': {'intValue': str(valor)}}
+    if isinstance(valor, float):
+        return {'key': clave, 'value': {'doubleValue': valor}}
+    return {'key': clave, 'value': {'stringValue': str(valor)}}
+
+
+# =============================================================================
+# API
+# =============================================================================
+
+def iniciar_traza(nombre, **atributos):
+    """Abre el span raiz de una traza nueva. Retorna (span, token) para terminar_traza."""
+    raiz = Span(nombre, Traza(), atributos=atributos)
+    return raiz, _span_actual.set(raiz)
+
+
+def terminar_traza(raiz, token, archivo, error=None, max_bytes=None):
+    """Cierra la raiz, restaura el contexto y escribe la traza como una linea OTLP."""
+    raiz.terminar(error)
+    _span_actual.reset(token)
+    escribir_traza(raiz.traza, archivo, max_bytes)
+
+
+def span_actual():
+    return _span_actual.get()
+
+
+def iniciar_span(nombre, **atributos):
+    """Abre un span hijo del actual (sin context manager). None si no hay traza activa."""
+    padre = _span_actual.get()
+    if padre is None:
+        return None
+    return Span(nombre, padre.traza, padre, atributos)
+
+
+class span:
+    """Context manager de un span hijo del actual. Sin traza activa no hace nada."""
+
+    def __init__(self, nombre, **atributos):
+        self.nombre = nombre
+        self.atributos = atributos
+        self.span = None
+        self.token = None
+
+    def __enter__(self):
+        self.span = iniciar_span(self.nombre, **self.atributos)
+        if self.span is not None:
+            self.token = _span_actual.set(self.span)
+        return self.span
+
+    def __exit__(self, tipo, valor, tb):
+        if self.span is not None:
+            self.span.terminar(f"{tipo.__name__}: {valor}" if tipo is not None else None)
+            _span_actual.reset(self.token)
+        return False
+
+
+def trazado(nombre=None):
+    """Decorador: corre la funcion dentro de un span (por defecto modulo.funcion)."""
+    def decorador(funcion):
+        etiqueta = nombre or f"{funcion.__module__}.{funcion.__qualname__}"
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if _span_actual.get() is None:
+                return funcion(*args, **kwargs)
+            with span(etiqueta):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def fase(nombre):
+    """
+    Marca el comienzo de una fase del span actual (p. ej. 'datos', 'figura'):
+    cierra la fase anterior y abre un span hijo que queda como actual hasta la
+    proxima fase o hasta que termina el span que la contiene.
+    """
+    actual = _span_actual.get()
+    if actual is None:
+        return
+    padre = actual.padre if actual.es_fase else actual
+    if padre.fase_abierta is not None:
+        padre.fase_abierta.terminar()
+    nueva = Span(nombre, padre.traza, padre, es_fase=True)
+    padre.fase_abierta = nueva
+    _span_actual.set(nueva)
+
+
+def escribir_traza(traza, archivo, max_bytes=None):
+    """Agrega la traza al archivo JSONL (rota a .1 al superar max_bytes)."""
+    registro = {'resourceSpans': [{
+        'resource': {'attributes': [_atributo_otlp('service.name', SERVICIO)]},
+        'scopeSpans': [{'scope': {'name': __name__}, 'spans': [s.a_otlp() for s in traza.spans]}],
+    }]}
+    linea = json.dumps(registro, separators=(',', ':')) + '\n'
+    with _lock_archivo:
+        if max_bytes and os.path.exists(archivo) and os.path.getsize(archivo) > max_bytes:
+            os.replace(archivo, archivo + '.1')
+        with open(archivo, 'a') as f:
+            f.write(linea)
+
+
+# =============================================================================
+# SQL (eventos de SQLAlchemy)
+# =============================================================================
+
+def instrumentar_engine(engine, max_sentencia=500):
+    """Agrega un span 'sql' por sentencia ejecutada con el engine durante una traza."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if _span_actual.get() is None:
+            return
+        context._span_traza = iniciar_span(
+            'sql', **{'db.system': 'postgresql', 'db.statement': ' '.join(statement.split())[:max_sentencia]}
+        )
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        s = getattr(context, '_span_traza', None)
+        if s is not None:
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                s.atributos['db.rowcount'] = cursor.rowcount
+            s.terminar()
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(contexto):
+        s = getattr(contexto.execution_context, '_span_traza', None)
+        if s is not None:
+            s.terminar(f"{type(contexto.original_exception).__name__}: {contexto.original_exception}")
+
+
+# =============================================================================
+# RESUMEN (CLI)
+# =============================================================================
+
+def resumir_trazas(archivo, nombre_raiz=None):
+    """
+    Duracion media, p95 y total por nombre de span (ms), sobre las trazas cuya
+    raiz contiene nombre_raiz. Retorna lista de (nombre, n, media, p95, total).
+    """
+    duraciones = {}
+    with open(archivo) as f:
+        for linea in f:
+            spans = [s for rs in json.loads(linea)['resourceSpans'] for ss in rs['scopeSpans'] for s in ss['spans']]
+            raiz = next((s for s in spans if 'parentSpanId' not in s), None)
+            if raiz is None or (nombre_raiz and nombre_raiz not in raiz['name']):
+                continue
+            for s in spans:
+                ms = (int(s['endTimeUnixNano']) - int(s['startTimeUnixNano'])) / 1e6
+                duraciones.setdefault(s['name'], []).append(ms)
+    filas = []
+    for nombre, valores in duraciones.items():
+        valores.sort()
+        p95 = valores[min(len(valores) - 1, int(0.95 * len(valores)))]
+        filas.append((nombre, len(valores), sum(valores) / len(valores), p95, sum(valores)))
+    return sorted(filas, key=lambda f: -f[4])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    print(f"{'span':<50} {'n':>6} {'media ms':>10} {'p95 ms':>10} {'total ms':>12}")
+    for nombre, n, media, p95, total in resumir_trazas(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None):
+        print(f"{nombre[:50]:<50} {n:>6} {media:>10.1f} {p95:>10.1f} {total:>12.1f}")
@@ -3,7 +3,9 @@ Utilidades de visualización.
 Funciones para crear elementos visuales del mapa (grillas, zonas, etc).
 """
 import numpy as np
+import pandas as pd
 from config import SCIPY_AVAILABLE
+from utils.trazas import trazado
 
 if SCIPY_AVAILABLE:
     from scipy.spatial import ConvexHull
@@ -96,81 +98,210 @@ def _calcular_hull_seguro(puntos):
         return None
 
 
-def crear_grilla_calor_optimizada(df, metrica, precision=2, usar_log=True, n_grupos=8):
-    """
-    Crea una grilla de cuadrados agrupados por color para mejor rendimiento.
-    Retorna grupos de celdas (un trace por grupo de color).
+@trazado('geometria.agregar_grilla')
+def agregar_grilla(lat, lon, valores, precision):
     """
-    if len(df) == 0:
-        return {}
+    Agrega puntos en celdas cuadradas de 10^-precision grados.
+    Cuantiza las coordenadas a enteros y agrega con np.unique / np.bincount.
 
-    # Redondear coordenadas para crear celdas (vectorizado)
+    Returns:
+        dict con arrays 'lat', 'lon' (centro de celda), 'valor' y 'n_clientes'
+    """
     factor = 10 ** precision
-    df = df.copy()
-    df['lat_grid'] = (df['latitud'] * factor).round() / factor
-    df['lon_grid'] = (df['longitud'] * factor).round() / factor
-
-    # Agregar por celda
-    df_grid = df.groupby(['lat_grid', 'lon_grid']).agg({
-        metrica: 'sum',
-        'id_cliente': 'count'
-    }).reset_index()
-    df_grid.columns = ['lat', 'lon', 'valor', 'n_clientes']
-
-    # Aplicar escala logarítmica si corresponde
-    if usar_log:
-        df_grid['valor_color'] = np.log1p(df_grid['valor'])
-    else:
-        df_grid['valor_color'] = df_grid['valor']
+    q_lat = np.rint(np.asarray(lat, dtype=float) * factor).astype(np.int64)
+    q_lon = np.rint(np.asarray(lon, dtype=float) * factor).astype(np.int64)
+
+    # Clave unica por celda combinando ambos ejes en un int64
+    lon_min = q_lon.min()
+    ancho = q_lon.max() - lon_min + 1
+    claves = q_lat * ancho + (q_lon - lon_min)
+    celdas, inversa = np.unique(claves, return_inverse=True)
+
+    return {
+        'lat': (celdas // ancho) / factor,
+        'lon': (celdas % ancho + lon_min) / factor,
+        'valor': np.bincount(inversa, weights=np.asarray(valores, dtype=float), minlength=len(celdas)),
+        'n_clientes': np.bincount(inversa, minlength=len(celdas)),
+    }
+
+
+def agrupar_celdas_por_color(celdas, precision, usar_log=True, n_grupos=8):
+    """
+    Asigna cada celda a un grupo de color y arma los poligonos de cada grupo
+    en arrays planos (un trace por grupo, NaN como separador entre cuadrados).
+    """
+    valor_color = np.log1p(celdas['valor']) if usar_log else celdas['valor']
 
     # Normalizar valores para color (0-1)
-    val_min = df_grid['valor_color'].min()
-    val_max = df_grid['valor_color'].max()
+    val_min = valor_color.min()
+    val_max = valor_color.max()
     if val_max > val_min:
-        df_grid['valor_norm'] = (df_grid['valor_color'] - val_min) / (val_max - val_min)
+        valor_norm = (valor_color - val_min) / (val_max - val_min)
     else:
-        df_grid['valor_norm'] = 0.5
-
-    # Asignar grupo de color (0 a n_grupos-1)
-    df_grid['grupo'] = (df_grid['valor_norm'] * (n_grupos - 0.001)).astype(int)
+        valor_norm = np.full(len(valor_color), 0.5)
+    grupo = (valor_norm * (n_grupos - 0.001)).astype(int)
 
-    # Tamaño de celda en grados
-    cell_size = 10 ** -precision
-    half = cell_size / 2
+    # Cuadrado de cada celda por broadcasting: 5 vertices + separador
+    half = 10 ** -precision / 2
+    d_lat = np.array([-half, -half, half, half, -half, np.nan])
+    d_lon = np.array([-half, half, half, -half, -half, np.nan])
 
-    # Agrupar celdas por color - cada grupo será un solo trace
     grupos = {}
     for grupo_id in range(n_grupos):
-        grupo_df = df_grid[df_grid['grupo'] == grupo_id]
-        if len(grupo_df) == 0:
+        mascara = grupo == grupo_id
+        if not mascara.any():
             continue
+        grupos[grupo_id] = {
+            'lats': (celdas['lat'][mascara, None] + d_lat).ravel(),
+            'lons': (celdas['lon'][mascara, None] + d_lon).ravel(),
+            'n_celdas': int(mascara.sum()),
+            'total_valor': float(celdas['valor'][mascara].sum()),
+            'total_clientes': int(celdas['n_clientes'][mascara].sum()),
+        }
+    return grupos
 
-        # Combinar todos los polígonos del grupo en arrays con None como separador
-        all_lats = []
-        all_lons = []
-        total_valor = 0
-        total_clientes = 0
 
-        for _, row in grupo_df.iterrows():
-            lat, lon = row['lat'], row['lon']
-            # Coordenadas del cuadrado + None para separar
-            all_lats.extend([lat - half, lat - half, lat + half, lat + half, lat - half, None])
-            all_lons.extend([lon - half, lon + half, lon + half, lon - half, lon - half, None])
-            total_valor += row['valor']
-            total_clientes += row['n_clientes']
+class PiramideGrilla:
+    """
+    Grillas de calor precalculadas para varias precisiones de un mismo dataset.
+    Mover el slider de precision es un lookup del nivel mas cercano.
+    """
 
-        grupos[grupo_id] = {
-            'lats': all_lats,
-            'lons': all_lons,
-            'n_celdas': len(grupo_df),
-            'total_valor': total_valor,
-            'total_clientes': total_clientes
-        }
+    def __init__(self, lat, lon, valores, precisiones):
+        self.niveles = {p: agregar_grilla(lat, lon, valores, p) for p in precisiones}
+        self._grupos = {}
+
+    def precision_cercana(self, precision):
+        return min(self.niveles, key=lambda p: abs(p - precision))
+
+    def grupos(self, precision, usar_log=True, n_grupos=8):
+        precision = self.precision_cercana(precision)
+        clave = (precision, usar_log, n_grupos)
+        if clave not in self._grupos:
+            self._grupos[clave] = agrupar_celdas_por_color(self.niveles[precision], precision, usar_log, n_grupos)
+        return self._grupos[clave]
+
+
+@trazado('geometria.crear_grilla_calor_optimizada')
+def crear_grilla_calor_optimizada(df, metrica, precision=2, usar_log=True, n_grupos=8):
+    """
+    Crea una grilla de cuadrados agrupados por color para mejor rendimiento.
+    Retorna grupos de celdas (un trace por grupo de color).
+    """
+    if len(df) == 0:
+        return {}
+
+    celdas = agregar_grilla(df['latitud'].to_numpy(), df['longitud'].to_numpy(),
+                            df[metrica].to_numpy(dtype=float), precision)
+    return agrupar_celdas_por_color(celdas, precision, usar_log, n_grupos)
 
-    return grupos
 
+def _hash_miembros(ids, puntos):
+    """Hash de 64 bits por cliente (id + coordenadas) para firmar la membresia de un grupo."""
+    with np.errstate(over='ignore'):
+        h = np.asarray(ids).astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        h ^= np.ascontiguousarray(puntos[:, 0]).view(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+        h ^= np.ascontiguousarray(puntos[:, 1]).view(np.uint64) * np.uint64(0x165667B19E3779F9)
+        h ^= h >> np.uint64(31)
+    return h
 
-def calcular_zonas(df, columna_grupo):
+
+def _mascara_outliers_iqr_grupos(codigos, puntos, n_grupos):
+    """
+    Version vectorizada de _filtrar_outliers_iqr para muchos grupos a la vez.
+    codigos debe venir ordenado (puntos agrupados contiguos).
+    Retorna mascara booleana de puntos que se conservan.
+    """
+    conteos = np.bincount(codigos, minlength=n_grupos)
+    inicios = np.concatenate([[0], np.cumsum(conteos)[:-1]])
+
+    # Centroide y distancia de cada punto al centroide de su grupo
+    cx = np.bincount(codigos, weights=puntos[:, 0], minlength=n_grupos) / np.maximum(conteos, 1)
+    cy = np.bincount(codigos, weights=puntos[:, 1], minlength=n_grupos) / np.maximum(conteos, 1)
+    dist = np.sqrt((puntos[:, 0] - cx[codigos]) ** 2 + (puntos[:, 1] - cy[codigos]) ** 2)
+
+    # Cuartiles por grupo (interpolacion lineal, igual que np.percentile)
+    dist_ordenada = dist[np.lexsort((dist, codigos))]
+
+    def _cuantil(q):
+        pos = inicios + (np.maximum(conteos, 1) - 1) * q
+        bajo = np.floor(pos).astype(np.int64)
+        alto = np.minimum(bajo + 1, inicios + np.maximum(conteos, 1) - 1)
+        frac = pos - bajo
+        return dist_ordenada[bajo] * (1 - frac) + dist_ordenada[alto] * frac
+
+    q1, q3 = _cuantil(0.25), _cuantil(0.75)
+    limite = q3 + 4 * (q3 - q1)
+    mascara = dist <= limite[codigos]
+
+    # Grupos chicos o que quedarian con menos de 3 puntos: conservar todos
+    conservados = np.bincount(codigos, weights=mascara, minlength=n_grupos)
+    sin_filtro = (conteos < 4) | (conservados < 3)
+    mascara |= sin_filtro[codigos]
+    return mascara
+
+
+def _hulls_por_grupo(claves, ids, puntos, cache=None):
+    """
+    Convex hull (con outliers filtrados) de cada grupo de clientes.
+
+    Cada grupo se firma con su clave y un hash de sus miembros: si ya se calculo
+    para la misma membresia (en cualquier subconjunto filtrado), se toma del cache.
+    Solo los grupos cuya membresia cambio pasan por IQR + ConvexHull.
+
+    Args:
+        claves: array de clave de grupo por cliente
+        ids: array de id_cliente
+        puntos: array (n, 2) de [longitud, latitud]
+        cache: objeto con get/set (ej. data.cache.CacheLRU) o None
+
+    Returns:
+        dict {clave: (hull_puntos, n_clientes_zona, posiciones)} para grupos con hull valido,
+        en el orden de clave (como groupby). posiciones indexa las filas del grupo.
+    """
+    codigos, uniques = pd.factorize(claves, sort=True)
+    orden = np.argsort(codigos, kind='stable')
+    codigos_ord = codigos[orden]
+    puntos_ord = puntos[orden]
+    n_grupos = len(uniques)
+    conteos = np.bincount(codigos_ord, minlength=n_grupos)
+    inicios = np.concatenate([[0], np.cumsum(conteos)[:-1]])
+    firmas = np.bitwise_xor.reduceat(_hash_miembros(ids[orden], puntos_ord), inicios) if len(orden) else []
+
+    resultados = {}
+    pendientes = []
+    for g in range(n_grupos):
+        if conteos[g] < 3:
+            continue
+        clave_cache = (uniques[g], int(firmas[g]), int(conteos[g]))
+        hull = cache.get(clave_cache) if cache is not None else None
+        if hull is None:
+            pendientes.append((g, clave_cache))
+        else:
+            resultados[g] = hull
+
+    if pendientes:
+        mascara = _mascara_outliers_iqr_grupos(codigos_ord, puntos_ord, n_grupos)
+        for g, clave_cache in pendientes:
+            tramo = slice(inicios[g], inicios[g] + conteos[g])
+            puntos_filtrados = puntos_ord[tramo][mascara[tramo]]
+            hull_puntos = _calcular_hull_seguro(puntos_filtrados)
+            hull = (hull_puntos, len(puntos_filtrados)) if hull_puntos is not None else False
+            if cache is not None:
+                cache.set(clave_cache, hull)
+            resultados[g] = hull
+
+    zonas = {}
+    for g in sorted(resultados):
+        if resultados[g] is False:
+            continue
+        hull_puntos, n_zona = resultados[g]
+        zonas[uniques[g]] = (hull_puntos, n_zona, orden[inicios[g]:inicios[g] + conteos[g]])
+    return zonas
+
+
+@trazado('geometria.calcular_zonas')
+def calcular_zonas(df, columna_grupo, cache=None):
     """
     Calcula poligonos (convex hull) para cada grupo, filtrando outliers.
 
@@ -180,6 +311,7 @@ def calcular_zonas(df, columna_grupo):
     Args:
         df: DataFrame con columnas 'latitud', 'longitud', 'ruta', 'preventista'
         columna_grupo: 'ruta' o 'preventista'
+        cache: cache de hulls por grupo y membresia (ver _hulls_por_grupo)
 
     Returns:
         Lista de diccionarios con: nombre, color, color_borde, lats, lons, n_clientes
@@ -187,20 +319,17 @@ def calcular_zonas(df, columna_grupo):
     if not SCIPY_AVAILABLE:
         return []
 
-    zonas = []
-    color_idx = 0
-
     if columna_grupo == 'preventista':
         # Para preventistas: mostrar cada ruta del preventista como zona separada
-        zonas = _calcular_zonas_preventista(df)
+        zonas = _calcular_zonas_preventista(df, cache)
     else:
         # Para rutas: una zona por ruta, filtrando outliers
-        zonas = _calcular_zonas_ruta(df)
+        zonas = _calcular_zonas_ruta(df, cache)
 
     return zonas
 
 
-def _calcular_zonas_ruta(df):
+def _calcular_zonas_ruta(df, cache=None):
     """
     Calcula zonas agrupando por ruta, filtrando outliers.
 
@@ -210,36 +339,23 @@ def _calcular_zonas_ruta(df):
     para evitar mezclar rutas con mismo numero de diferentes sucursales.
     """
     zonas = []
-    color_idx = 0
 
     # Filtrar rutas validas
-    df_valido = df[~df['ruta'].isin(['Sin ruta', ''])].copy()
+    df_valido = df[~df['ruta'].isin(['Sin ruta', ''])]
     if len(df_valido) == 0:
         return zonas
 
     # Crear identificador unico: sucursal|ruta
-    df_valido['ruta_unica'] = df_valido['sucursal'].fillna('') + '|' + df_valido['ruta'].fillna('')
-
-    # Agrupar por identificador unico
-    grupos = df_valido.groupby('ruta_unica')
-
-    for ruta_unica, grupo in grupos:
-        puntos = grupo[['longitud', 'latitud']].values
-
-        if len(puntos) < 3:
-            continue
-
-        # Filtrar outliers
-        puntos_filtrados = _filtrar_outliers_iqr(puntos)
-
-        # Calcular convex hull
-        hull_puntos = _calcular_hull_seguro(puntos_filtrados)
-        if hull_puntos is None:
-            continue
+    ruta_unica = ('ruta|' + df_valido['sucursal'].fillna('') + '|' + df_valido['ruta'].fillna('')).to_numpy()
+    ids = df_valido['id_cliente'].to_numpy()
+    hulls = _hulls_por_grupo(ruta_unica, ids, df_valido[['longitud', 'latitud']].to_numpy(dtype=float), cache)
 
+    rutas = df_valido['ruta'].to_numpy()
+    sucursales = df_valido['sucursal'].to_numpy()
+    for color_idx, (hull_puntos, n_zona, posiciones) in enumerate(hulls.values()):
         # Obtener nombre de ruta y sucursal del grupo
-        ruta = grupo['ruta'].iloc[0]
-        sucursal = grupo['sucursal'].iloc[0]
+        ruta = rutas[posiciones[0]]
+        sucursal = sucursales[posiciones[0]]
 
         # Nombre descriptivo
         nombre = f"{ruta} ({sucursal})" if sucursal and sucursal != 'Sin sucursal' else str(ruta)
@@ -251,16 +367,15 @@ def _calcular_zonas_ruta(df):
             'color_borde': color_borde,
             'lons': hull_puntos[:, 0].tolist(),
             'lats': hull_puntos[:, 1].tolist(),
-            'n_clientes': len(grupo),
-            'n_clientes_zona': len(puntos_filtrados),
-            'clientes': grupo['id_cliente'].tolist(),
+            'n_clientes': len(posiciones),
+            'n_clientes_zona': n_zona,
+            'clientes': ids[np.sort(posiciones)].tolist(),
         })
-        color_idx += 1
 
     return zonas
 
 
-def _calcular_zonas_preventista(df):
+def _calcular_zonas_preventista(df, cache=None):
     """
     Calcula zonas para preventistas mostrando cada ruta como zona independiente.
 
@@ -270,77 +385,99 @@ def _calcular_zonas_preventista(df):
     para evitar mezclar rutas con mismo numero de diferentes sucursales.
     """
     zonas = []
-    color_idx = 0
 
-    # Filtrar preventistas validos
-    df_valido = df[~df['preventista'].isin(['Sin preventista', ''])].copy()
+    # Filtrar preventistas y rutas validas
+    df_valido = df[~df['preventista'].isin(['Sin preventista', '']) & ~df['ruta'].isin(['Sin ruta', ''])]
     if len(df_valido) == 0:
         return zonas
 
-    # Crear identificador unico de ruta (sucursal + ruta)
-    df_valido['ruta_unica'] = df_valido['sucursal'].fillna('') + '|' + df_valido['ruta'].fillna('')
-
-    # Filtrar rutas validas
-    df_valido = df_valido[~df_valido['ruta'].isin(['Sin ruta', ''])]
-    if len(df_valido) == 0:
-        return zonas
+    # Un preventista es unico por sucursal; cada ruta (sucursal + ruta) es una zona
+    preventista = df_valido['preventista'].fillna('').to_numpy()
+    sucursal = df_valido['sucursal'].fillna('').to_numpy()
+    ruta = df_valido['ruta'].fillna('').to_numpy()
+    clave_prev = np.char.add(np.char.add(preventista.astype(str), '\x1f'), sucursal.astype(str))
+    claves = np.char.add(np.char.add(np.char.add('prev|', clave_prev), '\x1f'),
+                         np.char.add(np.char.add(sucursal.astype(str), '|'), ruta.astype(str)))
+    ids = df_valido['id_cliente'].to_numpy()
+    hulls = _hulls_por_grupo(claves, ids, df_valido[['longitud', 'latitud']].to_numpy(dtype=float), cache)
+
+    # Color base por preventista (en orden de preventista, como el groupby)
+    codigo_prev, _ = pd.factorize(clave_prev, sort=True)
+
+    prev_actual = None
+    for hull_puntos, n_zona, posiciones in hulls.values():
+        primero = posiciones[0]
+        if codigo_prev[primero] != prev_actual:
+            prev_actual = codigo_prev[primero]
+            ruta_num = 0
+        color_base, color_borde_base = COLORES_ZONAS[prev_actual % len(COLORES_ZONAS)]
+
+        # Variar la opacidad para distinguir rutas del mismo preventista
+        opacidad_fill = min(0.15 + (ruta_num * 0.05), 0.4)
+        opacidad_borde = min(0.7 + (ruta_num * 0.1), 1.0)
+
+        # Modificar colores con nueva opacidad
+        color = color_base.replace('0.2', str(opacidad_fill))
+        color_borde = color_borde_base.replace('0.8', str(opacidad_borde))
+
+        # Nombre descriptivo: Preventista (Sucursal) - Ruta
+        preventista_nombre = preventista[primero]
+        sucursal_prev = sucursal[primero]
+        if sucursal_prev and sucursal_prev != 'Sin sucursal':
+            nombre_zona = f"{preventista_nombre} ({sucursal_prev}) - {ruta[primero]}"
+        else:
+            nombre_zona = f"{preventista_nombre} - {ruta[primero]}"
 
-    # Agrupar por preventista Y sucursal (un preventista es unico por sucursal)
-    preventistas = df_valido.groupby(['preventista', 'sucursal'])
-
-    for (preventista_nombre, sucursal_prev), grupo_preventista in preventistas:
-        # Agrupar por ruta_unica (garantiza que no se mezclen rutas de otras sucursales)
-        rutas = grupo_preventista.groupby('ruta_unica')
-
-        # Color base para este preventista
-        color_base, color_borde_base = COLORES_ZONAS[color_idx % len(COLORES_ZONAS)]
+        zonas.append({
+            'nombre': nombre_zona,
+            'color': color,
+            'color_borde': color_borde,
+            'lons': hull_puntos[:, 0].tolist(),
+            'lats': hull_puntos[:, 1].tolist(),
+            'n_clientes': len(posiciones),
+            'n_clientes_zona': n_zona,
+            'clientes': ids[np.sort(posiciones)].tolist(),
+        })
+        ruta_num += 1
 
-        ruta_num = 0
-        for ruta_unica, grupo_ruta in rutas:
-            puntos = grupo_ruta[['longitud', 'latitud']].values
+    return zonas
 
-            if len(puntos) < 3:
-                continue
 
-            # Filtrar outliers
-            puntos_filtrados = _filtrar_outliers_iqr(puntos)
+@trazado('geometria.resumir_zonas')
+def resumir_zonas(zonas, df_generico):
+    """
+    Resumen por genérico de cada zona (badges) en una sola pasada:
+    mapea clientes a zona una vez y agrega por (zona, genérico) con un único groupby.
 
-            # Calcular convex hull
-            hull_puntos = _calcular_hull_seguro(puntos_filtrados)
-            if hull_puntos is None:
-                continue
-
-            # Variar la opacidad para distinguir rutas del mismo preventista
-            opacidad_fill = 0.15 + (ruta_num * 0.05)
-            opacidad_borde = 0.7 + (ruta_num * 0.1)
-            opacidad_fill = min(opacidad_fill, 0.4)
-            opacidad_borde = min(opacidad_borde, 1.0)
-
-            # Modificar colores con nueva opacidad
-            color = color_base.replace('0.2', str(opacidad_fill))
-            color_borde = color_borde_base.replace('0.8', str(opacidad_borde))
-
-            # Obtener nombre de ruta (sin el prefijo de sucursal)
-            ruta_nombre = grupo_ruta['ruta'].iloc[0]
-
-            # Nombre descriptivo: Preventista (Sucursal) - Ruta
-            if sucursal_prev and sucursal_prev != 'Sin sucursal':
-                nombre_zona = f"{preventista_nombre} ({sucursal_prev}) - {ruta_nombre}"
-            else:
-                nombre_zona = f"{preventista_nombre} - {ruta_nombre}"
-
-            zonas.append({
-                'nombre': nombre_zona,
-                'color': color,
-                'color_borde': color_borde,
-                'lons': hull_puntos[:, 0].tolist(),
-                'lats': hull_puntos[:, 1].tolist(),
-                'n_clientes': len(grupo_ruta),
-                'n_clientes_zona': len(puntos_filtrados),
-                'clientes': grupo_ruta['id_cliente'].tolist(),
-            })
-            ruta_num += 1
-
-        color_idx += 1
+    Args:
+        zonas: lista de zonas de calcular_zonas (usa 'clientes')
+        df_generico: DataFrame con id_cliente, generico, bultos_act, bultos_ant
 
-    return zonas
+    Returns:
+        Lista alineada con zonas: DataFrame indexado por genérico con bultos_act,
+        bultos_ant, cli_act, cli_ant (ordenado por bultos_act desc), o None.
+    """
+    resumenes = [None] * len(zonas)
+    if not zonas or len(df_generico) == 0:
+        return resumenes
+
+    largos = [len(z.get('clientes', [])) for z in zonas]
+    df_zonas = pd.DataFrame({
+        'id_cliente': np.concatenate([np.asarray(z.get('clientes', [])) for z in zonas]),
+        'zona': np.repeat(np.arange(len(zonas)), largos),
+    })
+    df_zg = df_generico[['id_cliente', 'generico', 'bultos_act', 'bultos_ant']].merge(df_zonas, on='id_cliente')
+    if len(df_zg) == 0:
+        return resumenes
+
+    df_zg['compro_act'] = df_zg['bultos_act'] > 0
+    df_zg['compro_ant'] = df_zg['bultos_ant'] > 0
+    agregado = df_zg.groupby(['zona', 'generico']).agg(
+        bultos_act=('bultos_act', 'sum'),
+        bultos_ant=('bultos_ant', 'sum'),
+        cli_act=('compro_act', 'sum'),
+        cli_ant=('compro_ant', 'sum'),
+    )
+    for zona_id, resumen in agregado.groupby(level='zona'):
+        resumenes[zona_id] = resumen.droplevel('zona').sort_values('bultos_act', ascending=False)
+    return resumenes